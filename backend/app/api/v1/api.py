@@ -1,9 +1,10 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import issues, analytics
+from app.api.v1.endpoints import issues, analytics, debug
 
 api_router = APIRouter()
 
 # Include all endpoint routers
 api_router.include_router(issues.router, prefix="/issues", tags=["issues"])
-api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
\ No newline at end of file
+api_router.include_router(analytics.router, prefix="/analytics", tags=["analytics"])
+api_router.include_router(debug.router, prefix="/debug", tags=["debug"])
\ No newline at end of file
@@ -1,107 +1,292 @@
-from typing import Optional
-from fastapi import APIRouter, HTTPException, Query
-from datetime import datetime, timedelta
-import uuid
+import hashlib
+import logging
+import time
+from typing import Optional, Dict, Any
+from fastapi import APIRouter, HTTPException, Query, Request, Response
 
-from app.crud.supabase_issues import supabase_issues
+from app.core.metrics import metrics
+from app.schemas.responses import (
+    DepartmentPerformanceResponse, PeakHoursResponse, LocationHotspotsResponse,
+    CategoryDistributionResponse, ResolutionTrendsResponse, DashboardResponse
+)
+from app.services.analytics_engine import analytics_engine
+from app.services.analytics_refresher import analytics_refresher
+from app.services.clustering import cluster_points
+from app.services.heatmap_tiles import heatmap_tiles, DAY_WINDOWS
+from app.services.location_service import location_service
+from app.services.rollup_cube import issue_rollup_cube
+from app.services.spatial_index import issue_spatial_index
 from app.services.supabase_client import supabase_client
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
-@router.get("/department-performance", response_model=dict)
-async def get_department_performance(days: int = Query(30, description="Number of days to analyze")):
+# Department names for each issue category
+CATEGORY_NAMES = {
+    'roads': 'Road Development Authority',
+    'electricity': 'Ceylon Electricity Board', 
+    'water': 'Water Supply Board',
+    'waste': 'Waste Management Authority',
+    'safety': 'Public Safety Department',
+    'health': 'Health Department',
+    'environment': 'Environmental Authority',
+    'infrastructure': 'Infrastructure Development'
+}
+
+
+async def _get_aggregates(days: int, max_age: Optional[float] = None) -> Dict[str, Any]:
+    """Count-based aggregates: range sum over the rollup cube, or the scanned snapshot while it warms"""
+    if issue_rollup_cube.is_ready:
+        return issue_rollup_cube.aggregate(days)
+    return await analytics_engine.get_snapshot(days, max_age=max_age)
+
+
+# Views over the shared analytics snapshot
+
+def _department_performance_view(snapshot: Dict[str, Any], days: int) -> Dict[str, Any]:
+    department_data = []
+    for category, stats in snapshot['by_category'].items():
+        if stats['total'] > 0:
+            resolution_rate = (stats['resolved'] / stats['total']) * 100
+            avg_satisfaction = (stats['satisfaction_sum'] / stats['satisfaction_count']) if stats['satisfaction_count'] > 0 else 4.0
+            
+            department_data.append({
+                'category': category,
+                'name': CATEGORY_NAMES.get(category, category.title()),
+                'total': stats['total'],
+                'resolved': stats['resolved'],
+                'pending': stats['pending'],
+                'in_progress': stats['in_progress'],
+                'resolution_rate': round(resolution_rate, 1),
+                'avg_satisfaction': round(avg_satisfaction, 1),
+                # Distinct citizens who reported in this category (HyperLogLog estimate)
+                'unique_reporters': snapshot['unique_reporters']['by_category'].get(category, 0)
+            })
+    
+    # Sort by total issues descending
+    department_data.sort(key=lambda x: x['total'], reverse=True)
+    
+    return {
+        "success": True,
+        "message": f"Department performance data for last {days} days",
+        "data": department_data,
+        "total_departments": len(department_data),
+        "analysis_period": f"{days} days"
+    }
+
+
+def _peak_hours_view(snapshot: Dict[str, Any], days: int) -> Dict[str, Any]:
+    hour_stats = snapshot['by_hour']
+    total = sum(hour_stats)
+    
+    peak_data = []
+    for hour in range(24):
+        peak_data.append({
+            'hour': f"{hour:02d}:00",
+            'hour_24': hour,
+            'issues': hour_stats[hour],
+            'percentage': round((hour_stats[hour] / max(total, 1)) * 100, 1)
+        })
+    
+    # Find busiest hours
+    sorted_hours = sorted(peak_data, key=lambda x: x['issues'], reverse=True)
+    busiest_hours = [h['hour'] for h in sorted_hours[:3] if h['issues'] > 0]
+    
+    return {
+        "success": True,
+        "message": f"Peak hours analysis for last {days} days",
+        "data": peak_data,
+        "busiest_hours": busiest_hours,
+        "total_issues": total,
+        "analysis_period": f"{days} days"
+    }
+
+
+def _location_hotspots_view(snapshot: Dict[str, Any], days: int) -> Dict[str, Any]:
+    hotspots = []
+    for location, stats in snapshot['by_location'].items():
+        # Get most common category
+        top_category = max(stats['categories'].items(), key=lambda x: x[1])[0] if stats['categories'] else 'mixed'
+        
+        hotspots.append({
+            'location': location,
+            'issues_count': stats['count'],
+            # Centroid of the location's reports, not the first one
+            'latitude': stats['latitude'],
+            'longitude': stats['longitude'],
+            'top_category': top_category,
+            'categories': stats['categories'],
+            'unique_reporters': stats['unique_reporters'],
+            'avg_severity': sum(k * v for k, v in stats['severities'].items()) / sum(stats['severities'].values()) if stats['severities'] else 2.0
+        })
+    
+    # Sort by issue count descending
+    hotspots.sort(key=lambda x: x['issues_count'], reverse=True)
+    
+    return {
+        "success": True,
+        "message": f"Location hotspots for last {days} days",
+        "data": hotspots[:20],  # Top 20 locations
+        "total_locations": len(hotspots),
+        "analysis_period": f"{days} days"
+    }
+
+
+def _cluster_hotspots_view(days: int, refine: bool) -> Dict[str, Any]:
+    """Hotspots from clustering issue coordinates in the spatial index"""
+    points = issue_spatial_index.points(since=time.time() - days * 86400)
+    result = cluster_points(
+        points['latitude'],
+        points['longitude'],
+        categories=points['category'],
+        severities=points['severity'],
+        category_names=issue_spatial_index.category_names,
+        refine=refine,
+        limit=20,
+        reporters=points['reporter']
+    )
+    
+    hotspots = []
+    for cluster in result['clusters']:
+        # Label the cluster offline (geocode cache or nearest district)
+        place = location_service.resolve_coordinates_locally(cluster['latitude'], cluster['longitude'])
+        
+        hotspots.append({
+            'location': place['formatted_address'] if place else f"{cluster['latitude']:.4f}, {cluster['longitude']:.4f}",
+            'issues_count': cluster['count'],
+            'latitude': cluster['latitude'],
+            'longitude': cluster['longitude'],
+            'radius_km': cluster['radius_km'],
+            'top_category': cluster['top_category'],
+            'categories': cluster['categories'],
+            'avg_severity': cluster['avg_severity'],
+            'severity_score': cluster['severity_score'],
+            'unique_reporters': cluster['unique_reporters']
+        })
+    
+    return {
+        "success": True,
+        "message": f"Location hotspots for last {days} days",
+        "data": hotspots,
+        "total_locations": result['total_clusters'],
+        "noise_issues": result['noise_points'],
+        "clustering": "density" if refine else "grid",
+        "analysis_period": f"{days} days"
+    }
+
+
+def _category_distribution_view(snapshot: Dict[str, Any], days: int) -> Dict[str, Any]:
+    total_issues = snapshot['total_issues']
+    
+    distribution = []
+    for category, stats in snapshot['by_category'].items():
+        distribution.append({
+            'category': category,
+            'count': stats['total'],
+            'percentage': round((stats['total'] / max(total_issues, 1)) * 100, 1)
+        })
+    
+    # Sort by count descending
+    distribution.sort(key=lambda x: x['count'], reverse=True)
+    
+    return {
+        "success": True,
+        "message": f"Category distribution for last {days} days",
+        "data": distribution,
+        "total_issues": total_issues,
+        "analysis_period": f"{days} days"
+    }
+
+
+def _resolution_trends_view(snapshot: Dict[str, Any], days: int) -> Dict[str, Any]:
+    resolution = snapshot['resolution']
+    satisfaction = snapshot['satisfaction']
+    sketches = snapshot['resolution_sketches']
+    total_issues = snapshot['total_issues']
+    
+    resolution_rate = (resolution['resolved'] / max(total_issues, 1)) * 100
+    avg_resolution_time = "N/A"
+    if resolution['resolution_count']:
+        avg_resolution_time = f"{resolution['resolution_hours_sum'] / resolution['resolution_count']:.0f}h"
+    
+    return {
+        "success": True,
+        "message": f"Resolution trends for last {days} days",
+        "data": {
+            "total_created": total_issues,
+            "total_resolved": resolution['resolved'],
+            "total_pending": resolution['pending'],
+            "total_in_progress": resolution['in_progress'],
+            "resolution_rate": round(resolution_rate, 1),
+            "avg_resolution_time": avg_resolution_time,
+            "satisfaction_score": round(satisfaction['sum'] / satisfaction['count'], 1) if satisfaction['count'] else 4.0,
+            # Hours from report to resolution: mean and p50/p90/p99 from mergeable sketches
+            "resolution_time_hours": sketches['overall'].summary(),
+            "resolution_time_by_category": {
+                category: sketch.summary() for category, sketch in sketches['by_category'].items()
+            },
+            "resolution_time_by_authority": {
+                authority: sketch.summary() for authority, sketch in sketches['by_authority'].items()
+            }
+        },
+        "analysis_period": f"{days} days"
+    }
+
+
+def _dashboard_summary_view(snapshot: Dict[str, Any], days: int) -> Dict[str, Any]:
+    return {
+        "total_issues": snapshot['total_issues'],
+        "by_status": snapshot['by_status'],
+        "by_severity": snapshot['by_severity'],
+        "by_district": snapshot.get('by_district'),
+        "unique_reporters": snapshot['unique_reporters'],
+        "source": snapshot['source'],
+        "generated_at": snapshot['generated_at']
+    }
+
+
+# Endpoint responses are served stale-while-revalidate: from the last build,
+# rebuilt in the background once older than the endpoint's refresh interval
+
+def _register_snapshot_view(name: str, view) -> None:
+    async def build(days: int) -> Dict[str, Any]:
+        snapshot = await _get_aggregates(days, max_age=analytics_refresher.interval(name))
+        return view(snapshot, days)
+    
+    analytics_refresher.register(name, build, warm_args=(30,))
+
+
+async def _build_location_hotspots(days: int, refine: bool) -> Dict[str, Any]:
+    # Cluster by coordinates once the spatial index is loaded,
+    # otherwise group by the reported location text
+    if issue_spatial_index.is_ready:
+        return _cluster_hotspots_view(days, refine)
+    
+    snapshot = await analytics_engine.get_snapshot(days, max_age=analytics_refresher.interval("location-hotspots"))
+    return _location_hotspots_view(snapshot, days)
+
+
+_register_snapshot_view("department-performance", _department_performance_view)
+_register_snapshot_view("peak-hours", _peak_hours_view)
+_register_snapshot_view("category-distribution", _category_distribution_view)
+_register_snapshot_view("resolution-trends", _resolution_trends_view)
+_register_snapshot_view("dashboard", _dashboard_summary_view)
+analytics_refresher.register("location-hotspots", _build_location_hotspots, warm_args=(30, True))
+
+
+@router.get("/department-performance", response_model=DepartmentPerformanceResponse, response_model_exclude_unset=True)
+async def get_department_performance(days: int = Query(30, ge=1, le=365, description="Number of days to analyze")):
     """
     Get department performance analytics based on real issue data
     """
     try:
-        # Get all issues from the specified time period
-        cutoff_date = datetime.utcnow() - timedelta(days=days)
-        
         if supabase_client.is_available:
             try:
-                # Get all issues
-                all_issues = await supabase_issues.get_all_issues(limit=1000)
-                
-                # Get authorities for department mapping
-                authorities = await supabase_issues.get_authorities()
-                
-                # Create authority category mapping
-                authority_categories = {auth['id']: auth['category'] for auth in authorities}
-                
-                # Group issues by category (representing departments)
-                category_stats = {}
-                
-                for issue in all_issues:
-                    category = issue.get('category', 'unknown')
-                    
-                    if category not in category_stats:
-                        category_stats[category] = {
-                            'total': 0,
-                            'resolved': 0,
-                            'pending': 0,
-                            'in_progress': 0,
-                            'total_satisfaction': 0,
-                            'satisfaction_count': 0
-                        }
-                    
-                    category_stats[category]['total'] += 1
-                    
-                    status = issue.get('status', 'pending')
-                    if status == 'resolved':
-                        category_stats[category]['resolved'] += 1
-                    elif status in ['pending', 'under_review']:
-                        category_stats[category]['pending'] += 1
-                    elif status in ['assigned', 'in_progress']:
-                        category_stats[category]['in_progress'] += 1
-                    
-                    # Add satisfaction if available
-                    satisfaction = issue.get('citizen_satisfaction_rating')
-                    if satisfaction:
-                        category_stats[category]['total_satisfaction'] += satisfaction
-                        category_stats[category]['satisfaction_count'] += 1
-                
-                # Format response
-                department_data = []
-                category_names = {
-                    'roads': 'Road Development Authority',
-                    'electricity': 'Ceylon Electricity Board', 
-                    'water': 'Water Supply Board',
-                    'waste': 'Waste Management Authority',
-                    'safety': 'Public Safety Department',
-                    'health': 'Health Department',
-                    'environment': 'Environmental Authority',
-                    'infrastructure': 'Infrastructure Development'
-                }
-                
-                for category, stats in category_stats.items():
-                    if stats['total'] > 0:
-                        resolution_rate = (stats['resolved'] / stats['total']) * 100
-                        avg_satisfaction = (stats['total_satisfaction'] / stats['satisfaction_count']) if stats['satisfaction_count'] > 0 else 4.0
-                        
-                        department_data.append({
-                            'category': category,
-                            'name': category_names.get(category, category.title()),
-                            'total': stats['total'],
-                            'resolved': stats['resolved'],
-                            'pending': stats['pending'],
-                            'in_progress': stats['in_progress'],
-                            'resolution_rate': round(resolution_rate, 1),
-                            'avg_satisfaction': round(avg_satisfaction, 1)
-                        })
-                
-                # Sort by total issues descending
-                department_data.sort(key=lambda x: x['total'], reverse=True)
-                
-                return {
-                    "success": True,
-                    "message": f"Department performance data for last {days} days",
-                    "data": department_data,
-                    "total_departments": len(department_data),
-                    "analysis_period": f"{days} days"
-                }
+                return await analytics_refresher.get("department-performance", days)
                 
             except Exception as db_error:
-                print(f"Database error: {db_error}")
+                logger.error("Database error: %s", db_error)
                 
         # Fallback to mock data
         mock_data = [
@@ -128,56 +313,18 @@ async def get_department_performance(days: int = Query(30, description="Number o
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get department performance: {str(e)}")
 
-@router.get("/peak-hours", response_model=dict)
-async def get_peak_hours_analysis(days: int = Query(30, description="Number of days to analyze")):
+@router.get("/peak-hours", response_model=PeakHoursResponse, response_model_exclude_unset=True)
+async def get_peak_hours_analysis(days: int = Query(30, ge=1, le=365, description="Number of days to analyze")):
     """
     Analyze peak hours when most issues are reported
     """
     try:
         if supabase_client.is_available:
             try:
-                # Get all issues
-                all_issues = await supabase_issues.get_all_issues(limit=1000)
-                
-                # Group by hour of day
-                hour_stats = {hour: 0 for hour in range(24)}
-                
-                for issue in all_issues:
-                    created_at = issue.get('created_at')
-                    if created_at:
-                        # Parse the datetime and extract hour
-                        try:
-                            dt = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                            hour = dt.hour
-                            hour_stats[hour] += 1
-                        except Exception:
-                            continue
-                
-                # Format for chart
-                peak_data = []
-                for hour in range(24):
-                    peak_data.append({
-                        'hour': f"{hour:02d}:00",
-                        'hour_24': hour,
-                        'issues': hour_stats[hour],
-                        'percentage': round((hour_stats[hour] / max(sum(hour_stats.values()), 1)) * 100, 1)
-                    })
-                
-                # Find busiest hours
-                sorted_hours = sorted(peak_data, key=lambda x: x['issues'], reverse=True)
-                busiest_hours = [h['hour'] for h in sorted_hours[:3] if h['issues'] > 0]
-                
-                return {
-                    "success": True,
-                    "message": f"Peak hours analysis for last {days} days",
-                    "data": peak_data,
-                    "busiest_hours": busiest_hours,
-                    "total_issues": sum(hour_stats.values()),
-                    "analysis_period": f"{days} days"
-                }
+                return await analytics_refresher.get("peak-hours", days)
                 
             except Exception as db_error:
-                print(f"Database error: {db_error}")
+                logger.error("Database error: %s", db_error)
         
         # Fallback mock data
         mock_data = [
@@ -200,74 +347,21 @@ async def get_peak_hours_analysis(days: int = Query(30, description="Number of d
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get peak hours: {str(e)}")
 
-@router.get("/location-hotspots", response_model=dict)
-async def get_location_hotspots(days: int = Query(30, description="Number of days to analyze")):
+@router.get("/location-hotspots", response_model=LocationHotspotsResponse, response_model_exclude_unset=True)
+async def get_location_hotspots(
+    days: int = Query(30, ge=1, le=365, description="Number of days to analyze"),
+    refine: bool = Query(True, description="Merge dense neighbouring grid cells into clusters")
+):
     """
     Get location hotspots where most issues are reported
     """
     try:
         if supabase_client.is_available:
             try:
-                # Get all issues with location data
-                all_issues = await supabase_issues.get_all_issues(limit=1000)
-                
-                # Group by location
-                location_stats = {}
-                
-                for issue in all_issues:
-                    location = issue.get('location', 'Unknown Location')
-                    latitude = issue.get('latitude')
-                    longitude = issue.get('longitude')
-                    
-                    if location not in location_stats:
-                        location_stats[location] = {
-                            'count': 0,
-                            'latitude': latitude,
-                            'longitude': longitude,
-                            'categories': {},
-                            'severities': {}
-                        }
-                    
-                    location_stats[location]['count'] += 1
-                    
-                    # Track categories
-                    category = issue.get('category', 'unknown')
-                    location_stats[location]['categories'][category] = location_stats[location]['categories'].get(category, 0) + 1
-                    
-                    # Track severities
-                    severity = issue.get('severity_level', 1)
-                    location_stats[location]['severities'][severity] = location_stats[location]['severities'].get(severity, 0) + 1
-                
-                # Format response
-                hotspots = []
-                for location, stats in location_stats.items():
-                    if stats['count'] > 0:  # Only include locations with issues
-                        # Get most common category
-                        top_category = max(stats['categories'].items(), key=lambda x: x[1])[0] if stats['categories'] else 'mixed'
-                        
-                        hotspots.append({
-                            'location': location,
-                            'issues_count': stats['count'],
-                            'latitude': stats['latitude'],
-                            'longitude': stats['longitude'],
-                            'top_category': top_category,
-                            'categories': stats['categories'],
-                            'avg_severity': sum(k * v for k, v in stats['severities'].items()) / sum(stats['severities'].values()) if stats['severities'] else 2.0
-                        })
-                
-                # Sort by issue count descending
-                hotspots.sort(key=lambda x: x['issues_count'], reverse=True)
-                
-                return {
-                    "success": True,
-                    "message": f"Location hotspots for last {days} days",
-                    "data": hotspots[:20],  # Top 20 locations
-                    "total_locations": len(hotspots),
-                    "analysis_period": f"{days} days"
-                }
+                return await analytics_refresher.get("location-hotspots", days, refine)
                 
             except Exception as db_error:
-                print(f"Database error: {db_error}")
+                logger.error("Database error: %s", db_error)
         
         # Fallback mock data
         mock_data = [
@@ -302,46 +396,18 @@ async def get_location_hotspots(days: int = Query(30, description="Number of day
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get location hotspots: {str(e)}")
 
-@router.get("/category-distribution", response_model=dict)
-async def get_category_distribution(days: int = Query(30, description="Number of days to analyze")):
+@router.get("/category-distribution", response_model=CategoryDistributionResponse, response_model_exclude_unset=True)
+async def get_category_distribution(days: int = Query(30, ge=1, le=365, description="Number of days to analyze")):
     """
     Get distribution of issues by category
     """
     try:
         if supabase_client.is_available:
             try:
-                all_issues = await supabase_issues.get_all_issues(limit=1000)
-                
-                category_counts = {}
-                total_issues = len(all_issues)
-                
-                for issue in all_issues:
-                    category = issue.get('category', 'unknown')
-                    category_counts[category] = category_counts.get(category, 0) + 1
-                
-                # Format response
-                distribution = []
-                for category, count in category_counts.items():
-                    percentage = (count / max(total_issues, 1)) * 100
-                    distribution.append({
-                        'category': category,
-                        'count': count,
-                        'percentage': round(percentage, 1)
-                    })
-                
-                # Sort by count descending
-                distribution.sort(key=lambda x: x['count'], reverse=True)
-                
-                return {
-                    "success": True,
-                    "message": f"Category distribution for last {days} days",
-                    "data": distribution,
-                    "total_issues": total_issues,
-                    "analysis_period": f"{days} days"
-                }
+                return await analytics_refresher.get("category-distribution", days)
                 
             except Exception as db_error:
-                print(f"Database error: {db_error}")
+                logger.error("Database error: %s", db_error)
         
         # Fallback mock data
         mock_data = [
@@ -360,40 +426,18 @@ async def get_category_distribution(days: int = Query(30, description="Number of
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get category distribution: {str(e)}")
 
-@router.get("/resolution-trends", response_model=dict)
-async def get_resolution_trends(days: int = Query(30, description="Number of days to analyze")):
+@router.get("/resolution-trends", response_model=ResolutionTrendsResponse, response_model_exclude_unset=True)
+async def get_resolution_trends(days: int = Query(30, ge=1, le=365, description="Number of days to analyze")):
     """
     Get resolution trends over time
     """
     try:
         if supabase_client.is_available:
             try:
-                all_issues = await supabase_issues.get_all_issues(limit=1000)
-                
-                total_issues = len(all_issues)
-                resolved_issues = len([i for i in all_issues if i.get('status') == 'resolved'])
-                pending_issues = len([i for i in all_issues if i.get('status') in ['pending', 'under_review']])
-                in_progress_issues = len([i for i in all_issues if i.get('status') in ['assigned', 'in_progress']])
-                
-                resolution_rate = (resolved_issues / max(total_issues, 1)) * 100
-                
-                return {
-                    "success": True,
-                    "message": f"Resolution trends for last {days} days",
-                    "data": {
-                        "total_created": total_issues,
-                        "total_resolved": resolved_issues,
-                        "total_pending": pending_issues,
-                        "total_in_progress": in_progress_issues,
-                        "resolution_rate": round(resolution_rate, 1),
-                        "avg_resolution_time": "24h",  # Would need to calculate from real data
-                        "satisfaction_score": 4.0  # Would need to calculate from feedback
-                    },
-                    "analysis_period": f"{days} days"
-                }
+                return await analytics_refresher.get("resolution-trends", days)
                 
             except Exception as db_error:
-                print(f"Database error: {db_error}")
+                logger.error("Database error: %s", db_error)
         
         # Fallback mock data
         mock_data = {
@@ -414,4 +458,90 @@ async def get_resolution_trends(days: int = Query(30, description="Number of day
         }
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to get resolution trends: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to get resolution trends: {str(e)}")
+
+@router.get("/dashboard", response_model=DashboardResponse, response_model_exclude_unset=True)
+async def get_dashboard(days: int = Query(30, ge=1, le=365, description="Number of days to analyze")):
+    """
+    All admin dashboard analytics in one response
+    
+    Each section is its endpoint's own response, served by the refresher on that
+    endpoint's interval, so sections (and the summary) can differ in age and
+    source (rollup cube or scanned snapshot). Every section carries its own
+    snapshot_age_seconds and refreshed_at; the top-level snapshot_age_seconds is
+    the oldest of them.
+    """
+    try:
+        sections = {
+            "department_performance": await get_department_performance(days),
+            "peak_hours": await get_peak_hours_analysis(days),
+            "location_hotspots": await get_location_hotspots(days, refine=True),
+            "category_distribution": await get_category_distribution(days),
+            "resolution_trends": await get_resolution_trends(days)
+        }
+        
+        summary = None
+        if supabase_client.is_available:
+            try:
+                summary = await analytics_refresher.get("dashboard", days)
+            except Exception as db_error:
+                logger.error("Database error: %s", db_error)
+        
+        response = {
+            "success": True,
+            "message": f"Dashboard analytics for last {days} days",
+            "data": sections,
+            "summary": summary,
+            "analysis_period": f"{days} days"
+        }
+        ages = [
+            part["snapshot_age_seconds"] for part in [*sections.values(), summary]
+            if part and part.get("snapshot_age_seconds") is not None
+        ]
+        if ages:
+            response["snapshot_age_seconds"] = max(ages)
+        return response
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get dashboard analytics: {str(e)}")
+
+@router.get("/heatmap/{z}/{x}/{y}.png")
+async def get_heatmap_tile(
+    z: int,
+    x: int,
+    y: int,
+    request: Request,
+    category: Optional[str] = Query(None, description="Only issues of this category"),
+    status: Optional[str] = Query(None, description="Only issues with this status"),
+    days: Optional[int] = Query(None, description=f"Only issues from the last N days, one of {', '.join(map(str, DAY_WINDOWS))}")
+):
+    """
+    Severity-weighted issue density as an XYZ heatmap tile (256 px PNG)
+    """
+    if not 0 <= z <= heatmap_tiles.max_zoom or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    if days is not None and days not in DAY_WINDOWS:
+        raise HTTPException(status_code=400, detail=f"days must be one of {', '.join(map(str, DAY_WINDOWS))}")
+    
+    try:
+        filters = {"category": category, "status": status, "days": days}
+        png, cached = await heatmap_tiles.get_tile(z, x, y, filters)
+        metrics.record_cache("heatmap_tiles", cached)
+        
+        etag = f'"{hashlib.sha1(png).hexdigest()[:16]}"'
+        headers = {
+            "ETag": etag,
+            "X-Tile-Cache": "hit" if cached else "miss"
+        }
+        if issue_spatial_index.is_ready:
+            headers["Cache-Control"] = f"public, max-age={heatmap_tiles.cache_max_age}, stale-while-revalidate={heatmap_tiles.cache_max_age}"
+        else:
+            # Index still loading: the tile is incomplete, do not let it be cached
+            headers["Cache-Control"] = "no-store"
+        
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers=headers)
+        return Response(content=png, media_type="image/png", headers=headers)
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to render heatmap tile: {str(e)}")
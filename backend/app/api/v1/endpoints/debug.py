@@ -0,0 +1,87 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.core.admin import require_admin
+from app.core.loop_monitor import loop_monitor
+from app.core.profiling import profiler
+from app.core.tracing import tracer
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/traces", response_model=dict)
+async def get_recent_traces(
+    limit: int = Query(50, ge=1, le=500),
+    min_duration_ms: float = Query(0, ge=0)
+):
+    """
+    Recent request traces, newest first (optionally only those slower than min_duration_ms)
+    """
+    traces = tracer.recent(limit, min_duration_ms)
+    return {
+        "success": True,
+        "traces": traces,
+        "count": len(traces)
+    }
+
+
+@router.get("/traces/{trace_id}", response_model=dict)
+async def get_trace(trace_id: str):
+    """
+    All spans of one trace, ordered by start time
+    """
+    spans = tracer.get_trace(trace_id)
+    if spans is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    
+    return {
+        "success": True,
+        "trace_id": trace_id,
+        "spans": spans
+    }
+
+
+@router.get("/profiles", response_model=dict)
+async def get_recent_profiles(limit: int = Query(20, ge=1, le=200)):
+    """
+    Recently profiled requests, newest first
+    """
+    profiles = profiler.recent(limit)
+    return {
+        "success": True,
+        "enabled": profiler.enabled,
+        "profiles": profiles,
+        "count": len(profiles)
+    }
+
+
+@router.get("/profiles/{trace_id}")
+async def get_profile(trace_id: str, format: str = Query("collapsed", pattern="^(collapsed|json)$")):
+    """
+    One request's profile as collapsed stacks (flamegraph.pl / speedscope input) or JSON
+    """
+    profile = profiler.get(trace_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    if format == "json":
+        return {
+            "success": True,
+            "profile": profile.summary(),
+            "stacks": dict(profile.stacks.most_common())
+        }
+    return PlainTextResponse(profile.collapsed())
+
+
+@router.get("/stalls", response_model=dict)
+async def get_recent_stalls(limit: int = Query(20, ge=1, le=100)):
+    """
+    Recent event loop stalls with the blocking stack and attributed route, newest first
+    """
+    stalls = loop_monitor.recent(limit)
+    return {
+        "success": True,
+        "threshold_ms": loop_monitor.threshold * 1000,
+        "stalls": stalls,
+        "count": len(stalls)
+    }
@@ -1,13 +1,26 @@
 from typing import Optional
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form
+from fastapi.exceptions import ResponseValidationError
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
+import logging
 import uuid
 import json
+import time
+import asyncio
+import numpy as np
 
+from app.core.responses import typed_response
 from app.crud.supabase_issues import supabase_issues
+from app.services import geo
 from app.services.gemini_analysis import gemini_service
 from app.services.supabase_client import supabase_client
 from app.services.location_service import location_service
+from app.services.analysis_pipeline import analysis_pipeline
+from app.services.issue_export import issue_exporter, EXPORT_FORMATS
+from app.schemas.responses import IssueListResponse, UserReportsResponse, NearbyIssuesResponse, MapIssuesResponse
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -25,6 +38,7 @@ class NearbyIssuesRequest(BaseModel):
     longitude: float
     radius_km: float = 10
     limit: int = 100
+    k_nearest: Optional[int] = None  # Return the k closest issues regardless of radius
 
 # Mock data for categories
 MOCK_CATEGORIES = [
@@ -102,7 +116,7 @@ async def report_issue(
     category: str = Form(...),
     title: str = Form(None),
     description: str = Form(...),
-    location: str = Form(...),
+    location: str = Form(None),
     user_id: str = Form(...),
     severity_level: int = Form(1),
     latitude: float = Form(None),
@@ -112,12 +126,38 @@ async def report_issue(
 ):
     """
     Report a new civic issue using Supabase REST API
+    
+    The location may be omitted when the form has coordinates or the photo has GPS tags
     """
     try:
         # Handle image upload (in real implementation, save to Supabase storage)
         image_url = None
+        location_source = "form" if latitude is not None and longitude is not None else None
         if image:
             image_url = f"https://storage.supabase.co/issues/{uuid.uuid4()}/{image.filename}"
+            
+            # Use the photo's EXIF GPS tags when the form has no coordinates
+            if location_source is None:
+                image_metadata = await asyncio.to_thread(
+                    gemini_service.extract_image_metadata, await image.read()
+                )
+                if image_metadata["gps"]:
+                    latitude = image_metadata["gps"]["latitude"]
+                    longitude = image_metadata["gps"]["longitude"]
+                    location_source = "exif"
+        
+        # Describe photo coordinates (or form coordinates without a location) as the analysis
+        # pipeline does: geocode cache or district lookup, no Nominatim call
+        location_data = None
+        if location_source == "exif" or (location_source and not location):
+            location_data = location_service.resolve_coordinates_locally(latitude, longitude)
+        if not location:
+            if location_data:
+                location = location_data["formatted_address"]
+            elif location_source:
+                location = f"GPS Coordinates: {latitude:.6f}, {longitude:.6f}"
+            else:
+                raise HTTPException(status_code=400, detail="Provide a location, coordinates or a photo with GPS tags")
         
         # Parse AI analysis if provided
         ai_analysis_data = None
@@ -150,6 +190,8 @@ async def report_issue(
                         "success": True,
                         "message": "Issue reported successfully to database",
                         "issue": saved_issue,
+                        "location_source": location_source,
+                        "location_data": location_data,
                         "next_steps": [
                             f"Your issue has been logged with reference {saved_issue.get('booking_reference')}",
                             "A government officer will review your submission within 24 hours",
@@ -158,7 +200,7 @@ async def report_issue(
                         ]
                     }
             except Exception as db_error:
-                print(f"Database save failed: {db_error}")
+                logger.error("Database save failed: %s", db_error)
         
         # Fallback to mock response
         mock_issue = {
@@ -183,6 +225,8 @@ async def report_issue(
             "success": True,
             "message": "Issue reported successfully (mock mode)",
             "issue": mock_issue,
+            "location_source": location_source,
+            "location_data": location_data,
             "next_steps": [
                 f"Your issue has been logged with reference {mock_issue['booking_reference']}",
                 "A government officer will review your submission within 24 hours",
@@ -191,10 +235,12 @@ async def report_issue(
             ]
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to report issue: {str(e)}")
 
-@router.get("/my-reports/{user_id}", response_model=dict)
+@router.get("/my-reports/{user_id}", response_model=UserReportsResponse)
 async def get_my_reports(
     user_id: str,
     skip: int = 0,
@@ -214,15 +260,18 @@ async def get_my_reports(
                 )
                 
                 if user_issues:
-                    return {
+                    return typed_response(UserReportsResponse, {
                         "success": True,
                         "message": "Reports fetched from database",
                         "reports": user_issues,
                         "total_count": len(user_issues),
                         "page": skip // limit + 1 if limit > 0 else 1
-                    }
+                    })
+            except ResponseValidationError:
+                # A response that does not match its model is a bug, not a database error
+                raise
             except Exception as db_error:
-                print(f"Database fetch failed: {db_error}")
+                logger.error("Database fetch failed: %s", db_error)
         
         # Fallback to mock data
         mock_reports = [
@@ -270,14 +319,16 @@ async def get_my_reports(
             }
         ]
         
-        return {
+        return typed_response(UserReportsResponse, {
             "success": True,
             "message": "Reports fetched (mock mode)",
             "reports": mock_reports[:limit],
             "total_count": len(mock_reports),
             "page": skip // limit + 1 if limit > 0 else 1
-        }
+        })
         
+    except ResponseValidationError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch reports: {str(e)}")
 
@@ -308,7 +359,7 @@ async def get_authorities(category: Optional[str] = None):
                         "authorities": authorities
                     }
             except Exception as db_error:
-                print(f"Database fetch failed: {db_error}")
+                logger.error("Database fetch failed: %s", db_error)
         
         # Fallback to mock data
         authorities = MOCK_AUTHORITIES
@@ -485,17 +536,39 @@ async def analyze_image_with_ai(
         # Read image content
         image_content = await image.read()
         
-        # Prepare location context
-        location_context = None
-        if address:
-            location_context = address
-        elif latitude and longitude:
-            location_context = f"GPS Coordinates: {latitude:.6f}, {longitude:.6f}"
-        
         # Perform AI analysis using Gemini
         try:
-            analysis_result = await gemini_service.analyze_image(
-                image_content=image_content,
+            if gemini_service.api_available:
+                # Decode once: resized JPEG for Gemini plus EXIF GPS/capture time
+                prepared = await asyncio.to_thread(gemini_service.prepare_image, image_content)
+            else:
+                # Mock mode never sends the image, so do not decode it (or reject it); EXIF comes from the header
+                prepared = {
+                    "image_base64": None,
+                    "exif": await asyncio.to_thread(gemini_service.extract_image_metadata, image_content)
+                }
+            
+            # Prepare location context
+            location_context = None
+            location_source = None
+            if address:
+                location_context = address
+                location_source = "address"
+            elif latitude and longitude:
+                location_context = f"GPS Coordinates: {latitude:.6f}, {longitude:.6f}"
+                location_source = "coordinates"
+            elif prepared["exif"]["gps"]:
+                latitude = prepared["exif"]["gps"]["latitude"]
+                longitude = prepared["exif"]["gps"]["longitude"]
+                address_data = location_service.resolve_coordinates_locally(latitude, longitude)
+                if address_data:
+                    location_context = f"{address_data['formatted_address']} (GPS: {latitude:.6f}, {longitude:.6f})"
+                else:
+                    location_context = f"GPS Coordinates: {latitude:.6f}, {longitude:.6f}"
+                location_source = "exif"
+            
+            analysis_result = await gemini_service.analyze_prepared_image(
+                image_base64=prepared["image_base64"],
                 location=location_context
             )
             
@@ -506,7 +579,10 @@ async def analyze_image_with_ai(
                 "processing_info": {
                     "model": "Google Gemini Pro Vision",
                     "image_size": f"{len(image_content)} bytes",
-                    "location_provided": location_context is not None
+                    "location_provided": location_context is not None,
+                    "location_source": location_source,
+                    "coordinates": {"latitude": latitude, "longitude": longitude} if latitude and longitude else None,
+                    "captured_at": prepared["exif"]["captured_at"]
                 }
             }
             
@@ -637,7 +713,7 @@ async def get_sri_lankan_districts():
         raise HTTPException(status_code=500, detail=f"Failed to get districts: {str(e)}")
 
 
-@router.post("/nearby", response_model=dict)
+@router.post("/nearby", response_model=NearbyIssuesResponse)
 async def get_nearby_issues(request: NearbyIssuesRequest):
     """
     Get issues near a specific location using Supabase REST API
@@ -650,11 +726,12 @@ async def get_nearby_issues(request: NearbyIssuesRequest):
                     latitude=request.latitude,
                     longitude=request.longitude,
                     radius_km=request.radius_km,
-                    limit=request.limit
+                    limit=request.limit,
+                    k_nearest=request.k_nearest
                 )
                 
                 if nearby_issues:
-                    return {
+                    return typed_response(NearbyIssuesResponse, {
                         "success": True,
                         "message": f"Found {len(nearby_issues)} nearby issues from database",
                         "issues": nearby_issues,
@@ -662,15 +739,17 @@ async def get_nearby_issues(request: NearbyIssuesRequest):
                             "latitude": request.latitude,
                             "longitude": request.longitude,
                             "radius_km": request.radius_km,
-                            "limit": request.limit
+                            "limit": request.limit,
+                            "k_nearest": request.k_nearest
                         }
-                    }
+                    })
+            except ResponseValidationError:
+                # A response that does not match its model is a bug, not a database error
+                raise
             except Exception as db_error:
-                print(f"Database fetch failed: {db_error}")
+                logger.error("Database fetch failed: %s", db_error)
         
         # Fallback to mock data with calculated distances
-        import math
-        
         # Mock issues with real locations around Sri Lanka
         mock_issues = [
             {
@@ -806,38 +885,25 @@ async def get_nearby_issues(request: NearbyIssuesRequest):
         ]
         
         # Calculate distances and filter by radius
-        def calculate_distance(lat1, lon1, lat2, lon2):
-            """Calculate distance between two points using Haversine formula"""
-            R = 6371  # Earth's radius in km
-            
-            lat1_rad, lon1_rad = math.radians(lat1), math.radians(lon1)
-            lat2_rad, lon2_rad = math.radians(lat2), math.radians(lon2)
-            
-            dlat = lat2_rad - lat1_rad
-            dlon = lon2_rad - lon1_rad
-            
-            a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-            c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-            
-            return R * c
+        distances = geo.haversine_km(
+            request.latitude,
+            request.longitude,
+            np.array([issue["latitude"] for issue in mock_issues]),
+            np.array([issue["longitude"] for issue in mock_issues])
+        )
         
         # Add distance to each issue and filter
         nearby_issues = []
-        for issue in mock_issues:
-            distance = calculate_distance(
-                request.latitude, request.longitude,
-                issue["latitude"], issue["longitude"]
-            )
-            
-            if distance <= request.radius_km:
-                issue["distance_km"] = round(distance, 2)
+        for issue, distance in zip(mock_issues, distances):
+            if request.k_nearest or distance <= request.radius_km:
+                issue["distance_km"] = round(float(distance), 2)
                 nearby_issues.append(issue)
         
         # Sort by distance and limit results
         nearby_issues.sort(key=lambda x: x["distance_km"])
-        nearby_issues = nearby_issues[:request.limit]
+        nearby_issues = nearby_issues[:request.k_nearest or request.limit]
         
-        return {
+        return typed_response(NearbyIssuesResponse, {
             "success": True,
             "message": f"Found {len(nearby_issues)} nearby issues (mock mode)",
             "issues": nearby_issues,
@@ -845,14 +911,17 @@ async def get_nearby_issues(request: NearbyIssuesRequest):
                 "latitude": request.latitude,
                 "longitude": request.longitude,
                 "radius_km": request.radius_km,
-                "limit": request.limit
+                "limit": request.limit,
+                "k_nearest": request.k_nearest
             }
-        }
+        })
         
+    except ResponseValidationError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch nearby issues: {str(e)}")
 
-@router.get("/all", response_model=dict)
+@router.get("/all", response_model=IssueListResponse)
 async def get_all_issues(
     category: Optional[str] = None,
     status: Optional[str] = None,
@@ -888,7 +957,7 @@ async def get_all_issues(
                     )
                 
                 if all_issues:
-                    return {
+                    return typed_response(IssueListResponse, {
                         "success": True,
                         "message": f"Fetched {len(all_issues)} issues from database",
                         "issues": all_issues,
@@ -898,9 +967,12 @@ async def get_all_issues(
                             "department_id": department_id,
                             "authority_id": authority_id
                         }
-                    }
+                    })
+            except ResponseValidationError:
+                # A response that does not match its model is a bug, not a database error
+                raise
             except Exception as db_error:
-                print(f"Database fetch failed: {db_error}")
+                logger.error("Database fetch failed: %s", db_error)
         
         # Fallback to mock data
         mock_issues = [
@@ -957,7 +1029,7 @@ async def get_all_issues(
         # Apply pagination
         filtered_issues = filtered_issues[skip:skip+limit]
         
-        return {
+        return typed_response(IssueListResponse, {
             "success": True,
             "message": f"Fetched {len(filtered_issues)} issues (mock mode)",
             "issues": filtered_issues,
@@ -967,11 +1039,108 @@ async def get_all_issues(
                 "department_id": department_id,
                 "authority_id": authority_id
             }
-        }
+        })
         
+    except ResponseValidationError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch issues: {str(e)}")
 
+@router.get("/map", response_model=MapIssuesResponse)
+async def get_map_issues(
+    min_lat: float,
+    min_lon: float,
+    max_lat: float,
+    max_lon: float,
+    zoom: int = 12,
+    limit: int = 2000
+):
+    """
+    Issues inside a map viewport: cluster markers at low zoom, individual issues at high zoom
+    """
+    try:
+        if min_lat > max_lat or min_lon > max_lon:
+            raise HTTPException(status_code=400, detail="Invalid bounding box")
+        
+        box = (min_lat, min_lon, max_lat, max_lon)
+        viewport = {"min_lat": min_lat, "min_lon": min_lon, "max_lat": max_lat, "max_lon": max_lon, "zoom": zoom}
+        
+        if supabase_client.is_available:
+            try:
+                result = await supabase_issues.get_map_view(box, zoom, limit)
+                
+                return typed_response(MapIssuesResponse, {
+                    "success": True,
+                    "message": f"Found {result['total']} issues in viewport",
+                    **result,
+                    "viewport": viewport
+                })
+            except ResponseValidationError:
+                # A response that does not match its model is a bug, not a database error
+                raise
+            except Exception as db_error:
+                logger.error("Database map query failed: %s", db_error)
+        
+        # Fallback to mock data
+        return typed_response(MapIssuesResponse, {
+            "success": True,
+            "message": "Found 0 issues in viewport (mock mode)",
+            "mode": "clusters",
+            "clusters": [],
+            "total": 0,
+            "viewport": viewport
+        })
+        
+    except (HTTPException, ResponseValidationError):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get map issues: {str(e)}")
+
+@router.get("/export")
+async def export_issues(
+    format: str = "csv",
+    columns: Optional[str] = None,
+    gzip: bool = False,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    authority_id: Optional[str] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None
+):
+    """
+    Stream every matching issue as CSV, NDJSON or Parquet (optionally gzip-compressed)
+    
+    `columns` is a comma-separated subset of the issue fields; `created_from` and
+    `created_to` are ISO timestamps bounding created_at.
+    """
+    try:
+        issue_exporter.check_format(format)
+        selected = issue_exporter.parse_columns(columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not supabase_client.is_available:
+        raise HTTPException(status_code=503, detail="Issue export requires the database")
+    
+    filters = {}
+    if category:
+        filters["category"] = category
+    if status:
+        filters["status"] = status
+    if authority_id:
+        filters["assigned_authority_id"] = authority_id
+    if created_from:
+        filters["created_at.gte"] = created_from
+    if created_to:
+        filters["created_at.lt"] = created_to
+    
+    filename = issue_exporter.filename(format, gzip)
+    return StreamingResponse(
+        issue_exporter.stream(format, selected, filters, compress=gzip),
+        media_type="application/gzip" if gzip else EXPORT_FORMATS[format][0],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.post("/analyze-image-with-location", response_model=dict)
 async def analyze_image_with_enhanced_location(
     image: UploadFile = File(...),
@@ -991,34 +1160,23 @@ async def analyze_image_with_enhanced_location(
             raise HTTPException(status_code=400, detail="Image file too large. Maximum size is 10MB")
         
         # Read image content
+        read_started = time.perf_counter()
         image_content = await image.read()
+        read_upload_ms = round((time.perf_counter() - read_started) * 1000, 2)
         
-        # Enhanced location processing
-        location_context = None
-        location_data = None
-        
-        if location_address:
-            # Geocode the address
-            location_data = await location_service.geocode_address(location_address)
-            if location_data:
-                location_context = f"{location_data['formatted_address']} (GPS: {location_data['latitude']:.6f}, {location_data['longitude']:.6f})"
-            else:
-                location_context = location_address
-        elif latitude and longitude:
-            # Reverse geocode the coordinates
-            address_data = await location_service.reverse_geocode(latitude, longitude)
-            if address_data:
-                location_context = f"{address_data['formatted_address']} (GPS: {latitude:.6f}, {longitude:.6f})"
-            else:
-                location_context = f"GPS Coordinates: {latitude:.6f}, {longitude:.6f}"
-        
-        # Perform AI analysis with enhanced location context
+        # Preprocessing and location resolution run concurrently, then Gemini
         try:
-            analysis_result = await gemini_service.analyze_image(
+            pipeline_result = await analysis_pipeline.run(
                 image_content=image_content,
-                location=location_context
+                location_address=location_address,
+                latitude=latitude,
+                longitude=longitude
             )
             
+            analysis_result = pipeline_result["analysis"]
+            location_data = pipeline_result["location_data"]
+            location_context = pipeline_result["location_context"]
+            
             # Add location data to the response
             if location_data:
                 analysis_result["location_data"] = location_data
@@ -1029,14 +1187,21 @@ async def analyze_image_with_enhanced_location(
                 "analysis": analysis_result,
                 "location_info": {
                     "provided_address": location_address,
-                    "coordinates": {"latitude": latitude, "longitude": longitude} if latitude and longitude else None,
+                    "coordinates": pipeline_result["coordinates"],
+                    "location_source": pipeline_result["location_source"],
+                    "captured_at": pipeline_result["exif"]["captured_at"],
                     "geocoded_data": location_data,
                     "context_used": location_context
                 },
                 "processing_info": {
                     "model": "Google Gemini 1.5 Flash",
                     "image_size": f"{len(image_content)} bytes",
-                    "location_enhanced": location_context is not None
+                    "location_enhanced": location_context is not None,
+                    "stage_status": pipeline_result["stage_status"],
+                    "stage_timings_ms": {
+                        "read_upload": read_upload_ms,
+                        **pipeline_result["stage_timings_ms"]
+                    }
                 }
             }
             
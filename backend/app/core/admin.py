@@ -0,0 +1,27 @@
+"""
+Admin access for debugging endpoints
+
+Debug endpoints (traces, profiles) are only served when ADMIN_API_TOKEN is set
+and the request carries it in the X-Admin-Token header. Without a configured
+token they answer 404, as if they did not exist.
+"""
+
+import hmac
+from typing import Optional
+from fastapi import Header, HTTPException
+from decouple import config
+
+
+ADMIN_API_TOKEN = config("ADMIN_API_TOKEN", default="")
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    return bool(ADMIN_API_TOKEN and token) and hmac.compare_digest(token, ADMIN_API_TOKEN)
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(default=None)) -> None:
+    """FastAPI dependency guarding admin-only endpoints"""
+    if not ADMIN_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
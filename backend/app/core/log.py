@@ -0,0 +1,212 @@
+"""
+Structured, non-blocking logging
+
+setup_logging() puts a single QueueHandler on the root logger. On the calling
+thread (usually the event loop) a log call only merges the message arguments,
+stamps the trace id and puts the record on a bounded queue; a QueueListener
+thread formats it (JSON lines by default, tracebacks included) and writes it to
+stdout or LOG_FILE. When the queue is full the record is dropped and counted in
+log_records_dropped_total{reason="queue_full"} rather than blocking the loop.
+
+Levels are set per logger:
+
+    LOG_LEVEL=INFO
+    LOG_LEVELS=httpx=WARNING,app.services.location_service=DEBUG
+
+Warnings and errors are rate limited per (logger, level, message template): the
+first LOG_RATE_LIMIT_BURST records in each LOG_RATE_LIMIT_WINDOW seconds pass,
+later ones are counted (reason="rate_limited") and the first record of the next
+window carries "suppressed": <count>. Log with %-style arguments, e.g.
+logger.error("Supabase select error: %s", e), so an error storm with varying
+exception text still shares one template.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from decouple import config, Csv
+
+from app.core.metrics import metrics
+from app.core.tracing import tracer
+
+
+# Attributes every LogRecord has; anything else was passed with extra={...}
+STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Upstream client libraries log every request at INFO
+DEFAULT_LOG_LEVELS = "httpx=WARNING,httpcore=WARNING"
+
+dropped_records = metrics.counter(
+    "log_records_dropped", "Log records dropped by the rate limiter or a full log queue", ("reason",)
+)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, message, trace_id and any extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in STANDARD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack_info"] = record.stack_info
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Passes `burst` records per message template per `window` seconds at WARNING and above"""
+
+    def __init__(self, burst: int, window: float, level: int = logging.WARNING, max_keys: int = 4096):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.level = level
+        self.max_keys = max_keys
+        # (logger, level, template) -> [window start, passed, suppressed]
+        self._windows: Dict[Tuple[str, int, str], List] = {}
+        # Records come from the loop thread and to_thread workers
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.levelno < self.level:
+            return True
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                if state is not None and state[2]:
+                    record.suppressed = state[2]
+                if state is None and len(self._windows) >= self.max_keys:
+                    self._expire(now)
+                self._windows[key] = [now, 1, 0]
+                return True
+            if state[1] < self.burst:
+                state[1] += 1
+                return True
+            state[2] += 1
+        dropped_records.inc(("rate_limited",))
+        return False
+
+    def _expire(self, now: float) -> None:
+        self._windows = {key: state for key, state in self._windows.items() if now - state[0] < self.window}
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records without formatting them; drops instead of waiting on a full queue"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Merge the arguments now (they may change once the caller moves on); tracebacks
+        # and JSON are formatted on the listener thread
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if getattr(record, "trace_id", None) is None:
+            record.trace_id = tracer.trace_id()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records.inc(("queue_full",))
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # Wait for room so shutdown still drains the queue
+        self.queue.put(self._sentinel)
+
+
+def parse_levels(value: str) -> Dict[str, int]:
+    """"httpx=WARNING,app.services=DEBUG" -> {logger name: level}"""
+    levels = {}
+    for item in Csv()(value):
+        name, _, level = item.partition("=")
+        if level:
+            levels[name.strip()] = logging.getLevelName(level.strip().upper())
+    return levels
+
+
+class LoggingSetup:
+    def __init__(self):
+        self.level = config("LOG_LEVEL", default="INFO").upper()
+        self.levels = parse_levels(DEFAULT_LOG_LEVELS)
+        self.levels.update(parse_levels(config("LOG_LEVELS", default="")))
+        self.format = config("LOG_FORMAT", default="json")
+        self.file = config("LOG_FILE", default="")
+        self.queue_size = config("LOG_QUEUE_SIZE", default=10000, cast=int)
+        self.rate_limit_burst = config("LOG_RATE_LIMIT_BURST", default=5, cast=int)
+        self.rate_limit_window = config("LOG_RATE_LIMIT_WINDOW", default=60, cast=float)
+
+        self.handler: Optional[NonBlockingQueueHandler] = None
+        self.listener: Optional[_Listener] = None
+
+    def _output(self) -> logging.Handler:
+        output = logging.FileHandler(self.file, encoding="utf-8") if self.file else logging.StreamHandler(sys.stdout)
+        output.setFormatter(JsonFormatter() if self.format == "json" else logging.Formatter(TEXT_FORMAT))
+        return output
+
+    def _start_listener(self) -> None:
+        self.handler.queue = queue.Queue(self.queue_size)
+        self.listener = _Listener(self.handler.queue, self._output())
+        self.listener.start()
+
+    def _after_fork(self) -> None:
+        # The listener thread does not survive a fork (gunicorn preload); each worker starts its own
+        if self.listener is not None:
+            self._start_listener()
+
+    def setup(self) -> None:
+        """Route all logging through the queue; safe to call more than once"""
+        if self.handler is not None:
+            return
+        self.handler = NonBlockingQueueHandler(queue.Queue(self.queue_size))
+        self.handler.addFilter(RateLimitFilter(self.rate_limit_burst, self.rate_limit_window))
+
+        root = logging.getLogger()
+        for existing in root.handlers[:]:
+            root.removeHandler(existing)
+        root.addHandler(self.handler)
+        root.setLevel(self.level)
+        for name, level in self.levels.items():
+            logging.getLogger(name).setLevel(level)
+
+        self._start_listener()
+        metrics.register_queue("log", lambda: self.handler.queue.qsize())
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Write out queued records and stop the listener thread"""
+        listener, self.listener = self.listener, None
+        if listener is not None and listener._thread is not None:
+            listener.stop()
+            for output in listener.handlers:
+                output.close()
+
+
+# Global instance
+logging_setup = LoggingSetup()
+
+
+def setup_logging() -> None:
+    logging_setup.setup()
@@ -0,0 +1,143 @@
+"""
+Event loop lag monitor and stall watchdog
+
+A heartbeat coroutine sleeps for LOOP_MONITOR_INTERVAL_MS and records how late
+it wakes up in event_loop_lag_seconds; any synchronous work on the loop (an
+SDK call, PIL decode, parsing a large JSON body) shows up as lag.
+
+A watchdog thread checks the heartbeat's deadline. Once it is overdue by more
+than LOOP_STALL_THRESHOLD_MS the loop thread is blocked right now, so the
+watchdog captures the loop thread's stack while the offending code is still on
+it. The stall is attributed to the route whose endpoint function is on that
+stack ("unattributed" for background tasks and tasks spawned by a request). Its
+duration (the heartbeat gap, an upper bound on the blocking call) is counted in event_loop_stalls_total{route} / event_loop_stall_seconds{route}
+once the loop recovers, logged with the stack and kept for
+/api/v1/debug/stalls.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Dict, Any, List, Optional
+from decouple import config
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LoopMonitor:
+    def __init__(self):
+        self.enabled = config("LOOP_MONITOR_ENABLED", default=True, cast=bool)
+        self.interval = config("LOOP_MONITOR_INTERVAL_MS", default=100, cast=float) / 1000
+        self.threshold = config("LOOP_STALL_THRESHOLD_MS", default=250, cast=float) / 1000
+        self.stalls: deque = deque(maxlen=config("LOOP_STALL_BUFFER_SIZE", default=100, cast=int))
+
+        self.lag = metrics.histogram("event_loop_lag_seconds", "How late the loop heartbeat woke up", buckets=LAG_BUCKETS)
+        self.stall_count = metrics.counter("event_loop_stalls", "Event loop stalls over the threshold by route", ("route",))
+        self.stall_duration = metrics.histogram(
+            "event_loop_stall_seconds", "Duration of event loop stalls by route", ("route",), buckets=LAG_BUCKETS
+        )
+
+        self._endpoint_routes: Dict[Any, str] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        # perf_counter time the heartbeat is due to wake up
+        self._deadline: Optional[float] = None
+        # Stall captured by the watchdog, completed by the heartbeat
+        self._stall: Optional[Dict[str, Any]] = None
+
+    def set_routes(self, routes) -> None:
+        """Map endpoint functions to their path templates for stack attribution"""
+        for route in routes:
+            endpoint = getattr(route, "endpoint", None)
+            code = getattr(endpoint, "__code__", None)
+            if code is not None:
+                self._endpoint_routes.setdefault(code, getattr(route, "path", "unattributed"))
+
+    def _attribute(self, frame) -> str:
+        while frame is not None:
+            route = self._endpoint_routes.get(frame.f_code)
+            if route:
+                return route
+            frame = frame.f_back
+        return "unattributed"
+
+    def _capture(self, deadline: float, overdue: float) -> None:
+        """Runs on the watchdog thread while the loop thread is blocked"""
+        frame = sys._current_frames().get(self._loop_thread)
+        if frame is None:
+            return
+        task = asyncio.current_task(self._loop)
+        self._stall = {
+            "deadline": deadline,
+            "route": self._attribute(frame),
+            "task": task.get_name() if task is not None else None,
+            "detected_at": time.time(),
+            "blocked_ms_at_capture": round((overdue + self.interval) * 1000, 1),
+            "duration_ms": None,
+            "stack": traceback.format_list(traceback.extract_stack(frame))
+        }
+
+    def _watch(self, stopped: threading.Event) -> None:
+        captured_deadline = None
+        while not stopped.wait(self.threshold / 4):
+            deadline = self._deadline
+            if deadline is None or deadline == captured_deadline:
+                continue
+            overdue = time.perf_counter() - deadline
+            if overdue > self.threshold:
+                captured_deadline = deadline
+                try:
+                    self._capture(deadline, overdue)
+                except Exception as e:
+                    logger.exception("Loop monitor capture error: %s", e)
+
+    def _finish_stall(self, deadline: float, lag: float) -> None:
+        stall, self._stall = self._stall, None
+        if stall.pop("deadline") == deadline:
+            stall["duration_ms"] = round((lag + self.interval) * 1000, 1)
+        else:
+            # Captured just as the loop recovered; the capture time is the best estimate
+            stall["duration_ms"] = stall["blocked_ms_at_capture"]
+        self.stalls.append(stall)
+        self.stall_count.inc((stall["route"],))
+        self.stall_duration.observe(stall["duration_ms"] / 1000, (stall["route"],))
+        logger.warning(
+            "Event loop blocked for %s ms in %s (task %s):\n%s",
+            stall["duration_ms"], stall["route"], stall["task"], "".join(stall["stack"]),
+            extra={"route": stall["route"], "duration_ms": stall["duration_ms"]}
+        )
+
+    async def run(self) -> None:
+        """Heartbeat loop; starts the watchdog thread and stops it when cancelled"""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        stopped = threading.Event()
+        watchdog = threading.Thread(target=self._watch, args=(stopped,), name="loop-watchdog", daemon=True)
+        watchdog.start()
+        try:
+            while True:
+                deadline = self._deadline = time.perf_counter() + self.interval
+                await asyncio.sleep(self.interval)
+                lag = max(0.0, time.perf_counter() - deadline)
+                self.lag.observe(lag)
+                if self._stall is not None:
+                    self._finish_stall(deadline, lag)
+        finally:
+            stopped.set()
+            self._deadline = None
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        return list(self.stalls)[-limit:][::-1]
+
+
+# Global instance
+loop_monitor = LoopMonitor()
@@ -0,0 +1,305 @@
+"""
+Prometheus metrics for the API and its upstream services
+
+A small in-process registry (counters, gauges and fixed-bucket histograms) that
+renders the Prometheus text exposition format at /metrics. Recording is a dict
+lookup and a few integer additions, so the per-request cost stays in the low
+microseconds (see benchmarks/bench_metrics.py).
+
+Collected:
+- http_request_duration_seconds{method, route, status}: latency per route template
+- http_requests_in_flight: requests currently being handled
+- upstream_request_duration_seconds{service, target, operation, outcome}:
+  every Supabase (table / verb), Gemini and Nominatim call
+- cache_requests_total{cache, result} and cache_hit_ratio{cache}
+- queue_depth{queue}: background work waiting (refreshes, cube operations, ...)
+
+Gauges that mirror state owned elsewhere (queue depths, hit ratios) are read
+through callbacks at scrape time instead of being updated on every change.
+
+Metrics are per process: under gunicorn each worker keeps its own registry and
+a scrape reports the worker that answered it, tagged with its pid.
+"""
+
+import logging
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple, Callable, Optional, Sequence
+from decouple import config
+
+logger = logging.getLogger(__name__)
+
+
+# Seconds; spans fast cache hits up to slow Gemini calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels: Labels = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        return [
+            (f"{self.name}_total", _format_labels(self.labelnames, labels), value)
+            for labels, value in self._values.items()
+        ]
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._functions: Dict[Labels, Callable[[], Optional[float]]] = {}
+
+    def set(self, value: float, labels: Labels = ()) -> None:
+        self._values[labels] = value
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: Labels = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set_function(self, function: Callable[[], Optional[float]], labels: Labels = ()) -> None:
+        """Read the value from `function` at scrape time (None skips the sample)"""
+        self._functions[labels] = function
+
+    def value(self, labels: Labels = ()) -> Optional[float]:
+        function = self._functions.get(labels)
+        return function() if function else self._values.get(labels, 0)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        samples = [
+            (self.name, _format_labels(self.labelnames, labels), value)
+            for labels, value in self._values.items()
+        ]
+        for labels, function in self._functions.items():
+            try:
+                value = function()
+            except Exception as e:
+                logger.error("Metrics gauge %s callback error: %s", self.name, e)
+                continue
+            if value is not None:
+                samples.append((self.name, _format_labels(self.labelnames, labels), value))
+        return samples
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (last one is +Inf), sum]; cumulated when rendered
+        self._series: Dict[Labels, list] = {}
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, labels: Labels = ()) -> int:
+        series = self._series.get(labels)
+        return sum(series[0]) if series else 0
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        samples = []
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for labels, (counts, total) in self._series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                samples.append((
+                    f"{self.name}_bucket", _format_labels(self.labelnames, labels, f'le="{bound}"'), cumulative
+                ))
+            samples.append((f"{self.name}_sum", _format_labels(self.labelnames, labels), total))
+            samples.append((f"{self.name}_count", _format_labels(self.labelnames, labels), cumulative))
+        return samples
+
+
+class UpstreamTimer:
+    """Context manager recording one upstream call in upstream_request_duration_seconds"""
+
+    __slots__ = ("registry", "labels", "started")
+
+    def __init__(self, registry: "MetricsRegistry", labels: Labels):
+        self.registry = registry
+        self.labels = labels
+
+    def __enter__(self) -> "UpstreamTimer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        outcome = "ok" if exc_type is None else "error"
+        self.registry.upstream_duration.observe(time.perf_counter() - self.started, self.labels + (outcome,))
+        return False
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.enabled = config("METRICS_ENABLED", default=True, cast=bool)
+        self._metrics: List = []
+
+        self.request_duration = self.histogram(
+            "http_request_duration_seconds", "HTTP request latency by route template and status",
+            ("method", "route", "status")
+        )
+        self.requests_in_flight = self.gauge("http_requests_in_flight", "HTTP requests currently being handled")
+        self.upstream_duration = self.histogram(
+            "upstream_request_duration_seconds", "Latency of calls to Supabase, Gemini and Nominatim",
+            ("service", "target", "operation", "outcome")
+        )
+        self.cache_requests = self.counter("cache_requests", "Cache lookups by result", ("cache", "result"))
+        self.cache_hit_ratio = self.gauge("cache_hit_ratio", "Fraction of cache lookups that hit", ("cache",))
+        self.queue_depth = self.gauge("queue_depth", "Background work items waiting", ("queue",))
+        self.gauge("process_pid", "Process id of the worker that answered the scrape").set_function(os.getpid)
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def track_upstream(self, service: str, target: str, operation: str) -> UpstreamTimer:
+        """Time an upstream call: `with metrics.track_upstream("supabase", table, "select"):`"""
+        return UpstreamTimer(self, (service, target, operation))
+
+    def record_cache(self, cache: str, hit: bool) -> None:
+        labels = (cache, "hit" if hit else "miss")
+        self.cache_requests._values[labels] = self.cache_requests._values.get(labels, 0) + 1
+        if (cache,) not in self.cache_hit_ratio._functions:
+            self.cache_hit_ratio.set_function(lambda: self._hit_ratio(cache), (cache,))
+
+    def _hit_ratio(self, cache: str) -> Optional[float]:
+        hits = self.cache_requests.value((cache, "hit"))
+        total = hits + self.cache_requests.value((cache, "miss"))
+        return hits / total if total else None
+
+    def register_queue(self, queue: str, depth: Callable[[], int]) -> None:
+        self.queue_depth.set_function(depth, (queue,))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+_route_templates: Dict[Callable, str] = {}
+
+
+def route_template(scope) -> str:
+    """Path template of the route that handled a request ("unmatched" when none did)
+
+    Starlette records the matched endpoint in the scope; it is mapped back to its
+    path template so /issues/{issue_id} is one series, not one per id.
+    """
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    route = _route_templates.get(endpoint)
+    if route is None:
+        for candidate in getattr(scope.get("app"), "routes", ()):
+            _route_templates.setdefault(getattr(candidate, "endpoint", None), getattr(candidate, "path", "unmatched"))
+        route = _route_templates.setdefault(endpoint, "unmatched")
+    return route
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency per route template and the in-flight gauge"""
+
+    def __init__(self, app, registry: Optional[MetricsRegistry] = None):
+        self.app = app
+        self.registry = registry or metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.registry.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = self.registry.requests_in_flight
+        in_flight._values[()] = in_flight._values.get((), 0) + 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight._values[()] -= 1
+            self.registry.request_duration.observe(elapsed, (scope["method"], route_template(scope), str(status)))
+
+
+# Global instance
+metrics = MetricsRegistry()
@@ -0,0 +1,246 @@
+"""
+On-demand sampling profiler for individual requests
+
+When PROFILING_ENABLED is set, requests are profiled if they carry an
+`X-Profile: 1` header together with a valid X-Admin-Token, or at random with
+probability PROFILE_SAMPLE_RATE. While at least one request is being profiled a
+daemon thread samples every thread's stack each PROFILE_INTERVAL_MS.
+
+Samples from the event loop thread are attributed to the profiled request when
+the task running at that moment belongs to it (the request's own task, or a task
+it created, tracked through a task factory installed with the middleware) and
+are rooted at "request"; other loop activity (concurrent requests, background
+tasks, idle select) is rooted at "loop:other". Worker threads (e.g.
+asyncio.to_thread image and Gemini work) are rooted at their thread name.
+
+Profiles are stored as collapsed stacks ("frame;frame;frame count" lines, the
+input format of flamegraph.pl and speedscope) keyed by the request's trace id,
+and served at /api/v1/debug/profiles. With PROFILING_ENABLED unset the
+middleware is not installed at all.
+"""
+
+import asyncio
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+import weakref
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional
+from decouple import config
+
+from app.core.admin import is_admin_token
+from app.core.metrics import route_template
+from app.core.tracing import tracer
+
+
+_current_profile: ContextVar[Optional["Profile"]] = ContextVar("current_profile", default=None)
+
+
+class Profile:
+    def __init__(self, trace_id: str, method: str, path: str, loop):
+        self.trace_id = trace_id
+        self.method = method
+        self.path = path
+        self.route = path
+        self.status: Optional[int] = None
+        self.loop = loop
+        self.loop_thread = threading.get_ident()
+        self.started_at = time.time()
+        self.duration_ms: Optional[float] = None
+        self.stacks: Counter = Counter()
+
+    @property
+    def sample_count(self) -> int:
+        return sum(self.stacks.values())
+
+    def collapsed(self) -> str:
+        """Collapsed stacks, heaviest first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "method": self.method,
+            "route": self.route,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "samples": self.sample_count,
+            "request_samples": sum(count for stack, count in self.stacks.items() if stack.startswith("request;"))
+        }
+
+
+def _frame_name(code, prefixes: List[str]) -> str:
+    filename = code.co_filename
+    for prefix in prefixes:
+        if filename.startswith(prefix):
+            filename = filename[len(prefix):]
+            break
+    # ';' separates frames in collapsed stacks
+    return f"{code.co_qualname} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self.enabled = config("PROFILING_ENABLED", default=False, cast=bool)
+        self.sample_rate = config("PROFILE_SAMPLE_RATE", default=0.0, cast=float)
+        self.interval = config("PROFILE_INTERVAL_MS", default=5, cast=float) / 1000
+        self.buffer_size = config("PROFILE_BUFFER_SIZE", default=50, cast=int)
+        self.max_depth = 128
+
+        self._active: List[Profile] = []
+        self._profiles: "OrderedDict[str, Profile]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._names: Dict[Any, str] = {}
+        # Task -> profile of the request that created it
+        self._task_profiles: "weakref.WeakKeyDictionary[asyncio.Task, Profile]" = weakref.WeakKeyDictionary()
+        # Shorten frame file names to paths relative to the app or site-packages
+        self._prefixes = sorted(
+            {os.path.join(path, "") for path in sys.path if path} | {os.path.join(os.getcwd(), "")},
+            key=len,
+            reverse=True
+        )
+
+    def start(self, profile: Profile) -> None:
+        with self._lock:
+            self._active.append(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self, profile: Profile) -> None:
+        with self._lock:
+            self._active.remove(profile)
+            self._profiles[profile.trace_id] = profile
+            while len(self._profiles) > self.buffer_size:
+                self._profiles.popitem(last=False)
+
+    def _stack(self, frame) -> List[str]:
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            name = self._names.get(code)
+            if name is None:
+                name = self._names[code] = _frame_name(code, self._prefixes)
+            names.append(name)
+            frame = frame.f_back
+        names.reverse()
+        return names
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        frames = sys._current_frames()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        with self._lock:
+            active = list(self._active)
+
+        stacks = {}
+        for thread_id, frame in frames.items():
+            if thread_id != own:
+                stacks[thread_id] = (frame, self._stack(frame))
+
+        for profile in active:
+            for thread_id, (frame, names) in stacks.items():
+                if thread_id == profile.loop_thread:
+                    task = asyncio.current_task(profile.loop)
+                    owner = self._task_profiles.get(task) if task is not None else None
+                    root = "request" if owner is profile else "loop:other"
+                else:
+                    root = thread_names.get(thread_id, f"thread-{thread_id}").replace(" ", "_")
+                profile.stacks[";".join([root] + names)] += 1
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+            self._sample()
+            time.sleep(self.interval)
+
+    def task_factory(self, loop, coro, context=None) -> asyncio.Task:
+        """Loop task factory tagging tasks created while a profiled request runs"""
+        task = asyncio.Task(coro, loop=loop, context=context)
+        profile = _current_profile.get()
+        if profile is not None:
+            self._task_profiles[task] = profile
+        return task
+
+    def track(self, profile: Profile):
+        """Attribute the current task, and tasks it creates from now on, to `profile`"""
+        if profile.loop.get_task_factory() is None:
+            profile.loop.set_task_factory(self.task_factory)
+        task = asyncio.current_task()
+        if task is not None:
+            self._task_profiles[task] = profile
+        return _current_profile.set(profile)
+
+    def untrack(self, token) -> None:
+        _current_profile.reset(token)
+        self._task_profiles.pop(asyncio.current_task(), None)
+
+    def recent(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return [profile.summary() for profile in reversed(profiles[-limit:])]
+
+    def get(self, trace_id: str) -> Optional[Profile]:
+        with self._lock:
+            return self._profiles.get(trace_id)
+
+
+def _wants_profile(scope) -> bool:
+    requested = False
+    token = None
+    for name, value in scope.get("headers", ()):
+        if name == b"x-profile":
+            requested = value.strip() in (b"1", b"true")
+        elif name == b"x-admin-token":
+            token = value.decode("latin-1")
+    return requested and is_admin_token(token)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling admin-requested and sampled requests (install only when enabled)"""
+
+    def __init__(self, app, profiler_instance: Optional[SamplingProfiler] = None):
+        self.app = app
+        self.profiler = profiler_instance or profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (
+            _wants_profile(scope) or (self.profiler.sample_rate and random.random() < self.profiler.sample_rate)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = tracer.trace_id() or secrets.token_hex(16)
+        profile = Profile(trace_id, scope["method"], scope["path"], asyncio.get_running_loop())
+        header = (b"x-profile-id", trace_id.encode("latin-1"))
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = list(message.get("headers", ())) + [header]
+            await send(message)
+
+        started = time.perf_counter()
+        token = self.profiler.track(profile)
+        self.profiler.start(profile)
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profile.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            profile.route = route_template(scope)
+            self.profiler.stop(profile)
+            self.profiler.untrack(token)
+
+
+# Global instance
+profiler = SamplingProfiler()
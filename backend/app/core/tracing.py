@@ -0,0 +1,259 @@
+"""
+Lightweight request tracing
+
+Each HTTP request gets a trace id (taken from an incoming X-Trace-Id or W3C
+traceparent header, otherwise generated) held in a contextvar, so it follows the
+request into awaited coroutines, gathered tasks and asyncio.to_thread workers.
+Code wraps upstream and CPU-heavy calls in spans:
+
+    with tracer.span("gemini.prepare_image", bytes=len(content)):
+        ...
+    with tracer.upstream("supabase", table, "select"):   # span + metrics histogram
+        ...
+
+Finished spans go to an in-memory ring buffer of recent requests (served by
+/api/v1/debug/traces) and, when TRACE_EXPORT_FILE is set, are appended to that
+file as JSON lines. Nothing is sent over the network. Spans outside a request
+(background warmers and reconcilers) are not recorded. Each request is its own
+record in the buffer even when clients reuse a trace id, so a record only ever
+holds the spans of one request.
+
+The trace id is returned to the client in the X-Trace-Id response header.
+"""
+
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional
+from decouple import config
+
+from app.core.metrics import metrics, route_template
+
+
+TRACE_ID_PATTERN = re.compile(r"^[0-9A-Za-z_-]{8,64}$")
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    __slots__ = ("tracer", "trace_id", "span_id", "parent_id", "root_id", "name", "attributes",
+                 "started_at", "_started", "duration_ms", "status", "_token")
+
+    def __init__(self, tracer: "Tracer", trace_id: str, parent: Optional["Span"], name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        # Root span of the request this span belongs to (keys its buffer record)
+        self.root_id = parent.root_id if parent else self.span_id
+        self.name = name
+        self.attributes = attributes
+        self.status = "ok"
+        self.duration_ms = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.duration_ms = round((time.perf_counter() - self._started) * 1000, 3)
+        if exc_type is not None:
+            self.status = "error"
+            self.attributes["error"] = f"{exc_type.__name__}: {exc}"
+        _current_span.reset(self._token)
+        self.tracer._finish(self)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes
+        }
+
+
+class _NoopSpan:
+    """Returned when no trace is active; costs one contextvar read"""
+
+    def set(self, **attributes) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _UpstreamSpan:
+    """A span and an upstream metrics timer in one context manager"""
+
+    __slots__ = ("span", "timer")
+
+    def __init__(self, span, timer):
+        self.span = span
+        self.timer = timer
+
+    def __enter__(self):
+        self.timer.__enter__()
+        return self.span.__enter__()
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self.span.__exit__(exc_type, exc, tb)
+        return self.timer.__exit__(exc_type, exc, tb)
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = config("TRACING_ENABLED", default=True, cast=bool)
+        # Fraction of requests traced; requests carrying a trace id are always traced
+        self.sample_rate = config("TRACE_SAMPLE_RATE", default=1.0, cast=float)
+        self.buffer_size = config("TRACE_BUFFER_SIZE", default=500, cast=int)
+        self.export_file = config("TRACE_EXPORT_FILE", default="")
+
+        # root span id -> finished spans of that request, oldest request first
+        self._traces: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        # Spans finish in to_thread workers too
+        self._lock = threading.Lock()
+        self._export = open(self.export_file, "a", encoding="utf-8") if self.enabled and self.export_file else None
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def trace_id(self) -> Optional[str]:
+        span = _current_span.get()
+        return span.trace_id if span else None
+
+    def start_trace(self, name: str, trace_id: Optional[str] = None, **attributes) -> Span:
+        """Root span of a new trace (enter it with `with`)"""
+        return Span(self, trace_id or secrets.token_hex(16), None, name, attributes)
+
+    def span(self, name: str, **attributes):
+        """Child span of the current span; a no-op outside a trace"""
+        parent = _current_span.get()
+        if parent is None:
+            return _NOOP_SPAN
+        return Span(self, parent.trace_id, parent, name, attributes)
+
+    def upstream(self, service: str, target: str, operation: str, **attributes):
+        """Span for an upstream call that is also timed in upstream_request_duration_seconds"""
+        return _UpstreamSpan(
+            self.span(f"{service}.{operation}", target=target, **attributes),
+            metrics.track_upstream(service, target, operation)
+        )
+
+    def _finish(self, span: Span) -> None:
+        record = span.to_dict()
+        with self._lock:
+            spans = self._traces.get(span.root_id)
+            if spans is None:
+                spans = self._traces[span.root_id] = []
+                while len(self._traces) > self.buffer_size:
+                    self._traces.popitem(last=False)
+            spans.append(record)
+            if self._export:
+                self._export.write(json.dumps(record, default=str) + "\n")
+                if span.parent_id is None:
+                    self._export.flush()
+
+    def recent(self, limit: int = 50, min_duration_ms: float = 0) -> List[Dict[str, Any]]:
+        """Summaries of recent finished requests, newest first"""
+        with self._lock:
+            traces = list(self._traces.values())
+        summaries = []
+        for spans in reversed(traces):
+            root = next((span for span in spans if span["parent_id"] is None), None)
+            if root is None or root["duration_ms"] < min_duration_ms:
+                continue
+            summaries.append({
+                "trace_id": root["trace_id"],
+                "name": root["name"],
+                "status": root["status"],
+                "started_at": root["started_at"],
+                "duration_ms": root["duration_ms"],
+                "span_count": len(spans),
+                "attributes": root["attributes"]
+            })
+            if len(summaries) >= limit:
+                break
+        return summaries
+
+    def get_trace(self, trace_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Spans of the most recent request with this trace id, ordered by start time"""
+        with self._lock:
+            spans = next(
+                (list(spans) for spans in reversed(self._traces.values()) if spans and spans[0]["trace_id"] == trace_id),
+                None
+            )
+        return sorted(spans, key=lambda span: span["started_at"]) if spans else None
+
+
+def _incoming_trace_id(scope) -> Optional[str]:
+    for name, value in scope.get("headers", ()):
+        if name == b"x-trace-id":
+            trace_id = value.decode("latin-1")
+            return trace_id if TRACE_ID_PATTERN.match(trace_id) else None
+        if name == b"traceparent":
+            # version-traceid-parentid-flags
+            parts = value.decode("latin-1").split("-")
+            if len(parts) == 4 and len(parts[1]) == 32:
+                return parts[1]
+    return None
+
+
+class TracingMiddleware:
+    """ASGI middleware opening the root span of each (sampled) HTTP request"""
+
+    def __init__(self, app, tracer_instance: Optional[Tracer] = None):
+        self.app = app
+        self.tracer = tracer_instance or tracer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = _incoming_trace_id(scope)
+        if trace_id is None and random.random() >= self.tracer.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        root = self.tracer.start_trace(f"{scope['method']} {scope['path']}", trace_id, method=scope["method"])
+        header = (b"x-trace-id", root.trace_id.encode("latin-1"))
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                root.attributes["status"] = message["status"]
+                message["headers"] = list(message.get("headers", ())) + [header]
+            await send(message)
+
+        with root:
+            try:
+                await self.app(scope, receive, send_with_trace_id)
+            finally:
+                route = route_template(scope)
+                root.name = f"{scope['method']} {route}"
+                root.attributes["route"] = route
+                root.attributes["path"] = scope["path"]
+
+
+# Global instance
+tracer = Tracer()
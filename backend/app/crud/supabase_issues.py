@@ -2,16 +2,159 @@
 Issue management using Supabase REST API
 """
 
+import asyncio
+import logging
+import time
 import uuid
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime, timezone
+import numpy as np
+from decouple import config
+from app.services import geo
 from app.services.supabase_client import supabase_client
+from app.services.analytics_engine import analytics_engine, ANALYTICS_COLUMNS
+from app.services.issue_store import issue_store
+from app.services.spatial_index import IssueSpatialIndex, issue_spatial_index, INDEXED_COLUMNS
+from app.services.rollup_cube import issue_rollup_cube, ROLLUP_COLUMNS
+from app.services.heatmap_tiles import heatmap_tiles
+
+logger = logging.getLogger(__name__)
+
+
+# Columns returned by nearby queries; the spatial index keeps the same fields
+NEARBY_COLUMNS = INDEXED_COLUMNS
+
+# Upper bound when widening the search area for k-nearest queries
+MAX_SEARCH_RADIUS_KM = 1000.0
+
+# Columns the change sync reads: everything the spatial index, issue store and rollup cube use
+SYNC_COLUMNS = ",".join(dict.fromkeys(
+    f"{INDEXED_COLUMNS},{ANALYTICS_COLUMNS},{ROLLUP_COLUMNS},updated_at".split(",")
+))
+
+
+def refine_nearby(
+    issues: List[Dict[str, Any]],
+    latitude: float,
+    longitude: float,
+    radius_km: float,
+    max_results: int
+) -> List[Dict[str, Any]]:
+    """Exact haversine refinement of bounding-box rows, one vectorized pass; closest first"""
+    distances = geo.haversine_km(
+        latitude,
+        longitude,
+        np.array([float(issue["latitude"]) for issue in issues]),
+        np.array([float(issue["longitude"]) for issue in issues])
+    )
+    
+    nearby_issues = []
+    for i in np.argsort(distances, kind="stable"):
+        if distances[i] > radius_km or len(nearby_issues) >= max_results:
+            break
+        issues[i]["distance_km"] = round(float(distances[i]), 2)
+        nearby_issues.append(issues[i])
+    
+    return nearby_issues
 
 
 class SupabaseIssueCRUD:
     def __init__(self):
         self.table = "issues"
         self.authorities_table = "authorities"
+        
+        # Optional database function for radius search (e.g. "nearby_issues")
+        self.nearby_rpc = config("NEARBY_ISSUES_RPC", default="")
+        # Maximum rows a cold map viewport scan reads
+        self.nearby_scan_limit = config("NEARBY_SCAN_LIMIT", default=5000, cast=int)
+        
+        # Seconds between polls for issues changed by other workers (0 disables the sync)
+        self.sync_interval = config("INDEX_SYNC_INTERVAL", default=5, cast=float)
+        # Seconds each poll re-reads before the previous one (clock skew, slow commits)
+        self.sync_overlap = config("INDEX_SYNC_OVERLAP", default=30, cast=float)
+        self._synced_at: Optional[float] = None
+        # id -> updated_at of the rows read by the previous poll, so overlapping reads are skipped
+        self._synced_rows: Dict[str, Any] = {}
+    
+    def _on_issue_created(self, issue: Dict[str, Any]) -> None:
+        """Keep in-memory indexes current with a newly created issue"""
+        issue_spatial_index.upsert(issue)
+        issue_rollup_cube.add(issue)
+        issue_store.upsert(issue)
+        if issue.get("latitude") is not None and issue.get("longitude") is not None:
+            heatmap_tiles.invalidate_point_soon(float(issue["latitude"]), float(issue["longitude"]))
+    
+    def _on_issue_status_changed(self, issue_id: str, status: str, updated_at: Optional[str] = None) -> None:
+        """Keep in-memory indexes current with an issue's new status"""
+        issue_spatial_index.update_fields(issue_id, status=status, updated_at=updated_at)
+        issue_rollup_cube.update_status(issue_id, status)
+        issue_store.update_status(issue_id, status)
+        # Status-filtered heatmap tiles change too
+        record = issue_spatial_index.get(issue_id)
+        if record:
+            heatmap_tiles.invalidate_point_soon(record["latitude"], record["longitude"])
+    
+    def _on_issue_synced(self, issue: Dict[str, Any]) -> None:
+        """Apply an issue row changed by any worker (created, moved or new status) to the in-memory indexes"""
+        previous = issue_spatial_index.get(issue["id"])
+        issue_spatial_index.upsert(issue)
+        issue_rollup_cube.add(issue)
+        issue_store.upsert(issue)
+        
+        points = set()
+        if previous:
+            points.add((previous["latitude"], previous["longitude"]))
+        if issue.get("latitude") is not None and issue.get("longitude") is not None:
+            points.add((float(issue["latitude"]), float(issue["longitude"])))
+        for latitude, longitude in points:
+            heatmap_tiles.invalidate_point_soon(latitude, longitude)
+    
+    async def sync_changes(self) -> int:
+        """Apply issues updated since the previous poll; returns how many rows changed"""
+        started = time.time()
+        since = datetime.fromtimestamp((self._synced_at or started) - self.sync_overlap, timezone.utc)
+        
+        synced_rows = {}
+        changed = 0
+        async for page in supabase_client.select_cursor(
+            table=self.table,
+            columns=SYNC_COLUMNS,
+            filters={"updated_at.gte": since.isoformat()},
+            key="id"
+        ):
+            for issue in page:
+                issue_id = str(issue["id"])
+                synced_rows[issue_id] = issue.get("updated_at")
+                if self._synced_rows.get(issue_id) == synced_rows[issue_id]:
+                    continue
+                self._on_issue_synced(issue)
+                changed += 1
+        
+        self._synced_rows = synced_rows
+        self._synced_at = started
+        return changed
+    
+    async def run_index_sync(self) -> None:
+        """Poll for issues written by any worker and apply them to this worker's indexes
+        
+        Create/status hooks only reach the worker that handled the write; this keeps
+        every other worker within sync_interval seconds of it. Start it together with
+        the warm-ups so changes made while they scan are picked up as well.
+        """
+        if self.sync_interval <= 0:
+            return
+        self._synced_at = time.time()
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                changed = await self.sync_changes()
+                if changed:
+                    logger.debug("Synced %s changed issues into the in-memory indexes", changed)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The window is not advanced, so the next poll retries it
+                logger.error("Error syncing issue changes: %s", e)
     
     async def create_issue(self, issue_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Create a new issue"""
@@ -40,10 +183,12 @@ class SupabaseIssueCRUD:
             #     data["ai_analysis"] = json.dumps(issue_data.get("ai_analysis"))
             
             result = await supabase_client.insert(self.table, data)
+            if result:
+                self._on_issue_created(result)
             return result
             
         except Exception as e:
-            print(f"Error creating issue: {e}")
+            logger.error("Error creating issue: %s", e)
             return None
     
     async def get_issues_by_user(self, user_id: str, limit: int = 10, offset: int = 0) -> List[Dict[str, Any]]:
@@ -59,7 +204,7 @@ class SupabaseIssueCRUD:
             return issues
             
         except Exception as e:
-            print(f"Error getting user issues: {e}")
+            logger.error("Error getting user issues: %s", e)
             return []
     
     async def get_issue_by_id(self, issue_id: str) -> Optional[Dict[str, Any]]:
@@ -74,7 +219,7 @@ class SupabaseIssueCRUD:
             return issues[0] if issues else None
             
         except Exception as e:
-            print(f"Error getting issue: {e}")
+            logger.error("Error getting issue: %s", e)
             return None
     
     async def update_issue_status(
@@ -95,7 +240,7 @@ class SupabaseIssueCRUD:
             )
             
             if not current_issue:
-                print(f"Issue {issue_id} not found")
+                logger.warning("Issue %s not found", issue_id)
                 return None
                 
             previous_status = current_issue[0].get("status")
@@ -109,12 +254,19 @@ class SupabaseIssueCRUD:
             if officer_notes:
                 update_data["resolution_notes"] = officer_notes
             
+            # Record when the issue was resolved so resolution times can be measured
+            if status == "resolved" and previous_status != "resolved":
+                update_data["actual_completion_date"] = update_data["updated_at"]
+            
             result = await supabase_client.update(
                 table=self.table,
                 data=update_data,
                 filters={"id": issue_id}
             )
             
+            if result:
+                self._on_issue_status_changed(issue_id, status, result.get("updated_at") or update_data["updated_at"])
+            
             # Create a record in issue_updates table for tracking history
             if result and updated_by_user_id:
                 update_record = {
@@ -132,7 +284,7 @@ class SupabaseIssueCRUD:
             return result
             
         except Exception as e:
-            print(f"Error updating issue status: {e}")
+            logger.error("Error updating issue status: %s", e)
             return None
     
     async def get_issue_status_history(self, issue_id: str) -> Dict[str, Any]:
@@ -191,7 +343,7 @@ class SupabaseIssueCRUD:
             }
             
         except Exception as e:
-            print(f"Error getting issue status history: {e}")
+            logger.error("Error getting issue status history: %s", e)
             return {}
     
     async def get_issues_by_category(self, category: str, limit: int = 50) -> List[Dict[str, Any]]:
@@ -207,7 +359,7 @@ class SupabaseIssueCRUD:
             return issues
             
         except Exception as e:
-            print(f"Error getting issues by category: {e}")
+            logger.error("Error getting issues by category: %s", e)
             return []
     
     async def get_all_issues(
@@ -242,7 +394,7 @@ class SupabaseIssueCRUD:
             return issues
             
         except Exception as e:
-            print(f"Error getting all issues: {e}")
+            logger.error("Error getting all issues: %s", e)
             return []
 
     async def get_issues_by_authority_category(
@@ -284,7 +436,7 @@ class SupabaseIssueCRUD:
             return issues
             
         except Exception as e:
-            print(f"Error getting issues by authority category: {e}")
+            logger.error("Error getting issues by authority category: %s", e)
             return []
     
     async def get_authorities(self, category: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -299,7 +451,7 @@ class SupabaseIssueCRUD:
             return authorities
             
         except Exception as e:
-            print(f"Error getting authorities: {e}")
+            logger.error("Error getting authorities: %s", e)
             return []
     
     async def create_authority(self, authority_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
@@ -322,67 +474,197 @@ class SupabaseIssueCRUD:
             return result
             
         except Exception as e:
-            print(f"Error creating authority: {e}")
+            logger.error("Error creating authority: %s", e)
             return None
     
-    async def get_nearby_issues(
-        self, 
-        latitude: float, 
-        longitude: float, 
-        radius_km: float = 10, 
-        limit: int = 100
-    ) -> List[Dict[str, Any]]:
-        """Get issues near a location"""
+    async def warm_spatial_index(self, page_size: int = 1000) -> int:
+        """Load every geolocated issue into the in-memory spatial index
+        
+        The scan raises on a failed page (select_cursor), so the index is only marked
+        ready after a complete scan; otherwise it stays cold and nearby/map queries
+        keep using the Supabase fallback.
+        """
         try:
-            # Get all issues with coordinates
-            issues = await supabase_client.select(
+            async for page in supabase_client.select_cursor(
                 table=self.table,
-                columns="*",
+                columns=INDEXED_COLUMNS,
                 filters={
                     "latitude.not.is": "null",
                     "longitude.not.is": "null"
                 },
-                limit=limit * 2,  # Get more to filter by distance
-                order="created_at.desc"
-            )
+                key="id",
+                page_size=page_size
+            ):
+                issue_spatial_index.load(page)
             
-            # Calculate distances and filter
-            nearby_issues = []
-            for issue in issues:
-                if issue.get("latitude") is None or issue.get("longitude") is None:
-                    continue
-                    
-                # Calculate distance using Haversine formula
-                lat1, lon1 = latitude, longitude
-                lat2, lon2 = float(issue["latitude"]), float(issue["longitude"])
-                
-                import math
-                
-                # Convert to radians
-                lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-                
-                # Haversine formula
-                dlat = lat2 - lat1
-                dlon = lon2 - lon1
-                a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-                c = 2 * math.asin(math.sqrt(a))
-                distance_km = 6371 * c  # Earth's radius in km
-                
-                if distance_km <= radius_km:
-                    issue["distance_km"] = round(distance_km, 2)
-                    nearby_issues.append(issue)
+            issue_spatial_index.is_ready = True
+            logger.info("Spatial index warmed with %s issues", len(issue_spatial_index))
+            return len(issue_spatial_index)
             
-            # Sort by distance and limit
-            nearby_issues.sort(key=lambda x: x.get("distance_km", 0))
-            return nearby_issues[:limit]
+        except Exception as e:
+            logger.error("Error warming spatial index: %s", e)
+            return 0
+    
+    async def warm_issue_store(self, page_size: int = 1000) -> int:
+        """Stream every issue into the columnar analytics store
+        
+        Marked ready only after a complete scan (select_cursor raises on a failed
+        page); until then analytics keep using the Supabase snapshot.
+        """
+        try:
+            async for page in supabase_client.select_cursor(
+                table=self.table,
+                columns=ANALYTICS_COLUMNS,
+                key="id",
+                page_size=page_size
+            ):
+                issue_store.load(page)
+            
+            # Resolved issues from before actual_completion_date was recorded
+            transitions = await analytics_engine.fetch_resolution_transitions(issue_store.resolved_without_completion())
+            for issue_id, resolved_at in transitions.items():
+                issue_store.set_completed_at(issue_id, resolved_at.isoformat())
+            
+            issue_store.is_ready = True
+            used, _ = issue_store.memory_bytes()
+            logger.info("Issue store warmed with %s issues (%.1f MB of columns)", len(issue_store), used / 1e6)
+            return len(issue_store)
             
         except Exception as e:
-            print(f"Error getting nearby issues: {e}")
+            logger.error("Error warming issue store: %s", e)
+            return 0
+    
+    async def get_nearby_issues(
+        self, 
+        latitude: float, 
+        longitude: float, 
+        radius_km: float = 10, 
+        limit: int = 100,
+        k_nearest: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Get issues near a location (within radius_km, or the k_nearest closest)"""
+        try:
+            if issue_spatial_index.is_ready:
+                if k_nearest:
+                    hits = issue_spatial_index.nearest(latitude, longitude, k_nearest)
+                else:
+                    hits = issue_spatial_index.within_radius(latitude, longitude, radius_km, limit)
+                
+                # Records hold every response field: no Supabase round trip
+                return [{**record, "distance_km": round(distance_km, 2)} for record, distance_km in hits]
+            
+            # Index not warmed yet: let the database bound the scan by area.
+            # For k-nearest, widen the area until enough issues are found.
+            search_radius_km = max(radius_km, 1.0)
+            while True:
+                nearby_issues = await self._query_nearby_by_area(
+                    latitude, longitude, search_radius_km, k_nearest or limit
+                )
+                if (not k_nearest or len(nearby_issues) >= k_nearest
+                        or search_radius_km >= MAX_SEARCH_RADIUS_KM):
+                    return nearby_issues[:k_nearest or limit]
+                search_radius_km = min(search_radius_km * 2, MAX_SEARCH_RADIUS_KM)
+            
+        except Exception as e:
+            logger.error("Error getting nearby issues: %s", e)
             return []
+    
+    async def _query_nearby_by_area(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        max_results: int
+    ) -> List[Dict[str, Any]]:
+        """Issues within radius_km, sorted by distance, using the coordinates index"""
+        if self.nearby_rpc:
+            # Database-side radius search (see nearby_issues() in database/schema.sql)
+            rows = await supabase_client.rpc(self.nearby_rpc, {
+                "center_lat": latitude,
+                "center_lon": longitude,
+                "radius_km": radius_km,
+                "max_results": max_results
+            })
+            if rows is not None:
+                for row in rows:
+                    row["distance_km"] = round(float(row["distance_km"]), 2)
+                return rows
+        
+        # Bounding box pushed to PostgREST (served by idx_issues_coordinates). Every
+        # row in the box is read, so the closest issues are found however many
+        # there are; only the max_results closest so far are kept between pages.
+        min_lat, min_lon, max_lat, max_lon = geo.bounding_box(latitude, longitude, radius_km)
+        nearby_issues = []
+        async for page in supabase_client.select_cursor(
+            table=self.table,
+            columns=NEARBY_COLUMNS,
+            filters={
+                "latitude.gte": min_lat,
+                "latitude.lte": max_lat,
+                "longitude.gte": min_lon,
+                "longitude.lte": max_lon
+            },
+            key="id"
+        ):
+            nearby_issues = refine_nearby(nearby_issues + page, latitude, longitude, radius_km, max_results)
+        
+        return nearby_issues
+
+    async def get_map_view(
+        self,
+        box: Tuple[float, float, float, float],
+        zoom: int,
+        limit: int = 2000
+    ) -> Dict[str, Any]:
+        """Cluster markers (low zoom) or individual issues (high zoom) inside a viewport box"""
+        index = issue_spatial_index
+        if not index.is_ready:
+            # Cold index: index just this viewport's rows from a bounding-box scan
+            min_lat, min_lon, max_lat, max_lon = box
+            rows = await supabase_client.select(
+                table=self.table,
+                columns=INDEXED_COLUMNS,
+                filters={
+                    "latitude.gte": min_lat,
+                    "latitude.lte": max_lat,
+                    "longitude.gte": min_lon,
+                    "longitude.lte": max_lon
+                },
+                limit=self.nearby_scan_limit
+            )
+            index = IssueSpatialIndex()
+            index.load(rows)
+        
+        if zoom <= index.map_grid.max_cluster_zoom:
+            clusters = index.map_grid.clusters(box, zoom)
+            return {
+                "mode": "clusters",
+                "clusters": clusters,
+                "total": sum(cluster["count"] for cluster in clusters)
+            }
+        
+        issues, total = index.within_box(box, limit)
+        return {
+            "mode": "issues",
+            "issues": issues,
+            "total": total,
+            "truncated": total > len(issues)
+        }
 
     async def get_analytics_data(self, days: int = 30) -> Dict[str, Any]:
         """Get analytics data for dashboard"""
         try:
+            if issue_store.is_ready:
+                # Group-bys over the columnar store's code columns
+                columns = issue_store.window(since=time.time() - days * 86400)
+                severities = np.bincount(columns["severity"].astype(np.int64), minlength=1)
+                return {
+                    "total_issues": int(columns["category"].size),
+                    "by_category": issue_store.group_count("category", columns["category"]),
+                    "by_status": issue_store.group_count("status", columns["status"]),
+                    "by_severity": {str(level): int(severities[level]) for level in np.flatnonzero(severities)}
+                }
+            
             # Get recent issues
             recent_issues = await supabase_client.select(
                 table=self.table,
@@ -415,7 +697,7 @@ class SupabaseIssueCRUD:
             return analytics
             
         except Exception as e:
-            print(f"Error getting analytics: {e}")
+            logger.error("Error getting analytics: %s", e)
             return {}
 
 
@@ -1,20 +1,66 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from decouple import config
+import asyncio
 import uvicorn
 import logging
 
+from app.core.log import setup_logging
+
+# Structured logging through a queue and a writer thread (see app/core/log.py);
+# set up before the services below are created so their startup messages are kept
+setup_logging()
+
 from app.api.v1.api import api_router
+from app.core.loop_monitor import loop_monitor
+from app.core.metrics import metrics, MetricsMiddleware
+from app.core.profiling import profiler, ProfilingMiddleware
+from app.core.responses import FastJSONResponse
+from app.core.tracing import TracingMiddleware
+from app.crud.supabase_issues import supabase_issues
+from app.services.analytics_refresher import analytics_refresher
+from app.services.rollup_cube import issue_rollup_cube
+from app.services.supabase_client import supabase_client
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    background_tasks = []
+    if loop_monitor.enabled:
+        # Loop lag histogram and stall stacks attributed to routes
+        loop_monitor.set_routes(app.routes)
+        background_tasks.append(asyncio.create_task(loop_monitor.run()))
+    
+    # Warm the spatial index, issue store and rollup cube in the background;
+    # nearby and analytics queries fall back to Supabase scans until they are ready
+    if supabase_client.is_available:
+        background_tasks.append(asyncio.create_task(supabase_issues.warm_spatial_index()))
+        background_tasks.append(asyncio.create_task(supabase_issues.warm_issue_store()))
+        background_tasks.append(asyncio.create_task(issue_rollup_cube.run_reconciler()))
+        # Apply writes handled by other workers (polls issues by updated_at)
+        background_tasks.append(asyncio.create_task(supabase_issues.run_index_sync()))
+        # Rebuild analytics responses on their refresh intervals (stale-while-revalidate)
+        background_tasks.append(asyncio.create_task(analytics_refresher.run()))
+    
+    yield
+    
+    for task in background_tasks:
+        if not task.done():
+            task.cancel()
+
+
 # Create FastAPI app
 app = FastAPI(
     title=config("PROJECT_NAME", default="SevaNet Issue Reporting API"),
     version="1.0.0",
-    description="API for reporting and managing civic issues in government portal"
+    description="API for reporting and managing civic issues in government portal",
+    # orjson rendering for every route (see app/core/responses.py)
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
 # Configure CORS - Allow all origins
@@ -26,6 +72,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request latency and in-flight metrics (wraps CORS, so CORS handling is timed too).
+# Middleware added later wraps middleware added earlier: tracing, added last, is outermost.
+app.add_middleware(MetricsMiddleware)
+
+# On-demand request profiling (inside tracing so profiles are keyed by trace id);
+# not installed at all unless PROFILING_ENABLED is set
+if profiler.enabled:
+    app.add_middleware(ProfilingMiddleware)
+
+# Request-scoped trace ids and spans (recent traces at /api/v1/debug/traces)
+app.add_middleware(TracingMiddleware)
+
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
 
@@ -41,6 +99,11 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus scrape endpoint (rendered on the event loop, where the metrics are updated)"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 @app.get("/test")
 def test_endpoint():
     """Test endpoint that doesn't require database"""
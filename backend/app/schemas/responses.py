@@ -0,0 +1,222 @@
+"""
+Response models for the issue list and analytics endpoints
+
+They document the response shapes in the OpenAPI schema and are checked against
+responses when RESPONSE_VALIDATION is on (see app/core/responses.py). Extra
+fields are allowed and passed through, so a column added to the issues table
+or a field added to a view reaches clients without a model change.
+"""
+
+from typing import Dict, List, Optional
+from pydantic import BaseModel, ConfigDict
+
+
+class ResponseModel(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+
+# Issues
+
+class Issue(ResponseModel):
+    """A row of the issues table as returned by PostgREST (list endpoints may select a subset)"""
+    id: str
+    user_id: Optional[str] = None
+    category: Optional[str] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    location: Optional[str] = None
+    image_url: Optional[str] = None
+    status: Optional[str] = None
+    severity_level: Optional[int] = None
+    assigned_authority_id: Optional[str] = None
+    booking_reference: Optional[str] = None
+    created_at: Optional[str] = None
+    updated_at: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    # Nearby searches only
+    distance_km: Optional[float] = None
+
+
+class IssueListResponse(ResponseModel):
+    success: bool
+    message: str
+    issues: List[Issue]
+    filters: Dict[str, Optional[str]]
+
+
+class UserReportsResponse(ResponseModel):
+    success: bool
+    message: str
+    reports: List[Issue]
+    total_count: int
+    page: int
+
+
+class NearbySearchParams(ResponseModel):
+    latitude: float
+    longitude: float
+    radius_km: float
+    limit: int
+    k_nearest: Optional[int] = None
+
+
+class NearbyIssuesResponse(ResponseModel):
+    success: bool
+    message: str
+    issues: List[Issue]
+    search_params: NearbySearchParams
+
+
+class MapCluster(ResponseModel):
+    latitude: float
+    longitude: float
+    count: int
+
+
+class MapViewport(ResponseModel):
+    min_lat: float
+    min_lon: float
+    max_lat: float
+    max_lon: float
+    zoom: int
+
+
+class MapIssuesResponse(ResponseModel):
+    """Cluster markers ("clusters" mode) or individual issues ("issues" mode)"""
+    success: bool
+    message: str
+    mode: str
+    total: int
+    clusters: Optional[List[MapCluster]] = None
+    issues: Optional[List[Issue]] = None
+    truncated: Optional[bool] = None
+    viewport: MapViewport
+
+
+# Analytics
+
+class AnalyticsResponse(ResponseModel):
+    success: bool
+    message: str
+    analysis_period: str
+    # Set when served by the stale-while-revalidate refresher
+    snapshot_age_seconds: Optional[float] = None
+    refreshed_at: Optional[str] = None
+    refreshing: Optional[bool] = None
+
+
+class DepartmentPerformance(ResponseModel):
+    category: str
+    name: str
+    total: int
+    resolved: int
+    pending: int
+    in_progress: int
+    resolution_rate: float
+    avg_satisfaction: float
+    unique_reporters: Optional[int] = None
+
+
+class DepartmentPerformanceResponse(AnalyticsResponse):
+    data: List[DepartmentPerformance]
+    total_departments: int
+
+
+class PeakHour(ResponseModel):
+    hour: str
+    hour_24: int
+    issues: int
+    percentage: float
+
+
+class PeakHoursResponse(AnalyticsResponse):
+    data: List[PeakHour]
+    busiest_hours: List[str]
+    total_issues: int
+
+
+class LocationHotspot(ResponseModel):
+    location: str
+    issues_count: int
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    top_category: str
+    categories: Dict[str, int]
+    avg_severity: float
+    unique_reporters: Optional[int] = None
+    # Coordinate clusters only
+    radius_km: Optional[float] = None
+    severity_score: Optional[float] = None
+
+
+class LocationHotspotsResponse(AnalyticsResponse):
+    data: List[LocationHotspot]
+    total_locations: int
+    noise_issues: Optional[int] = None
+    clustering: Optional[str] = None
+
+
+class CategoryShare(ResponseModel):
+    category: str
+    count: int
+    percentage: float
+
+
+class CategoryDistributionResponse(AnalyticsResponse):
+    data: List[CategoryShare]
+    total_issues: int
+
+
+class DurationSummary(ResponseModel):
+    count: int
+    mean: Optional[float] = None
+    p50: Optional[float] = None
+    p90: Optional[float] = None
+    p99: Optional[float] = None
+
+
+class ResolutionTrends(ResponseModel):
+    total_created: int
+    total_resolved: int
+    total_pending: int
+    total_in_progress: int
+    resolution_rate: float
+    avg_resolution_time: str
+    satisfaction_score: float
+    resolution_time_hours: Optional[DurationSummary] = None
+    resolution_time_by_category: Optional[Dict[str, DurationSummary]] = None
+    resolution_time_by_authority: Optional[Dict[str, DurationSummary]] = None
+
+
+class ResolutionTrendsResponse(AnalyticsResponse):
+    data: ResolutionTrends
+
+
+class UniqueReporters(ResponseModel):
+    overall: int
+    by_category: Dict[str, int] = {}
+
+
+class DashboardSummary(ResponseModel):
+    total_issues: int
+    by_status: Dict[str, int]
+    by_severity: Dict[str, int]
+    by_district: Optional[Dict[str, int]] = None
+    unique_reporters: UniqueReporters
+    source: str
+    generated_at: str
+
+
+class DashboardSections(ResponseModel):
+    department_performance: DepartmentPerformanceResponse
+    peak_hours: PeakHoursResponse
+    location_hotspots: LocationHotspotsResponse
+    category_distribution: CategoryDistributionResponse
+    resolution_trends: ResolutionTrendsResponse
+
+
+class DashboardResponse(AnalyticsResponse):
+    data: DashboardSections
+    summary: Optional[DashboardSummary] = None
+
@@ -0,0 +1,20 @@
+"""
+Gunicorn worker class for production: uvicorn on uvloop and httptools
+
+Used by gunicorn.conf.py; keep-alive, backlog and max-requests come from the
+gunicorn settings, and the rest of the uvicorn settings are fixed here.
+"""
+
+from decouple import config
+from uvicorn.workers import UvicornWorker
+
+
+class ProductionUvicornWorker(UvicornWorker):
+    CONFIG_KWARGS = {
+        # C event loop and HTTP parser instead of asyncio's default loop and h11
+        "loop": config("SERVER_LOOP", default="uvloop"),
+        "http": config("SERVER_HTTP", default="httptools"),
+        "lifespan": "on",
+        "proxy_headers": True,
+        "server_header": False
+    }
@@ -0,0 +1,168 @@
+"""
+Staged pipeline for image analysis with location enrichment
+
+Image preprocessing and location resolution do not depend on each other, so
+they run concurrently. The Gemini prompt is assembled once both have finished.
+Every stage has its own timeout and degrades on its own: a slow geocoder falls
+back to the raw address/coordinates, a slow model falls back to an error
+analysis, and only a broken image aborts the request. The analysis stage is
+reported "error" when the model call failed and "degraded" when its reply could
+not be parsed and the keyword fallback was used.
+
+When the form carries no address or coordinates, the EXIF GPS tags read during
+preprocessing are used instead, resolved locally (geocode cache or district
+lookup) so no extra network round trip is paid.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Any, Optional, Tuple
+from decouple import config
+
+from app.services.gemini_analysis import gemini_service
+from app.services.location_service import location_service
+
+logger = logging.getLogger(__name__)
+
+
+class ImageAnalysisPipeline:
+    def __init__(self):
+        # Per-stage timeouts in seconds
+        self.preprocess_timeout = config("PIPELINE_PREPROCESS_TIMEOUT", default=10.0, cast=float)
+        self.location_timeout = config("PIPELINE_LOCATION_TIMEOUT", default=4.0, cast=float)
+        self.analysis_timeout = config("PIPELINE_ANALYSIS_TIMEOUT", default=30.0, cast=float)
+
+    async def _timed(self, coro, timeout: float) -> Tuple[str, Any, float]:
+        """Run a stage coroutine, returning (status, result, elapsed_ms)"""
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(coro, timeout=timeout)
+            status = "ok"
+        except asyncio.TimeoutError:
+            result, status = None, "timeout"
+        except ValueError:
+            # Invalid input (e.g. undecodable image) is not a degradable failure
+            raise
+        except Exception as e:
+            logger.error("Pipeline stage error: %s", e)
+            result, status = None, "error"
+
+        return status, result, round((time.perf_counter() - started) * 1000, 2)
+
+    async def _preprocess(self, image_content: bytes) -> Dict[str, Any]:
+        """Decode, resize and re-encode the image (and read EXIF) in a worker thread"""
+        return await asyncio.to_thread(gemini_service.prepare_image, image_content)
+
+    async def _resolve_location(
+        self,
+        location_address: Optional[str],
+        latitude: Optional[float],
+        longitude: Optional[float]
+    ) -> Dict[str, Any]:
+        """Geocode the address or reverse geocode the coordinates"""
+        if location_address:
+            return {"geocoded": await location_service.geocode_address(location_address)}
+        if latitude and longitude:
+            return {"reverse": await location_service.reverse_geocode(latitude, longitude)}
+        return {}
+
+    def build_location_context(
+        self,
+        resolved: Optional[Dict[str, Any]],
+        location_address: Optional[str],
+        latitude: Optional[float],
+        longitude: Optional[float]
+    ) -> Optional[str]:
+        """Assemble the location context for the prompt from whatever resolved"""
+        resolved = resolved or {}
+
+        if location_address:
+            location_data = resolved.get("geocoded")
+            if location_data:
+                return f"{location_data['formatted_address']} (GPS: {location_data['latitude']:.6f}, {location_data['longitude']:.6f})"
+            return location_address
+
+        if latitude and longitude:
+            address_data = resolved.get("reverse")
+            if address_data:
+                return f"{address_data['formatted_address']} (GPS: {latitude:.6f}, {longitude:.6f})"
+            return f"GPS Coordinates: {latitude:.6f}, {longitude:.6f}"
+
+        return None
+
+    async def run(
+        self,
+        image_content: bytes,
+        location_address: Optional[str] = None,
+        latitude: Optional[float] = None,
+        longitude: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Run preprocessing and location concurrently, then the AI analysis"""
+        started = time.perf_counter()
+
+        (preprocess_status, prepared, preprocess_ms), (location_status, resolved, location_ms) = await asyncio.gather(
+            self._timed(self._preprocess(image_content), self.preprocess_timeout),
+            self._timed(self._resolve_location(location_address, latitude, longitude), self.location_timeout)
+        )
+
+        image_base64 = prepared["image_base64"] if prepared else None
+        exif = prepared["exif"] if prepared else {"gps": None, "captured_at": None}
+
+        location_source = None
+        if location_address:
+            location_source = "address"
+        elif latitude and longitude:
+            location_source = "coordinates"
+        elif exif["gps"]:
+            # Fall back to the photo's own GPS tags, resolved without the network
+            exif_started = time.perf_counter()
+            latitude, longitude = exif["gps"]["latitude"], exif["gps"]["longitude"]
+            resolved = {"reverse": location_service.resolve_coordinates_locally(latitude, longitude)}
+            location_source = "exif"
+            location_ms = round(location_ms + (time.perf_counter() - exif_started) * 1000, 2)
+
+        location_context = self.build_location_context(resolved, location_address, latitude, longitude)
+
+        if image_base64 is None:
+            # Without a processed image there is nothing to send to the model
+            analysis_status, analysis_ms = "skipped", 0.0
+            analysis_result = gemini_service._create_error_response(
+                f"Image preprocessing {preprocess_status}", location_context
+            )
+        else:
+            analysis_status, analysis_result, analysis_ms = await self._timed(
+                gemini_service.analyze_prepared_image(image_base64, location_context),
+                self.analysis_timeout
+            )
+            if analysis_result is None:
+                analysis_result = gemini_service._create_error_response(
+                    f"AI analysis {analysis_status}", location_context
+                )
+            elif analysis_status == "ok":
+                # Gemini failures come back as error/fallback analyses, not exceptions
+                analysis_status = gemini_service.result_status(analysis_result)
+
+        return {
+            "analysis": analysis_result,
+            "location_data": (resolved or {}).get("geocoded"),
+            "location_context": location_context,
+            "location_source": location_source,
+            "coordinates": {"latitude": latitude, "longitude": longitude} if latitude and longitude else None,
+            "exif": exif,
+            "stage_status": {
+                "preprocess": preprocess_status,
+                "location": location_status,
+                "analysis": analysis_status
+            },
+            "stage_timings_ms": {
+                "preprocess": preprocess_ms,
+                "location": location_ms,
+                "analysis": analysis_ms,
+                "pipeline_total": round((time.perf_counter() - started) * 1000, 2)
+            }
+        }
+
+
+# Global instance
+analysis_pipeline = ImageAnalysisPipeline()
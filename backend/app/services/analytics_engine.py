@@ -0,0 +1,438 @@
+"""
+Single-pass analytics engine for issue dashboards
+
+All dashboard aggregates (category, status, severity, hour-of-day, per-location,
+resolution and satisfaction figures) are built from one scan of the issues in
+the requested window, in one pass, and cached per window so every analytics
+endpoint is a cheap view over the same snapshot. The cache keeps the
+ANALYTICS_SNAPSHOT_CACHE_SIZE most recently used windows. Once the columnar issue store
+is loaded, the snapshot is computed from its arrays instead of a Supabase scan.
+"""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional
+import numpy as np
+from decouple import config
+
+from app.services import geo
+from app.services.issue_store import ColumnarIssueStore, issue_store
+from app.services.sketches import DDSketch, HyperLogLog
+from app.services.supabase_client import supabase_client
+from app.services.timestamps import parse_timestamp, MISSING_EPOCH
+
+
+# Columns needed by every aggregate in the snapshot
+ANALYTICS_COLUMNS = (
+    "id,user_id,category,status,severity_level,location,latitude,longitude,"
+    "created_at,actual_completion_date,citizen_satisfaction_rating,assigned_authority_id"
+)
+
+PENDING_STATUSES = ("pending", "under_review")
+IN_PROGRESS_STATUSES = ("assigned", "in_progress")
+
+# Relative error of the resolution-time quantiles
+RESOLUTION_SKETCH_ACCURACY = 0.01
+
+# HyperLogLog precision for unique reporters: 2^11 one-byte registers (2 KB), ~2.3% error
+REPORTER_SKETCH_PRECISION = 11
+
+
+class AnalyticsEngine:
+    def __init__(self):
+        # Seconds a snapshot is served before it is rebuilt
+        self.snapshot_ttl = config("ANALYTICS_SNAPSHOT_TTL", default=60, cast=int)
+        self.page_size = config("ANALYTICS_PAGE_SIZE", default=1000, cast=int)
+        # Issue ids per issue_updates lookup (keeps the URL short)
+        self.transition_batch_size = 200
+
+        # Windows (distinct `days` values) kept, least recently used evicted first
+        self.cache_size = config("ANALYTICS_SNAPSHOT_CACHE_SIZE", default=8, cast=int)
+
+        self._snapshots: OrderedDict = OrderedDict()
+        self._locks: Dict[int, asyncio.Lock] = {}
+
+    async def get_snapshot(self, days: int, max_age: Optional[float] = None) -> Dict[str, Any]:
+        """Cached snapshot for the last `days` days, rebuilt once older than max_age (default: the TTL)"""
+        max_age = self.snapshot_ttl if max_age is None else max_age
+        snapshot = self._snapshots.get(days)
+        if snapshot and time.monotonic() - snapshot["built_at"] < max_age:
+            self._snapshots.move_to_end(days)
+            return snapshot
+
+        # Concurrent requests for the same window share a single rebuild
+        lock = self._locks.setdefault(days, asyncio.Lock())
+        async with lock:
+            snapshot = self._snapshots.get(days)
+            if snapshot and time.monotonic() - snapshot["built_at"] < max_age:
+                return snapshot
+
+            if issue_store.is_ready:
+                snapshot = self.compute_columnar(days)
+            else:
+                issues = await self.fetch_issues(days)
+                missing = [
+                    str(issue["id"]) for issue in issues
+                    if issue.get("status") == "resolved" and not issue.get("actual_completion_date")
+                ]
+                snapshot = self.compute(issues, days, await self.fetch_resolution_transitions(missing))
+            self._store(days, snapshot)
+            return snapshot
+
+    def _store(self, days: int, snapshot: Dict[str, Any]) -> None:
+        self._snapshots[days] = snapshot
+        self._snapshots.move_to_end(days)
+        while len(self._snapshots) > self.cache_size:
+            evicted, _ = self._snapshots.popitem(last=False)
+            lock = self._locks.get(evicted)
+            if lock is not None and not lock.locked():
+                del self._locks[evicted]
+
+    async def fetch_issues(self, days: int) -> List[Dict[str, Any]]:
+        """One paged scan of the issues created in the window"""
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).isoformat()
+
+        issues: List[Dict[str, Any]] = []
+        async for page in supabase_client.select_pages(
+            table="issues",
+            columns=ANALYTICS_COLUMNS,
+            filters={"created_at.gte": cutoff},
+            order="created_at.desc",
+            page_size=self.page_size
+        ):
+            issues.extend(page)
+        return issues
+
+    async def fetch_resolution_transitions(self, issue_ids: List[str]) -> Dict[str, datetime]:
+        """When each issue first moved to resolved, from issue_updates"""
+        transitions: Dict[str, datetime] = {}
+        for start in range(0, len(issue_ids), self.transition_batch_size):
+            updates = await supabase_client.select(
+                table="issue_updates",
+                columns="issue_id,created_at",
+                filters={
+                    "issue_id.in": issue_ids[start:start + self.transition_batch_size],
+                    "new_status": "resolved"
+                },
+                order="created_at.asc"
+            )
+            for update in updates:
+                resolved_at = parse_timestamp(update.get("created_at"))
+                if resolved_at and str(update.get("issue_id")) not in transitions:
+                    transitions[str(update["issue_id"])] = resolved_at
+        return transitions
+
+    def compute(
+        self,
+        issues: List[Dict[str, Any]],
+        days: int,
+        resolved_at: Optional[Dict[str, datetime]] = None
+    ) -> Dict[str, Any]:
+        """Build every dashboard aggregate in a single pass over the issues"""
+        resolved_at = resolved_at or {}
+        by_status: Dict[str, int] = {}
+        by_severity: Dict[str, int] = {}
+        by_category: Dict[str, Dict[str, Any]] = {}
+        by_location: Dict[str, Dict[str, Any]] = {}
+        location_vectors: Dict[str, List[float]] = {}
+        location_reporters: Dict[str, set] = {}
+        by_hour = [0] * 24
+        resolution = {
+            "resolved": 0,
+            "pending": 0,
+            "in_progress": 0,
+            "resolution_hours_sum": 0.0,
+            "resolution_count": 0
+        }
+        satisfaction = {"sum": 0, "count": 0}
+        resolution_sketches = {
+            "overall": DDSketch(RESOLUTION_SKETCH_ACCURACY),
+            "by_category": {},
+            "by_authority": {}
+        }
+        reporter_sketches = {"overall": HyperLogLog(REPORTER_SKETCH_PRECISION), "by_category": {}}
+
+        for issue in issues:
+            category = issue.get("category") or "unknown"
+            status = issue.get("status") or "pending"
+            severity = issue.get("severity_level") or 1
+            rating = issue.get("citizen_satisfaction_rating")
+
+            by_status[status] = by_status.get(status, 0) + 1
+            by_severity[str(severity)] = by_severity.get(str(severity), 0) + 1
+
+            stats = by_category.get(category)
+            if stats is None:
+                stats = by_category[category] = {
+                    "total": 0,
+                    "resolved": 0,
+                    "pending": 0,
+                    "in_progress": 0,
+                    "satisfaction_sum": 0,
+                    "satisfaction_count": 0,
+                    "resolution_hours_sum": 0.0,
+                    "resolution_count": 0
+                }
+            stats["total"] += 1
+
+            reporter = issue.get("user_id")
+            if reporter:
+                reporter = str(reporter)
+                reporter_sketches["overall"].add(reporter)
+                if category not in reporter_sketches["by_category"]:
+                    reporter_sketches["by_category"][category] = HyperLogLog(REPORTER_SKETCH_PRECISION)
+                reporter_sketches["by_category"][category].add(reporter)
+
+            if status == "resolved":
+                stats["resolved"] += 1
+                resolution["resolved"] += 1
+            elif status in PENDING_STATUSES:
+                stats["pending"] += 1
+                resolution["pending"] += 1
+            elif status in IN_PROGRESS_STATUSES:
+                stats["in_progress"] += 1
+                resolution["in_progress"] += 1
+
+            if rating:
+                stats["satisfaction_sum"] += rating
+                stats["satisfaction_count"] += 1
+                satisfaction["sum"] += rating
+                satisfaction["count"] += 1
+
+            created_at = parse_timestamp(issue.get("created_at"))
+            if created_at:
+                by_hour[created_at.hour] += 1
+
+                completed_at = parse_timestamp(issue.get("actual_completion_date")) or resolved_at.get(str(issue.get("id")))
+                if completed_at and completed_at >= created_at:
+                    hours = (completed_at - created_at).total_seconds() / 3600
+                    stats["resolution_hours_sum"] += hours
+                    stats["resolution_count"] += 1
+                    resolution["resolution_hours_sum"] += hours
+                    resolution["resolution_count"] += 1
+
+                    authority = str(issue.get("assigned_authority_id") or "unassigned")
+                    resolution_sketches["overall"].add(hours)
+                    for group, key in (("by_category", category), ("by_authority", authority)):
+                        if key not in resolution_sketches[group]:
+                            resolution_sketches[group][key] = DDSketch(RESOLUTION_SKETCH_ACCURACY)
+                        resolution_sketches[group][key].add(hours)
+
+            location = issue.get("location") or "Unknown Location"
+            place = by_location.get(location)
+            if place is None:
+                place = by_location[location] = {
+                    "count": 0,
+                    "latitude": None,
+                    "longitude": None,
+                    "categories": {},
+                    "severities": {}
+                }
+                location_vectors[location] = [0.0, 0.0, 0.0]
+                location_reporters[location] = set()
+            place["count"] += 1
+            if reporter:
+                location_reporters[location].add(reporter)
+            place["categories"][category] = place["categories"].get(category, 0) + 1
+            place["severities"][severity] = place["severities"].get(severity, 0) + 1
+            if issue.get("latitude") is not None and issue.get("longitude") is not None:
+                # Unit-vector sums give the spherical centroid of the location's reports
+                latitude, longitude = math.radians(float(issue["latitude"])), math.radians(float(issue["longitude"]))
+                vector = location_vectors[location]
+                vector[0] += math.cos(latitude) * math.cos(longitude)
+                vector[1] += math.cos(latitude) * math.sin(longitude)
+                vector[2] += math.sin(latitude)
+
+        for location, (x, y, z) in location_vectors.items():
+            if x or y or z:
+                latitude, longitude = geo.from_unit_vectors(x, y, z)
+                by_location[location]["latitude"] = float(latitude)
+                by_location[location]["longitude"] = float(longitude)
+        for location, reporters in location_reporters.items():
+            by_location[location]["unique_reporters"] = len(reporters)
+
+        return {
+            "days": days,
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "built_at": time.monotonic(),
+            "source": "scan",
+            "total_issues": len(issues),
+            "by_status": by_status,
+            "by_severity": by_severity,
+            "by_category": by_category,
+            "by_hour": by_hour,
+            "by_location": by_location,
+            "resolution": resolution,
+            "satisfaction": satisfaction,
+            "resolution_sketches": resolution_sketches,
+            "unique_reporters": self._reporter_counts(reporter_sketches)
+        }
+
+    @staticmethod
+    def _reporter_counts(sketches: Dict[str, Any]) -> Dict[str, Any]:
+        """Distinct-reporter estimates from HyperLogLog sketches, overall and per group"""
+        return {
+            key: sketch.count() if isinstance(sketch, HyperLogLog) else {
+                value: group_sketch.count() for value, group_sketch in sketch.items()
+            }
+            for key, sketch in sketches.items()
+        }
+
+    def compute_columnar(self, days: int, store: Optional[ColumnarIssueStore] = None) -> Dict[str, Any]:
+        """The same snapshot as compute(), from vectorized group-bys over the columnar issue store"""
+        store = issue_store if store is None else store
+        columns = store.window(since=time.time() - days * 86400)
+        names = {name: dictionary.values for name, dictionary in store.dictionaries.items()}
+        category, status, severity, rating = columns["category"], columns["status"], columns["severity"], columns["rating"]
+        n_categories = len(names["category"])
+
+        def status_mask(statuses) -> np.ndarray:
+            codes = [store.dictionaries["status"].code(name) for name in statuses]
+            return np.isin(status, codes)
+
+        def per_category(mask: np.ndarray, weights: np.ndarray = None) -> np.ndarray:
+            return np.bincount(
+                category[mask], weights=None if weights is None else weights[mask], minlength=n_categories
+            )
+
+        resolved = status_mask(("resolved",))
+        pending = status_mask(PENDING_STATUSES)
+        in_progress = status_mask(IN_PROGRESS_STATUSES)
+        rated = rating > 0
+        completed = (columns["completed_at"] != MISSING_EPOCH) & (columns["completed_at"] >= columns["created_at"])
+        hours = (columns["completed_at"][completed] - columns["created_at"][completed]) / 3600
+
+        everything = np.ones(category.size, dtype=bool)
+        totals = per_category(everything)
+        category_stats = {
+            "total": totals,
+            "resolved": per_category(resolved),
+            "pending": per_category(pending),
+            "in_progress": per_category(in_progress),
+            "satisfaction_sum": per_category(rated, rating.astype(np.int64)),
+            "satisfaction_count": per_category(rated),
+            "resolution_hours_sum": np.bincount(category[completed], weights=hours, minlength=n_categories),
+            "resolution_count": per_category(completed)
+        }
+        by_category = {
+            names["category"][code]: {
+                key: float(values[code]) if key == "resolution_hours_sum" else int(values[code])
+                for key, values in category_stats.items()
+            }
+            for code in np.flatnonzero(totals)
+        }
+
+        severity_counts = np.bincount(severity.astype(np.int64), minlength=1)
+        by_severity = {str(level): int(severity_counts[level]) for level in np.flatnonzero(severity_counts)}
+
+        resolution_sketches = {
+            "overall": DDSketch(RESOLUTION_SKETCH_ACCURACY),
+            "by_category": {},
+            "by_authority": {}
+        }
+        resolution_sketches["overall"].add_many(hours)
+
+        reporter_hashes = store.reporter_hashes()[columns["reporter"]]
+        known_reporter = reporter_hashes != 0
+        reporter_sketches = {"overall": HyperLogLog(REPORTER_SKETCH_PRECISION), "by_category": {}}
+        reporter_sketches["overall"].add_hashes(reporter_hashes[known_reporter])
+        reporter_categories = category[known_reporter]
+        order = np.argsort(reporter_categories, kind="stable")
+        group_codes, starts = np.unique(reporter_categories[order], return_index=True)
+        for code, hashes in zip(group_codes.tolist(), np.split(reporter_hashes[known_reporter][order], starts[1:])):
+            sketch = reporter_sketches["by_category"][names["category"][code]] = HyperLogLog(REPORTER_SKETCH_PRECISION)
+            sketch.add_hashes(hashes)
+        for group, column in (("by_category", "category"), ("by_authority", "authority")):
+            codes = columns[column][completed]
+            order = np.argsort(codes, kind="stable")
+            group_codes, starts = np.unique(codes[order], return_index=True)
+            for code, values in zip(group_codes.tolist(), np.split(hours[order], starts[1:])):
+                sketch = resolution_sketches[group][names[column][code]] = DDSketch(RESOLUTION_SKETCH_ACCURACY)
+                sketch.add_many(values)
+
+        return {
+            "days": days,
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "built_at": time.monotonic(),
+            "source": "columnar",
+            "total_issues": int(category.size),
+            "by_status": store.group_count("status", status),
+            "by_severity": by_severity,
+            "by_category": by_category,
+            "by_hour": np.bincount((columns["created_at"] % 86400) // 3600, minlength=24).tolist(),
+            "by_location": self._columnar_locations(columns, names, store.dictionaries["reporter"].code("anonymous")),
+            "resolution": {
+                "resolved": int(resolved.sum()),
+                "pending": int(pending.sum()),
+                "in_progress": int(in_progress.sum()),
+                "resolution_hours_sum": float(hours.sum()),
+                "resolution_count": int(hours.size)
+            },
+            "satisfaction": {"sum": int(rating[rated].sum(dtype=np.int64)), "count": int(rated.sum())},
+            "resolution_sketches": resolution_sketches,
+            "unique_reporters": self._reporter_counts(reporter_sketches)
+        }
+
+    def _columnar_locations(
+        self,
+        columns: Dict[str, np.ndarray],
+        names: Dict[str, List[str]],
+        anonymous: int
+    ) -> Dict[str, Dict[str, Any]]:
+        """by_location entries: counts, category and severity mixes, distinct reporters and report centroids"""
+        # Location codes are dense, so bincount replaces a sort-based unique
+        location = columns["location"].astype(np.int64)
+        all_counts = np.bincount(location, minlength=1)
+        codes = np.flatnonzero(all_counts)
+        counts = all_counts[codes]
+        positions = np.zeros(all_counts.size, dtype=np.int64)
+        positions[codes] = np.arange(codes.size)
+        inverse = positions[location]
+        by_location = {
+            names["location"][code]: {
+                "count": int(count),
+                "latitude": None,
+                "longitude": None,
+                "categories": {},
+                "severities": {},
+                "unique_reporters": 0
+            }
+            for code, count in zip(codes.tolist(), counts.tolist())
+        }
+        places = [by_location[names["location"][code]] for code in codes.tolist()]
+
+        # Category and severity mixes from the distinct (location, value) pairs
+        for key, column, value_names in (
+            ("categories", "category", names["category"]),
+            ("severities", "severity", None)
+        ):
+            values = columns[column].astype(np.int64)
+            width = int(values.max()) + 1 if values.size else 1
+            pairs, pair_counts = np.unique(inverse * width + values, return_counts=True)
+            for pair, count in zip(pairs.tolist(), pair_counts.tolist()):
+                value = pair % width
+                places[pair // width][key][value_names[value] if value_names else value] = count
+
+        # Exact distinct reporters per location from the distinct (location, reporter) pairs
+        reporters = columns["reporter"].astype(np.int64)
+        known = reporters != anonymous
+        width = int(reporters.max()) + 1 if reporters.size else 1
+        pairs = np.unique(inverse[known] * width + reporters[known])
+        for i, count in enumerate(np.bincount(pairs // width, minlength=codes.size).tolist()):
+            places[i]["unique_reporters"] = count
+
+        located = ~np.isnan(columns["latitude"])
+        x, y, z = geo.unit_vectors(columns["latitude"][located], columns["longitude"][located])
+        sums = [np.bincount(inverse[located], weights=component, minlength=codes.size) for component in (x, y, z)]
+        latitudes, longitudes = geo.from_unit_vectors(*sums)
+        for i in np.flatnonzero(np.bincount(inverse[located], minlength=codes.size)).tolist():
+            places[i]["latitude"] = float(latitudes[i])
+            places[i]["longitude"] = float(longitudes[i])
+        return by_location
+
+
+# Global instance
+analytics_engine = AnalyticsEngine()
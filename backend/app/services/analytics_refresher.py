@@ -0,0 +1,141 @@
+"""
+Stale-while-revalidate cache for analytics endpoint responses
+
+Each analytics endpoint registers an async builder. A request is answered from
+the last built response straight away; when that response is older than the
+endpoint's refresh interval a rebuild is started in the background and the
+request still gets the previous response, along with its age. A background
+loop started from the app lifespan keeps recently requested responses fresh
+between requests, so dashboards rarely wait on a rebuild at all.
+
+Intervals are configured per endpoint, e.g.
+ANALYTICS_REFRESH_INTERVALS=dashboard=30,peak-hours=300
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, Callable, Awaitable, Tuple
+from decouple import config, Csv
+
+from app.core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+# Seconds between rebuilds of each endpoint's response
+DEFAULT_REFRESH_INTERVALS = {
+    "dashboard": 30,
+    "department-performance": 60,
+    "peak-hours": 300,
+    "location-hotspots": 120,
+    "category-distribution": 60,
+    "resolution-trends": 120
+}
+
+Builder = Callable[..., Awaitable[Dict[str, Any]]]
+
+
+class AnalyticsRefresher:
+    def __init__(self):
+        self.default_interval = config("ANALYTICS_REFRESH_INTERVAL", default=60, cast=int)
+        self.intervals = dict(DEFAULT_REFRESH_INTERVALS)
+        for item in config("ANALYTICS_REFRESH_INTERVALS", default="", cast=Csv()):
+            name, _, seconds = item.partition("=")
+            if seconds:
+                self.intervals[name.strip()] = int(seconds)
+        # Responses not requested for this long stop being refreshed in the background
+        self.idle_timeout = config("ANALYTICS_REFRESH_IDLE", default=900, cast=int)
+        self.tick = 1.0
+
+        self._builders: Dict[str, Builder] = {}
+        self._warm_args: Dict[str, Tuple] = {}
+        self._entries: Dict[Tuple, Dict[str, Any]] = {}
+        self._inflight: Dict[Tuple, asyncio.Task] = {}
+
+    def register(self, name: str, builder: Builder, warm_args: Tuple = ()) -> None:
+        """Register an endpoint builder; warm_args are built at startup"""
+        self._builders[name] = builder
+        self._warm_args[name] = warm_args
+
+    def interval(self, name: str) -> int:
+        return self.intervals.get(name, self.default_interval)
+
+    def _refresh(self, key: Tuple) -> asyncio.Task:
+        """Start (or join) the rebuild of one response"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.create_task(self._build(key))
+        return task
+
+    async def _build(self, key: Tuple) -> Dict[str, Any]:
+        name, args = key
+        entry = self._entries.setdefault(key, {"requested_at": time.monotonic()})
+        try:
+            value = await self._builders[name](*args)
+            entry["value"] = value
+            entry["refreshed_at"] = time.monotonic()
+            entry["refreshed_at_wall"] = datetime.now(timezone.utc).isoformat()
+            return entry
+        except Exception:
+            # Keep serving the previous response; the loop retries after an interval
+            entry["failed_at"] = time.monotonic()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get(self, name: str, *args) -> Dict[str, Any]:
+        """The endpoint's response, with snapshot_age_seconds and refreshed_at added"""
+        key = (name, args)
+        entry = self._entries.get(key)
+        metrics.record_cache("analytics_responses", entry is not None and "value" in entry)
+        if entry is None or "value" not in entry:
+            # Nothing to serve yet: wait for the first build (shared with concurrent requests)
+            entry = await self._refresh(key)
+        else:
+            age = time.monotonic() - entry["refreshed_at"]
+            if age >= self.interval(name) and key not in self._inflight:
+                # Serve the previous response now, rebuild in the background
+                self._refresh(key).add_done_callback(self._log_failure)
+        entry["requested_at"] = time.monotonic()
+
+        age = time.monotonic() - entry["refreshed_at"]
+        return {
+            **entry["value"],
+            "snapshot_age_seconds": round(age, 1),
+            "refreshed_at": entry["refreshed_at_wall"],
+            "refreshing": key in self._inflight
+        }
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception():
+            logger.error("Analytics refresh failed: %s", task.exception(), exc_info=task.exception())
+
+    async def run(self) -> None:
+        """Warm each endpoint, then rebuild recently requested responses as they go stale"""
+        now = time.monotonic()
+        for name, args in self._warm_args.items():
+            self._entries.setdefault((name, args), {"requested_at": now})
+
+        while True:
+            now = time.monotonic()
+            for key, entry in list(self._entries.items()):
+                if now - entry["requested_at"] > self.idle_timeout:
+                    del self._entries[key]
+                    continue
+                interval = self.interval(key[0])
+                stale = "value" not in entry or now - entry["refreshed_at"] >= interval
+                failed_recently = now - entry.get("failed_at", float("-inf")) < interval
+                if stale and not failed_recently and key not in self._inflight:
+                    task = self._refresh(key)
+                    task.add_done_callback(self._log_failure)
+                    # Rebuild one response at a time so the loop never piles up work
+                    await asyncio.wait([task])
+            await asyncio.sleep(self.tick)
+
+
+# Global instance
+analytics_refresher = AnalyticsRefresher()
+metrics.register_queue("analytics_refreshes", lambda: len(analytics_refresher._inflight))
@@ -0,0 +1,185 @@
+"""
+Spatial clustering of issue coordinates for hotspot detection
+
+Points are first aggregated into a planar grid (cell_km square cells), which
+is a single vectorized pass. With refinement enabled, grid cells are then
+clustered DBSCAN-style: cells holding at least min_points issues are core
+cells, adjacent core cells are joined into one cluster, sparse cells next to a
+cluster become its border and isolated sparse cells are noise. Everything runs
+on NumPy arrays, so 100k+ points cluster in tens of milliseconds.
+"""
+
+from typing import Dict, Any, List, Optional, Sequence
+import numpy as np
+from decouple import config
+
+from app.services import geo
+
+
+# Grid cell edge and DBSCAN-style density threshold (issues per cell)
+HOTSPOT_CELL_KM = config("HOTSPOT_CELL_KM", default=0.5, cast=float)
+HOTSPOT_MIN_POINTS = config("HOTSPOT_MIN_POINTS", default=3, cast=int)
+
+# Forward neighbours of a grid cell (the other four are covered by symmetry)
+NEIGHBOUR_OFFSETS = ((0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def _connected_components(n: int, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Component label (smallest member index) of n nodes joined by edges a[i]-b[i]"""
+    labels = np.arange(n)
+    if a.size == 0:
+        return labels
+    while True:
+        # Hook both endpoints' roots onto the smaller root, then compress paths
+        la, lb = labels[a], labels[b]
+        low = np.minimum(la, lb)
+        hooked = labels.copy()
+        np.minimum.at(hooked, la, low)
+        np.minimum.at(hooked, lb, low)
+        while True:
+            jumped = hooked[hooked]
+            if np.array_equal(jumped, hooked):
+                break
+            hooked = jumped
+        if np.array_equal(hooked, labels):
+            return labels
+        labels = hooked
+
+
+def cluster_points(
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    categories: Optional[np.ndarray] = None,
+    severities: Optional[np.ndarray] = None,
+    category_names: Optional[Sequence[str]] = None,
+    cell_km: float = HOTSPOT_CELL_KM,
+    min_points: int = HOTSPOT_MIN_POINTS,
+    refine: bool = True,
+    limit: Optional[int] = None,
+    reporters: Optional[np.ndarray] = None
+) -> Dict[str, Any]:
+    """
+    Cluster points into hotspots, strongest (severity-weighted) first
+
+    categories are integer codes into category_names; severities are levels
+    (1-5); reporters are optional non-zero reporter ids (0 = unknown), which add
+    an exact unique_reporters count per cluster.
+    Returns {"clusters": [...], "total_clusters": int, "noise_points": int}.
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    n = latitudes.size
+    if n == 0:
+        return {"clusters": [], "total_clusters": 0, "noise_points": 0}
+
+    categories = np.zeros(n, dtype=np.int64) if categories is None else np.asarray(categories, dtype=np.int64)
+    severities = np.ones(n, dtype=np.float64) if severities is None else np.asarray(severities, dtype=np.float64)
+    category_names = list(category_names) if category_names is not None else ["unknown"]
+
+    # Equirectangular projection around the data's mean latitude (accurate at city scale)
+    km_per_degree_lon = geo.KM_PER_DEGREE_LAT * np.cos(np.radians(latitudes.mean()))
+    rows = np.floor(latitudes * geo.KM_PER_DEGREE_LAT / cell_km).astype(np.int64)
+    cols = np.floor(longitudes * km_per_degree_lon / cell_km).astype(np.int64)
+    rows -= rows.min()
+    cols -= cols.min() - 1
+    width = int(cols.max()) + 2
+
+    cell_keys, point_cells = np.unique(rows * width + cols, return_inverse=True)
+    cell_counts = np.bincount(point_cells)
+    n_cells = cell_keys.size
+
+    if refine:
+        core = cell_counts >= min_points
+
+        # Pairs of occupied neighbouring cells, found by binary search on the sorted keys
+        pairs_a, pairs_b = [], []
+        for d_row, d_col in NEIGHBOUR_OFFSETS:
+            neighbour_keys = cell_keys + d_row * width + d_col
+            positions = np.searchsorted(cell_keys, neighbour_keys).clip(max=n_cells - 1)
+            found = cell_keys[positions] == neighbour_keys
+            pairs_a.append(np.flatnonzero(found))
+            pairs_b.append(positions[found])
+        a, b = np.concatenate(pairs_a), np.concatenate(pairs_b)
+
+        both_core = core[a] & core[b]
+        labels = _connected_components(n_cells, a[both_core], b[both_core])
+
+        # Sparse cells touching a cluster join it as border; the rest are noise
+        cell_labels = np.where(core, labels, -1)
+        border_a = ~core[a] & core[b]
+        cell_labels[a[border_a]] = labels[b[border_a]]
+        border_b = core[a] & ~core[b]
+        cell_labels[b[border_b]] = labels[a[border_b]]
+    else:
+        cell_labels = np.arange(n_cells)
+
+    point_labels = cell_labels[point_cells]
+    keep = point_labels >= 0
+    noise_points = int(n - keep.sum())
+    if not keep.any():
+        return {"clusters": [], "total_clusters": 0, "noise_points": noise_points}
+
+    latitudes, longitudes = latitudes[keep], longitudes[keep]
+    categories, severities = categories[keep], severities[keep]
+    _, cluster_ids = np.unique(point_labels[keep], return_inverse=True)
+    n_clusters = int(cluster_ids.max()) + 1
+
+    unique_reporters = None
+    if reporters is not None:
+        # Distinct (cluster, reporter) pairs, counted per cluster. Exact, and only held for
+        # this call: one sort of the members is cheaper than a 2 KB HyperLogLog per cluster
+        reporters = np.asarray(reporters, dtype=np.uint64)[keep]
+        known = reporters != 0
+        member_clusters, member_reporters = cluster_ids[known], reporters[known]
+        order = np.lexsort((member_reporters, member_clusters))
+        member_clusters, member_reporters = member_clusters[order], member_reporters[order]
+        first = np.ones(member_clusters.size, dtype=bool)
+        first[1:] = (member_clusters[1:] != member_clusters[:-1]) | (member_reporters[1:] != member_reporters[:-1])
+        unique_reporters = np.bincount(member_clusters[first], minlength=n_clusters)
+
+    counts = np.bincount(cluster_ids, minlength=n_clusters)
+
+    # Spherical centroids from summed unit vectors
+    lat_rad, lon_rad = np.radians(latitudes), np.radians(longitudes)
+    x = np.bincount(cluster_ids, weights=np.cos(lat_rad) * np.cos(lon_rad), minlength=n_clusters)
+    y = np.bincount(cluster_ids, weights=np.cos(lat_rad) * np.sin(lon_rad), minlength=n_clusters)
+    z = np.bincount(cluster_ids, weights=np.sin(lat_rad), minlength=n_clusters)
+    centroid_lats = np.degrees(np.arctan2(z, np.hypot(x, y)))
+    centroid_lons = np.degrees(np.arctan2(y, x))
+
+    # Radius: farthest member from the centroid
+    distances = geo.haversine_km(latitudes, longitudes, centroid_lats[cluster_ids], centroid_lons[cluster_ids])
+    radii = np.zeros(n_clusters)
+    np.maximum.at(radii, cluster_ids, np.atleast_1d(distances))
+
+    n_categories = max(len(category_names), int(categories.max()) + 1)
+    category_mix = np.bincount(
+        cluster_ids * n_categories + categories, minlength=n_clusters * n_categories
+    ).reshape(n_clusters, n_categories)
+    severity_sums = np.bincount(cluster_ids, weights=severities, minlength=n_clusters)
+
+    order = np.argsort(-severity_sums, kind="stable")
+    if limit is not None:
+        order = order[:limit]
+
+    clusters: List[Dict[str, Any]] = []
+    for cluster in order:
+        mix = {
+            category_names[code] if code < len(category_names) else str(code): int(category_mix[cluster, code])
+            for code in np.flatnonzero(category_mix[cluster])
+        }
+        clusters.append({
+            "latitude": round(float(centroid_lats[cluster]), 6),
+            "longitude": round(float(centroid_lons[cluster]), 6),
+            "radius_km": round(float(radii[cluster]), 3),
+            "count": int(counts[cluster]),
+            "categories": mix,
+            "top_category": max(mix.items(), key=lambda item: item[1])[0],
+            "avg_severity": round(float(severity_sums[cluster] / counts[cluster]), 2),
+            # Sum of severity levels: many severe issues outrank many minor ones
+            "severity_score": round(float(severity_sums[cluster]), 1)
+        })
+        if unique_reporters is not None:
+            clusters[-1]["unique_reporters"] = int(unique_reporters[cluster])
+
+    return {"clusters": clusters, "total_clusters": n_clusters, "noise_points": noise_points}
@@ -1,6 +1,9 @@
+import logging
 import os
+import asyncio
 import base64
 import json
+from datetime import datetime
 from typing import Dict, Any, Optional
 from PIL import Image
 from io import BytesIO
@@ -10,34 +13,13 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import PromptTemplate
 from langchain.schema import HumanMessage
 
+from app.core.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
 
 class GeminiAnalysisService:
     def __init__(self):
-        # Initialize Gemini API
-        self.api_key = config("GOOGLE_API_KEY", default="")
-        self.api_available = bool(self.api_key and self.api_key != "your-gemini-api-key-here")
-        
-        if not self.api_available:
-            print("WARNING: GOOGLE_API_KEY not set. AI analysis will return mock responses.")
-            return
-        else:
-            print(f"Gemini API initialized successfully with key: {self.api_key[:10]}...")
-            print(f"API available: {self.api_available}")
-        
-        genai.configure(api_key=self.api_key)
-        
-        # Initialize LangChain with Gemini
-        try:
-            self.llm = ChatGoogleGenerativeAI(
-                model="gemini-1.5-flash",
-                google_api_key=self.api_key,
-                temperature=0.3
-            )
-            print("LangChain Gemini model initialized successfully")
-        except Exception as e:
-            print(f"Error initializing LangChain model: {e}")
-            self.api_available = False
-        
         # Authority mapping for Sri Lankan government departments
         self.authority_mapping = {
             "roads": {
@@ -89,29 +71,126 @@ class GeminiAnalysisService:
                 "emergency_contact": "+94-11-2581999"
             }
         }
+
+        # Initialize Gemini API
+        self.api_key = config("GOOGLE_API_KEY", default="")
+        self.api_available = bool(self.api_key and self.api_key != "your-gemini-api-key-here")
+        
+        if not self.api_available:
+            logger.warning("GOOGLE_API_KEY not set. AI analysis will return mock responses.")
+            return
+        else:
+            logger.info("Gemini API initialized successfully (API available: %s)", self.api_available)
+        
+        # Alternative API endpoint (e.g. the load-test stand-in); served over REST
+        self.api_endpoint = config("GEMINI_API_ENDPOINT", default="")
+        if self.api_endpoint:
+            genai.configure(api_key=self.api_key, transport="rest", client_options={"api_endpoint": self.api_endpoint})
+        else:
+            genai.configure(api_key=self.api_key)
+        
+        # Initialize LangChain with Gemini
+        try:
+            self.llm = ChatGoogleGenerativeAI(
+                model="gemini-1.5-flash",
+                google_api_key=self.api_key,
+                temperature=0.3
+            )
+            logger.info("LangChain Gemini model initialized successfully")
+        except Exception as e:
+            logger.error("Error initializing LangChain model: %s", e)
+            self.api_available = False
+    
+    def prepare_image(self, image_content: bytes) -> Dict[str, Any]:
+        """Convert image to base64 for Gemini API and extract EXIF GPS/capture time"""
+        with tracer.span("gemini.prepare_image", bytes=len(image_content)) as span:
+            try:
+                # Open and process image
+                image = Image.open(BytesIO(image_content))
+                span.set(width=image.width, height=image.height)
+                
+                # Read EXIF before conversion, which drops the original metadata
+                exif = self._read_exif_metadata(image)
+                
+                # Convert to RGB if necessary
+                if image.mode != 'RGB':
+                    image = image.convert('RGB')
+                
+                # Resize if too large (Gemini has size limits)
+                max_size = (1024, 1024)
+                image.thumbnail(max_size, Image.Resampling.LANCZOS)
+                
+                # Convert to base64
+                buffer = BytesIO()
+                image.save(buffer, format='JPEG', quality=85)
+                image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+                
+                return {
+                    "image_base64": image_base64,
+                    "exif": exif
+                }
+            except Exception as e:
+                raise ValueError(f"Error processing image: {str(e)}")
     
-    def prepare_image(self, image_content: bytes) -> str:
-        """Convert image to base64 for Gemini API"""
+    def extract_image_metadata(self, image_content: bytes) -> Dict[str, Any]:
+        """Read only the EXIF GPS/capture time (header parse, no pixel decode)"""
         try:
-            # Open and process image
-            image = Image.open(BytesIO(image_content))
-            
-            # Convert to RGB if necessary
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Resize if too large (Gemini has size limits)
-            max_size = (1024, 1024)
-            image.thumbnail(max_size, Image.Resampling.LANCZOS)
-            
-            # Convert to base64
-            buffer = BytesIO()
-            image.save(buffer, format='JPEG', quality=85)
-            image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            
-            return image_base64
+            return self._read_exif_metadata(Image.open(BytesIO(image_content)))
+        except Exception as e:
+            logger.warning("EXIF extraction error: %s", e)
+            return {"gps": None, "captured_at": None}
+    
+    def _read_exif_metadata(self, image: Image.Image) -> Dict[str, Any]:
+        """Extract GPS coordinates and capture time from an opened image"""
+        metadata = {"gps": None, "captured_at": None}
+        
+        try:
+            exif = image.getexif()
+        except Exception:
+            return metadata
+        
+        if not exif:
+            return metadata
+        
+        # GPS IFD: 1/2 = latitude ref/value, 3/4 = longitude ref/value
+        try:
+            gps_ifd = exif.get_ifd(0x8825)
+            if gps_ifd and 2 in gps_ifd and 4 in gps_ifd:
+                latitude = self._exif_dms_to_degrees(gps_ifd[2], gps_ifd.get(1, "N"))
+                longitude = self._exif_dms_to_degrees(gps_ifd[4], gps_ifd.get(3, "E"))
+                
+                if (-90 <= latitude <= 90 and -180 <= longitude <= 180
+                        and not (latitude == 0 and longitude == 0)):
+                    metadata["gps"] = {
+                        "latitude": round(latitude, 7),
+                        "longitude": round(longitude, 7)
+                    }
         except Exception as e:
-            raise ValueError(f"Error processing image: {str(e)}")
+            logger.warning("EXIF GPS parse error: %s", e)
+        
+        # DateTimeOriginal lives in the Exif IFD, DateTime in the base IFD
+        try:
+            captured = exif.get_ifd(0x8769).get(0x9003) or exif.get(0x0132)
+            if captured:
+                metadata["captured_at"] = datetime.strptime(
+                    str(captured).strip("\x00 "), "%Y:%m:%d %H:%M:%S"
+                ).isoformat()
+        except Exception:
+            pass
+        
+        return metadata
+    
+    def _exif_dms_to_degrees(self, dms, ref) -> float:
+        """Convert an EXIF (degrees, minutes, seconds) rational tuple to decimal degrees"""
+        degrees, minutes, seconds = (float(value) for value in dms)
+        decimal = degrees + minutes / 60 + seconds / 3600
+        
+        if isinstance(ref, bytes):
+            ref = ref.decode(errors="ignore")
+        if str(ref).strip("\x00 ").upper() in ("S", "W"):
+            decimal = -decimal
+        
+        return decimal
     
     def create_analysis_prompt(self, location: Optional[str] = None) -> str:
         """Create a structured prompt for civic issue analysis"""
@@ -164,9 +243,26 @@ Provide only the JSON response, no additional text.
             return self._create_mock_response(location)
             
         try:
-            # Prepare image
-            image_base64 = self.prepare_image(image_content)
+            # Prepare image off the event loop (PIL decode/resize is CPU bound)
+            prepared = await asyncio.to_thread(self.prepare_image, image_content)
+        except Exception as e:
+            logger.error("AI Analysis Error: %s", e)
+            return self._create_error_response(str(e), location)
+        
+        return await self.analyze_prepared_image(prepared["image_base64"], location)
+    
+    async def analyze_prepared_image(
+        self,
+        image_base64: str,
+        location: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Analyze an image already processed by prepare_image"""
+        
+        # If API is not available, return mock response
+        if not self.api_available:
+            return self._create_mock_response(location)
             
+        try:
             # Create prompt
             prompt = self.create_analysis_prompt(location)
             
@@ -180,19 +276,21 @@ Provide only the JSON response, no additional text.
                 "data": base64.b64decode(image_base64)
             }
             
-            # Generate response
-            response = model.generate_content([prompt, image_part])
+            # Generate response (the SDK call is blocking, keep it off the event loop)
+            with tracer.upstream("gemini", "gemini-1.5-flash", "generate_content"):
+                response = await asyncio.to_thread(model.generate_content, [prompt, image_part])
             
             # Parse JSON response
             try:
-                # Clean the response text
-                response_text = response.text.strip()
-                if response_text.startswith('```json'):
-                    response_text = response_text.replace('```json', '').replace('```', '').strip()
-                elif response_text.startswith('```'):
-                    response_text = response_text.replace('```', '').strip()
-                
-                analysis_result = json.loads(response_text)
+                with tracer.span("gemini.parse_response", chars=len(response.text)):
+                    # Clean the response text
+                    response_text = response.text.strip()
+                    if response_text.startswith('```json'):
+                        response_text = response_text.replace('```json', '').replace('```', '').strip()
+                    elif response_text.startswith('```'):
+                        response_text = response_text.replace('```', '').strip()
+                    
+                    analysis_result = json.loads(response_text)
                 
                 # Validate required fields
                 required_fields = ['detected_issue', 'category', 'description', 'severity_level', 'confidence_score']
@@ -224,11 +322,19 @@ Provide only the JSON response, no additional text.
                 
         except Exception as e:
             # Log the actual error for debugging
-            print(f"AI Analysis Error: {str(e)}")
-            print(f"Error type: {type(e).__name__}")
+            logger.error("AI Analysis Error: %s", e, extra={"error_type": type(e).__name__})
             # Return error analysis
             return self._create_error_response(str(e), location)
     
+    def result_status(self, result: Dict[str, Any]) -> str:
+        """Status of an analysis: error response, keyword fallback ("degraded") or ok"""
+        details = result.get("analysis_details") or {}
+        if "error" in details:
+            return "error"
+        if "raw_response" in details:
+            return "degraded"
+        return "ok"
+    
     def _create_fallback_response(self, response_text: str, location: Optional[str]) -> Dict[str, Any]:
         """Create fallback response when JSON parsing fails"""
         # Simple keyword-based category detection
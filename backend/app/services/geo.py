@@ -0,0 +1,89 @@
+"""
+Vectorized geographic math shared by the CRUD layer, endpoints and analytics
+
+Every function accepts scalars or NumPy arrays and broadcasts, so the same
+code computes one distance or a million. Distances are in kilometres and
+angles in degrees.
+"""
+
+from typing import Tuple, Union
+import numpy as np
+
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE_LAT = 111.32
+
+ArrayLike = Union[float, np.ndarray]
+
+
+def haversine_km(lat1: ArrayLike, lon1: ArrayLike, lat2: ArrayLike, lon2: ArrayLike) -> ArrayLike:
+    """Great-circle distance between points (broadcasts over arrays)"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    return distance if distance.ndim else float(distance)
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lon, max_lat, max_lon) enclosing a circle of radius_km"""
+    dlat = radius_km / KM_PER_DEGREE_LAT
+    dlon = radius_km / (KM_PER_DEGREE_LAT * max(np.cos(np.radians(latitude)), 1e-6))
+    return (
+        round(max(latitude - dlat, -90.0), 6),
+        round(max(longitude - dlon, -180.0), 6),
+        round(min(latitude + dlat, 90.0), 6),
+        round(min(longitude + dlon, 180.0), 6)
+    )
+
+
+def within_box(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    box: Tuple[float, float, float, float]
+) -> np.ndarray:
+    """Boolean mask of points inside a (min_lat, min_lon, max_lat, max_lon) box"""
+    min_lat, min_lon, max_lat, max_lon = box
+    return (lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon)
+
+
+def bearing_deg(lat1: ArrayLike, lon1: ArrayLike, lat2: ArrayLike, lon2: ArrayLike) -> ArrayLike:
+    """Initial compass bearing from point 1 to point 2, in [0, 360)"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    dlon = lon2 - lon1
+    x = np.sin(dlon) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    bearing = (np.degrees(np.arctan2(x, y)) + 360.0) % 360.0
+    return bearing if bearing.ndim else float(bearing)
+
+
+def distance_matrix_km(
+    lats_a: np.ndarray,
+    lons_a: np.ndarray,
+    lats_b: np.ndarray = None,
+    lons_b: np.ndarray = None
+) -> np.ndarray:
+    """Pairwise distances, shape (len(a), len(b)); b defaults to a"""
+    lats_a = np.asarray(lats_a, dtype=np.float64)
+    lons_a = np.asarray(lons_a, dtype=np.float64)
+    if lats_b is None:
+        lats_b, lons_b = lats_a, lons_a
+    return haversine_km(lats_a[:, None], lons_a[:, None], np.asarray(lats_b)[None, :], np.asarray(lons_b)[None, :])
+
+
+def unit_vectors(lats: ArrayLike, lons: ArrayLike) -> Tuple[ArrayLike, ArrayLike, ArrayLike]:
+    """Points as (x, y, z) on the unit sphere; sums of these give spherical centroids"""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    return np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)
+
+
+def from_unit_vectors(x: ArrayLike, y: ArrayLike, z: ArrayLike) -> Tuple[ArrayLike, ArrayLike]:
+    """(lat, lon) in degrees of (summed or averaged) unit-sphere vectors"""
+    return np.degrees(np.arctan2(z, np.hypot(x, y))), np.degrees(np.arctan2(y, x))
+
+
+def centroid(lats: np.ndarray, lons: np.ndarray, weights: np.ndarray = None) -> Tuple[float, float]:
+    """Spherical (unit-vector mean) centroid of a set of points"""
+    x, y, z = unit_vectors(lats, lons)
+    lat, lon = from_unit_vectors(np.average(x, weights=weights), np.average(y, weights=weights), np.average(z, weights=weights))
+    return float(lat), float(lon)
@@ -0,0 +1,355 @@
+"""
+Severity-weighted heatmap tiles (XYZ, 256 px PNG) with an on-disk cache
+
+A tile sums issue severities into a 256 x 256 pixel grid (including issues just
+outside the tile, so blurred edges line up with the neighbouring tile), blurs
+it with three box passes (a close Gaussian approximation) and maps intensity
+through a colour ramp. Intensity is scaled by a fixed saturation weight rather
+than per tile, so adjacent tiles and zoom levels share one colour scale.
+
+Tiles are cached on disk as <dir>/<filter hash>/<z>/<x>/<y>.png, at most
+HEATMAP_TILE_CACHE_SIZE of them: an in-memory LRU of the cached tiles evicts the
+least recently served (and drops expired ones) past the cap, and lets an issue
+that is created or changes status delete only the cached tiles whose area it
+touches. Empty tiles are not cached, so requests for far-away tiles or filters
+that match nothing cost no disk space. The `days` filter takes one of DAY_WINDOWS.
+
+The spatial index is only mutated on the event loop, so get_tile() copies a
+tile's points there and hands only the copies to a worker thread, which
+rasterises, encodes and writes the tile. A tile invalidated while it renders
+(its points may predate the write) is returned but not cached: each tile in
+flight carries a generation that invalidate_point() bumps.
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Set, Tuple
+import numpy as np
+from PIL import Image
+from decouple import config
+
+from app.services.map_grid import tile_coordinates, MAX_MERCATOR_LATITUDE
+from app.services.spatial_index import issue_spatial_index
+
+
+TILE_SIZE = 256
+
+# Values accepted for the `days` filter, so the cache holds a bounded set of filter combinations
+DAY_WINDOWS = (1, 7, 30, 90, 365)
+
+TileKey = Tuple[str, int, int, int]
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(min_lat, min_lon, max_lat, max_lon) of an XYZ tile"""
+    scale = 1 << z
+
+    def latitude(tile_y: float) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / scale))))
+
+    return (latitude(y + 1), x / scale * 360.0 - 180.0, latitude(y), (x + 1) / scale * 360.0 - 180.0)
+
+
+def _box_blur(grid: np.ndarray, radius: int, axis: int) -> np.ndarray:
+    """Mean over a (2 * radius + 1) window along one axis, via cumulative sums"""
+    padded = np.pad(grid, [(radius + 1, radius) if a == axis else (0, 0) for a in range(grid.ndim)])
+    summed = np.cumsum(padded, axis=axis)
+    upper = np.take(summed, range(2 * radius + 1, summed.shape[axis]), axis=axis)
+    lower = np.take(summed, range(0, summed.shape[axis] - 2 * radius - 1), axis=axis)
+    return (upper - lower) / (2 * radius + 1)
+
+
+def _color_ramp() -> np.ndarray:
+    """256 RGBA entries: transparent -> blue -> lime -> yellow -> red"""
+    stops = np.array([
+        [0.00, 0, 0, 255, 0],
+        [0.25, 0, 0, 255, 140],
+        [0.55, 0, 255, 0, 190],
+        [0.80, 255, 255, 0, 220],
+        [1.00, 255, 0, 0, 240]
+    ])
+    positions = np.linspace(0, 1, 256)
+    return np.stack(
+        [np.interp(positions, stops[:, 0], stops[:, channel]) for channel in range(1, 5)], axis=1
+    ).astype(np.uint8)
+
+
+class HeatmapTileService:
+    def __init__(self):
+        self.tile_dir = config("HEATMAP_TILE_DIR", default=".cache/heatmap_tiles")
+        self.max_zoom = config("HEATMAP_MAX_ZOOM", default=18, cast=int)
+        # Blur radius in pixels (three box passes of this radius)
+        self.radius = config("HEATMAP_RADIUS_PX", default=6, cast=int)
+        # Severity weight under one blur footprint that maps to ~63% intensity
+        self.saturation = config("HEATMAP_SATURATION", default=10.0, cast=float)
+        # Seconds a cached tile is trusted (bounds drift of `days` windows)
+        self.tile_ttl = config("HEATMAP_TILE_TTL", default=3600, cast=int)
+        # Browser/CDN max-age for served tiles
+        self.cache_max_age = config("HEATMAP_CACHE_MAX_AGE", default=300, cast=int)
+        # Tiles kept on disk (all filters and zooms); least recently served are evicted first
+        self.cache_size = config("HEATMAP_TILE_CACHE_SIZE", default=20000, cast=int)
+
+        # (filter hash, z, x, y) -> write time, least recently served first
+        self._tiles: "OrderedDict[TileKey, float]" = OrderedDict()
+        # (z, x, y) -> filter hashes cached for that tile, for invalidation
+        self._filters: Dict[Tuple[int, int, int], Set[str]] = {}
+        # Cache bookkeeping happens on worker threads
+        self._lock = threading.Lock()
+        self._scanned = False
+        # (z, x, y) -> [renders in flight, invalidation generation]; only tiles being rendered.
+        # Its own lock, so the event loop never waits on disk work done under _lock
+        self._rendering: Dict[Tuple[int, int, int], List[int]] = {}
+        self._render_lock = threading.Lock()
+
+        self._ramp = _color_ramp()
+        self._unit_peak = self._blur(self._impulse()).max()
+        self._empty_png = self._encode(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8))
+
+    def _impulse(self) -> np.ndarray:
+        grid = np.zeros((TILE_SIZE, TILE_SIZE))
+        grid[TILE_SIZE // 2, TILE_SIZE // 2] = 1.0
+        return grid
+
+    def _blur(self, grid: np.ndarray) -> np.ndarray:
+        for _ in range(3):
+            grid = _box_blur(_box_blur(grid, self.radius, 0), self.radius, 1)
+        return grid
+
+    def _encode(self, rgba: np.ndarray) -> bytes:
+        buffer = io.BytesIO()
+        Image.fromarray(rgba, "RGBA").save(buffer, format="PNG", optimize=True)
+        return buffer.getvalue()
+
+    @staticmethod
+    def filter_hash(filters: Dict[str, Any]) -> str:
+        canonical = json.dumps({k: v for k, v in sorted(filters.items()) if v is not None}, sort_keys=True)
+        return hashlib.sha1(canonical.encode()).hexdigest()[:12]
+
+    def _path(self, filter_hash: str, z: int, x: int, y: int) -> str:
+        return os.path.join(self.tile_dir, filter_hash, str(z), str(x), f"{y}.png")
+
+    def tile_points(self, z: int, x: int, y: int, filters: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """Copies of the coordinates and severities of the issues a tile draws (call on the event loop)"""
+        # Pad the tile by three blur radii so edge pixels see their neighbours' issues
+        margin = 3 * self.radius
+        min_lat, min_lon, max_lat, max_lon = tile_bounds(z, x, y)
+        degrees_per_pixel = (max_lon - min_lon) / TILE_SIZE
+        box = (
+            max(min_lat - margin * degrees_per_pixel, -MAX_MERCATOR_LATITUDE),
+            min_lon - margin * degrees_per_pixel,
+            min(max_lat + margin * degrees_per_pixel, MAX_MERCATOR_LATITUDE),
+            max_lon + margin * degrees_per_pixel
+        )
+
+        days = filters.get("days")
+        # box_points() indexes with a slot array, so the arrays it returns are copies
+        return issue_spatial_index.box_points(
+            box,
+            category=filters.get("category"),
+            status=filters.get("status"),
+            since=time.time() - days * 86400 if days else None
+        )
+
+    def render_points(self, z: int, x: int, y: int, points: Dict[str, np.ndarray]) -> bytes:
+        """Rasterise and encode a tile from tile_points() (safe on a worker thread)"""
+        if points["latitude"].size == 0:
+            return self._empty_png
+
+        # Global pixel coordinates at this zoom, relative to the padded tile origin
+        margin = 3 * self.radius
+        scale = TILE_SIZE * (1 << z)
+        latitudes = np.radians(np.clip(points["latitude"], -MAX_MERCATOR_LATITUDE, MAX_MERCATOR_LATITUDE))
+        px = (points["longitude"] + 180.0) / 360.0 * scale - x * TILE_SIZE + margin
+        py = (1.0 - np.arcsinh(np.tan(latitudes)) / np.pi) / 2.0 * scale - y * TILE_SIZE + margin
+
+        size = TILE_SIZE + 2 * margin
+        columns, rows = px.astype(np.int64), py.astype(np.int64)
+        inside = (columns >= 0) & (columns < size) & (rows >= 0) & (rows < size)
+        grid = np.bincount(
+            rows[inside] * size + columns[inside],
+            weights=points["severity"][inside].astype(np.float64),
+            minlength=size * size
+        ).reshape(size, size)
+
+        density = self._blur(grid)[margin:margin + TILE_SIZE, margin:margin + TILE_SIZE]
+        intensity = 1.0 - np.exp(-density / (self._unit_peak * self.saturation))
+        if intensity.max() < 1 / 255:
+            return self._empty_png
+        return self._encode(self._ramp[(intensity * 255).astype(np.uint8)])
+
+    def render(self, z: int, x: int, y: int, filters: Dict[str, Any]) -> bytes:
+        """Render one tile from the spatial index (on the event loop thread)"""
+        return self.render_points(z, x, y, self.tile_points(z, x, y, filters))
+
+    def _scan(self) -> None:
+        """Adopt tiles cached by an earlier process, oldest first (once, under the lock)"""
+        self._scanned = True
+        found = []
+        for root, _, files in os.walk(self.tile_dir):
+            parts = os.path.relpath(root, self.tile_dir).split(os.sep)
+            if len(parts) != 3:
+                continue
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    key = (parts[0], int(parts[1]), int(parts[2]), int(name[:-len(".png")]))
+                    found.append((os.path.getmtime(path), key))
+                except (OSError, ValueError):
+                    continue
+        for written, key in sorted(found):
+            self._add(key, written)
+        self._evict(time.time())
+
+    def _add(self, key: TileKey, written: float) -> None:
+        self._tiles[key] = written
+        self._tiles.move_to_end(key)
+        self._filters.setdefault(key[1:], set()).add(key[0])
+
+    def _discard(self, key: TileKey) -> bool:
+        if self._tiles.pop(key, None) is None:
+            return False
+        hashes = self._filters.get(key[1:])
+        if hashes is not None:
+            hashes.discard(key[0])
+            if not hashes:
+                del self._filters[key[1:]]
+        try:
+            os.remove(self._path(*key))
+        except OSError:
+            pass
+        return True
+
+    def _evict(self, now: float) -> None:
+        """Drop expired tiles from the least recently served end, then tiles past the size cap"""
+        while self._tiles:
+            key, written = next(iter(self._tiles.items()))
+            if len(self._tiles) <= self.cache_size and now - written < self.tile_ttl:
+                break
+            self._discard(key)
+
+    def _read_cached(self, key: TileKey) -> Optional[bytes]:
+        with self._lock:
+            if not self._scanned:
+                self._scan()
+            written = self._tiles.get(key)
+            if written is None:
+                return None
+            if time.time() - written >= self.tile_ttl:
+                self._discard(key)
+                return None
+            self._tiles.move_to_end(key)
+        try:
+            with open(self._path(*key), "rb") as tile_file:
+                return tile_file.read()
+        except OSError:
+            with self._lock:
+                self._discard(key)
+            return None
+
+    def _begin_render(self, tile: Tuple[int, int, int]) -> int:
+        """Register a render of `tile`; returns the generation to compare when storing it"""
+        with self._render_lock:
+            entry = self._rendering.setdefault(tile, [0, 0])
+            entry[0] += 1
+            return entry[1]
+
+    def _end_render(self, tile: Tuple[int, int, int], generation: int) -> bool:
+        """Unregister a render; True when the tile was not invalidated since _begin_render()"""
+        with self._render_lock:
+            entry = self._rendering[tile]
+            entry[0] -= 1
+            if entry[0] == 0:
+                del self._rendering[tile]
+            return entry[1] == generation
+
+    def _render_and_store(self, key: TileKey, points: Dict[str, np.ndarray], store: bool, generation: int) -> bytes:
+        ended = False
+        try:
+            png = self.render_points(*key[1:], points)
+            if store and png is not self._empty_png:
+                # Write to a temp file and rename so readers never see a partial tile
+                path = self._path(*key)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(temp_path, "wb") as tile_file:
+                    tile_file.write(png)
+                now = time.time()
+                # Checked under _lock, which invalidate_point() holds while it bumps generations
+                with self._lock:
+                    ended = True
+                    if self._end_render(key[1:], generation):
+                        os.replace(temp_path, path)
+                        self._add(key, now)
+                        self._evict(now)
+                    else:
+                        os.remove(temp_path)
+            return png
+        finally:
+            if not ended:
+                self._end_render(key[1:], generation)
+
+    async def get_tile(self, z: int, x: int, y: int, filters: Dict[str, Any]) -> Tuple[bytes, bool]:
+        """PNG bytes for a tile and whether it came from the disk cache"""
+        key = (self.filter_hash(filters), z, x, y)
+        png = await asyncio.to_thread(self._read_cached, key)
+        if png is not None:
+            return png, True
+
+        # Registered before the points are copied, so a write after this point invalidates the render
+        generation = self._begin_render((z, x, y))
+        try:
+            points = self.tile_points(z, x, y, filters)
+        except Exception:
+            self._end_render((z, x, y), generation)
+            raise
+        # Tiles rendered while the index is still loading are incomplete and not cached
+        png = await asyncio.to_thread(
+            self._render_and_store, key, points, issue_spatial_index.is_ready, generation
+        )
+        return png, False
+
+    def invalidate_point(self, latitude: float, longitude: float) -> int:
+        """Delete every cached tile (all filters, all zooms) that an issue at this point affects"""
+        # The blur reaches `margin` pixels, i.e. at most into the neighbouring tiles
+        margin = 3 * self.radius
+        tiles: List[Tuple[int, int, int]] = []
+        for z in range(self.max_zoom + 1):
+            px, py = tile_coordinates(latitude, longitude, z + 8)
+            for tile_x in {(px - margin) >> 8, px >> 8, (px + margin) >> 8}:
+                for tile_y in {(py - margin) >> 8, py >> 8, (py + margin) >> 8}:
+                    tiles.append((z, tile_x, tile_y))
+
+        removed = 0
+        with self._lock:
+            if not self._scanned:
+                self._scan()
+            for tile in tiles:
+                for filter_hash in list(self._filters.get(tile, ())):
+                    removed += self._discard((filter_hash, *tile))
+            # Renders in flight may have copied their points before the write: do not cache them
+            with self._render_lock:
+                for tile in tiles:
+                    entry = self._rendering.get(tile)
+                    if entry is not None:
+                        entry[1] += 1
+        return removed
+
+    def invalidate_point_soon(self, latitude: float, longitude: float) -> None:
+        """Invalidate in a worker thread when called from the event loop"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.invalidate_point(latitude, longitude)
+            return
+        loop.run_in_executor(None, self.invalidate_point, latitude, longitude)
+
+
+# Global instance
+heatmap_tiles = HeatmapTileService()
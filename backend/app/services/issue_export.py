@@ -0,0 +1,188 @@
+"""
+Streaming export of issues as CSV, NDJSON or Parquet
+
+Issues are read with keyset pagination (SupabaseClient.select_cursor) and each
+page is encoded and handed to the response before the next one is fetched, so
+memory use is bounded by one page regardless of how many issues are exported.
+Parquet output writes one row group per page; gzip compresses the encoded
+stream incrementally.
+"""
+
+import csv
+import io
+import json
+import zlib
+from typing import Dict, Any, List, Optional, AsyncIterator
+from decouple import config
+
+from app.services.supabase_client import supabase_client
+from app.services.timestamps import parse_timestamp
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+# Exportable columns and their Parquet types, in output order
+EXPORT_COLUMNS = {
+    "id": "string",
+    "booking_reference": "string",
+    "user_id": "string",
+    "category": "string",
+    "title": "string",
+    "description": "string",
+    "location": "string",
+    "latitude": "float64",
+    "longitude": "float64",
+    "status": "string",
+    "severity_level": "int16",
+    "assigned_authority_id": "string",
+    "image_url": "string",
+    "resolution_notes": "string",
+    "citizen_satisfaction_rating": "int16",
+    "created_at": "timestamp",
+    "updated_at": "timestamp",
+    "actual_completion_date": "timestamp"
+}
+
+# Format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet")
+}
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back in chunks (for ParquetWriter)"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class IssueExporter:
+    def __init__(self):
+        self.page_size = config("EXPORT_PAGE_SIZE", default=1000, cast=int)
+
+    def parse_columns(self, columns: Optional[str]) -> List[str]:
+        """Validated column list from a comma-separated parameter (all columns when empty)"""
+        if not columns:
+            return list(EXPORT_COLUMNS)
+        selected = [column.strip() for column in columns.split(",") if column.strip()]
+        unknown = [column for column in selected if column not in EXPORT_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown export columns: {', '.join(unknown)}")
+        return list(dict.fromkeys(selected))
+
+    def check_format(self, export_format: str) -> None:
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format}")
+        if export_format == "parquet" and pa is None:
+            raise ValueError("Parquet export requires pyarrow to be installed")
+
+    def filename(self, export_format: str, compress: bool) -> str:
+        extension = EXPORT_FORMATS[export_format][1]
+        return f"issues.{extension}.gz" if compress else f"issues.{extension}"
+
+    async def _pages(self, columns: List[str], filters: Dict[str, Any]) -> AsyncIterator[List[Dict[str, Any]]]:
+        # The cursor key must be selected even when it is not exported
+        selected = columns if "id" in columns else ["id"] + columns
+        async for page in supabase_client.select_cursor(
+            table="issues",
+            columns=",".join(selected),
+            filters=filters,
+            key="id",
+            page_size=self.page_size
+        ):
+            yield page
+
+    async def _csv(self, columns: List[str], filters: Dict[str, Any]) -> AsyncIterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        async for page in self._pages(columns, filters):
+            writer.writerows([row.get(column) for column in columns] for row in page)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+
+    async def _ndjson(self, columns: List[str], filters: Dict[str, Any]) -> AsyncIterator[bytes]:
+        async for page in self._pages(columns, filters):
+            yield "".join(
+                json.dumps({column: row.get(column) for column in columns}, default=str) + "\n" for row in page
+            ).encode("utf-8")
+
+    def _arrow_schema(self, columns: List[str]):
+        types = {
+            "string": pa.string(),
+            "float64": pa.float64(),
+            "int16": pa.int16(),
+            "timestamp": pa.timestamp("us", tz="UTC")
+        }
+        return pa.schema([(column, types[EXPORT_COLUMNS[column]]) for column in columns])
+
+    async def _parquet(self, columns: List[str], filters: Dict[str, Any]) -> AsyncIterator[bytes]:
+        schema = self._arrow_schema(columns)
+        timestamp_columns = [column for column in columns if EXPORT_COLUMNS[column] == "timestamp"]
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema, compression="snappy")
+        try:
+            async for page in self._pages(columns, filters):
+                data = {column: [row.get(column) for row in page] for column in columns}
+                for column in timestamp_columns:
+                    data[column] = [parse_timestamp(value) for value in data[column]]
+                # One row group per page keeps the writer's buffer at one page
+                writer.write_table(pa.Table.from_pydict(data, schema=schema))
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    async def stream(
+        self,
+        export_format: str,
+        columns: List[str],
+        filters: Dict[str, Any],
+        compress: bool = False
+    ) -> AsyncIterator[bytes]:
+        """Encoded export bytes, one chunk per page (gzip-compressed when requested)"""
+        encoder = {"csv": self._csv, "ndjson": self._ndjson, "parquet": self._parquet}[export_format]
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        async for chunk in encoder(columns, filters):
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+        if compressor:
+            yield compressor.flush()
+
+
+# Global instance
+issue_exporter = IssueExporter()
@@ -0,0 +1,195 @@
+"""
+Columnar in-memory store of issues for analytics
+
+Each analytics attribute is one contiguous NumPy column instead of a key in a
+per-issue dict: category, status, location, authority and reporter are
+dictionary-encoded into small integer codes, timestamps are epoch seconds and
+coordinates are float32. A row costs ~40 bytes instead of ~1.5 KB, and group-bys
+are np.bincount calls over code columns.
+
+The store is loaded from Supabase in pages at startup and kept current by the
+CRUD layer on create and status change.
+"""
+
+import time
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+
+from app.services.sketches import hash64
+from app.services.timestamps import epoch_seconds, parse_timestamp, MISSING_EPOCH
+
+
+# Column name -> dtype; string columns hold codes into a Dictionary
+COLUMN_TYPES = {
+    "category": np.int16,
+    "status": np.int16,
+    "location": np.int32,
+    "authority": np.int32,
+    "reporter": np.int32,
+    "severity": np.int8,
+    "rating": np.int8,
+    "created_at": np.int64,
+    "completed_at": np.int64,
+    "latitude": np.float32,
+    "longitude": np.float32
+}
+
+# Encoded column -> (issue field, value used when the field is empty)
+ENCODED_FIELDS = {
+    "category": ("category", "unknown"),
+    "status": ("status", "pending"),
+    "location": ("location", "Unknown Location"),
+    "authority": ("assigned_authority_id", "unassigned"),
+    "reporter": ("user_id", "anonymous")
+}
+
+
+class Dictionary:
+    """Append-only string <-> code mapping for one encoded column"""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def encode(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def encode_many(self, values: List[str]) -> np.ndarray:
+        return np.fromiter((self.encode(value) for value in values), dtype=np.int64, count=len(values))
+
+    def code(self, value: str) -> int:
+        """Code of an existing value, -1 if it was never seen"""
+        return self.codes.get(value, -1)
+
+
+class ColumnarIssueStore:
+    def __init__(self):
+        self.is_ready = False
+        self._capacity = 1024
+        self._size = 0
+        self._columns = {name: np.zeros(self._capacity, dtype=dtype) for name, dtype in COLUMN_TYPES.items()}
+        self.dictionaries = {name: Dictionary() for name in ENCODED_FIELDS}
+        self._slots: Dict[str, int] = {}
+        self._reporter_hashes = np.zeros(0, dtype=np.uint64)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _reserve(self, count: int) -> None:
+        if self._size + count <= self._capacity:
+            return
+        while self._size + count > self._capacity:
+            self._capacity *= 2
+        for name, old in self._columns.items():
+            new = np.zeros(self._capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            self._columns[name] = new
+
+    def _encode_page(self, issues: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        """Column arrays for a page of issue dicts"""
+        page = {
+            name: self.dictionaries[name].encode_many([str(issue.get(field) or default) for issue in issues])
+            for name, (field, default) in ENCODED_FIELDS.items()
+        }
+        page["severity"] = np.array([issue.get("severity_level") or 1 for issue in issues], dtype=np.int8)
+        page["rating"] = np.array([issue.get("citizen_satisfaction_rating") or 0 for issue in issues], dtype=np.int8)
+        page["created_at"] = epoch_seconds([issue.get("created_at") for issue in issues])
+        page["completed_at"] = epoch_seconds([issue.get("actual_completion_date") for issue in issues])
+        page["latitude"] = np.array(
+            [issue["latitude"] if issue.get("latitude") is not None else np.nan for issue in issues], dtype=np.float32
+        )
+        page["longitude"] = np.array(
+            [issue["longitude"] if issue.get("longitude") is not None else np.nan for issue in issues], dtype=np.float32
+        )
+        return page
+
+    def load(self, issues: List[Dict[str, Any]]) -> None:
+        """Upsert a page of issues; new rows are appended as whole column slices"""
+        issues = [issue for issue in issues if issue and issue.get("id") is not None]
+        if not issues:
+            return
+
+        page = self._encode_page(issues)
+        slots = np.empty(len(issues), dtype=np.int64)
+        new_rows = 0
+        for i, issue in enumerate(issues):
+            issue_id = str(issue["id"])
+            slot = self._slots.get(issue_id)
+            if slot is None:
+                slot = self._slots[issue_id] = self._size + new_rows
+                new_rows += 1
+            slots[i] = slot
+
+        self._reserve(new_rows)
+        self._size += new_rows
+        for name, values in page.items():
+            self._columns[name][slots] = values
+
+    def upsert(self, issue: Dict[str, Any]) -> None:
+        self.load([issue])
+
+    def update_status(self, issue_id: str, status: str, changed_at: Optional[float] = None) -> None:
+        slot = self._slots.get(str(issue_id))
+        if slot is None:
+            return
+        self._columns["status"][slot] = self.dictionaries["status"].encode(status)
+        if status == "resolved" and self._columns["completed_at"][slot] == MISSING_EPOCH:
+            self._columns["completed_at"][slot] = int(changed_at or time.time())
+
+    def set_completed_at(self, issue_id: str, completed_at: str) -> None:
+        """Fill a missing completion time (e.g. from the issue_updates transition)"""
+        slot = self._slots.get(str(issue_id))
+        parsed = parse_timestamp(completed_at)
+        if slot is not None and parsed and self._columns["completed_at"][slot] == MISSING_EPOCH:
+            self._columns["completed_at"][slot] = int(parsed.timestamp())
+
+    def resolved_without_completion(self) -> List[str]:
+        resolved = self.dictionaries["status"].code("resolved")
+        size = self._size
+        mask = (self._columns["status"][:size] == resolved) & (self._columns["completed_at"][:size] == MISSING_EPOCH)
+        slots = set(np.flatnonzero(mask).tolist())
+        return [issue_id for issue_id, slot in self._slots.items() if slot in slots]
+
+    def window(self, since: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """Column slices (copies) for issues created at or after `since` (epoch seconds)"""
+        columns = {name: values[:self._size] for name, values in self._columns.items()}
+        if since is None:
+            return {name: values.copy() for name, values in columns.items()}
+        mask = columns["created_at"] >= since
+        return {name: values[mask] for name, values in columns.items()}
+
+    def group_count(self, name: str, codes: np.ndarray) -> Dict[str, int]:
+        """Count rows per value of an encoded column"""
+        counts = np.bincount(codes, minlength=len(self.dictionaries[name]))
+        values = self.dictionaries[name].values
+        return {values[code]: int(counts[code]) for code in np.flatnonzero(counts)}
+
+    def reporter_hashes(self) -> np.ndarray:
+        """hash64 of each reporter code's user_id (0 for anonymous), extended as new reporters appear"""
+        values = self.dictionaries["reporter"].values
+        known = self._reporter_hashes.size
+        if known < len(values):
+            added = np.fromiter(
+                (0 if value == "anonymous" else hash64(value) for value in values[known:]),
+                dtype=np.uint64,
+                count=len(values) - known
+            )
+            self._reporter_hashes = np.concatenate([self._reporter_hashes, added])
+        return self._reporter_hashes
+
+    def memory_bytes(self) -> Tuple[int, int]:
+        """(column bytes for the live rows, allocated column bytes)"""
+        used = sum(values.itemsize * self._size for values in self._columns.values())
+        allocated = sum(values.nbytes for values in self._columns.values())
+        return used, allocated
+
+
+# Global instance
+issue_store = ColumnarIssueStore()
@@ -4,21 +4,81 @@ Location service for address geocoding and coordinate conversion
 
 import httpx
 import json
+import logging
+from collections import OrderedDict
 from typing import Dict, Any, Optional, Tuple
+import numpy as np
 from decouple import config
 
+from app.core.metrics import metrics
+from app.core.tracing import tracer
+from app.services import geo
+
+logger = logging.getLogger(__name__)
+
+
+# Administrative centres of the 25 districts, used for offline coordinate lookup
+SRI_LANKAN_DISTRICTS = [
+    {"name": "Colombo", "province": "Western", "latitude": 6.9271, "longitude": 79.8612},
+    {"name": "Gampaha", "province": "Western", "latitude": 7.0917, "longitude": 79.9999},
+    {"name": "Kalutara", "province": "Western", "latitude": 6.5854, "longitude": 79.9607},
+    {"name": "Kandy", "province": "Central", "latitude": 7.2906, "longitude": 80.6337},
+    {"name": "Matale", "province": "Central", "latitude": 7.4675, "longitude": 80.6234},
+    {"name": "Nuwara Eliya", "province": "Central", "latitude": 6.9497, "longitude": 80.7891},
+    {"name": "Galle", "province": "Southern", "latitude": 6.0535, "longitude": 80.221},
+    {"name": "Matara", "province": "Southern", "latitude": 5.9549, "longitude": 80.555},
+    {"name": "Hambantota", "province": "Southern", "latitude": 6.1241, "longitude": 81.1185},
+    {"name": "Jaffna", "province": "Northern", "latitude": 9.6615, "longitude": 80.0255},
+    {"name": "Kilinochchi", "province": "Northern", "latitude": 9.3803, "longitude": 80.377},
+    {"name": "Mannar", "province": "Northern", "latitude": 8.981, "longitude": 79.9044},
+    {"name": "Vavuniya", "province": "Northern", "latitude": 8.7514, "longitude": 80.4971},
+    {"name": "Mullaitivu", "province": "Northern", "latitude": 9.2671, "longitude": 80.8142},
+    {"name": "Batticaloa", "province": "Eastern", "latitude": 7.731, "longitude": 81.6747},
+    {"name": "Ampara", "province": "Eastern", "latitude": 7.2912, "longitude": 81.6724},
+    {"name": "Trincomalee", "province": "Eastern", "latitude": 8.5874, "longitude": 81.2152},
+    {"name": "Kurunegala", "province": "North Western", "latitude": 7.4863, "longitude": 80.3647},
+    {"name": "Puttalam", "province": "North Western", "latitude": 8.0362, "longitude": 79.8283},
+    {"name": "Anuradhapura", "province": "North Central", "latitude": 8.3114, "longitude": 80.4037},
+    {"name": "Polonnaruwa", "province": "North Central", "latitude": 7.9403, "longitude": 81.0188},
+    {"name": "Badulla", "province": "Uva", "latitude": 6.9934, "longitude": 81.055},
+    {"name": "Moneragala", "province": "Uva", "latitude": 6.8728, "longitude": 81.3507},
+    {"name": "Ratnapura", "province": "Sabaragamuwa", "latitude": 6.6828, "longitude": 80.3992},
+    {"name": "Kegalle", "province": "Sabaragamuwa", "latitude": 7.2513, "longitude": 80.3464}
+]
+
+DISTRICT_LATITUDES = np.array([district["latitude"] for district in SRI_LANKAN_DISTRICTS])
+DISTRICT_LONGITUDES = np.array([district["longitude"] for district in SRI_LANKAN_DISTRICTS])
+
 
 class LocationService:
     def __init__(self):
         # You can use Google Maps API, OpenStreetMap Nominatim, or other services
         # For demo, using OpenStreetMap Nominatim (free, no API key required)
-        self.nominatim_base = "https://nominatim.openstreetmap.org"
+        self.nominatim_base = config("NOMINATIM_BASE_URL", default="https://nominatim.openstreetmap.org").rstrip("/")
         self.google_api_key = config("GOOGLE_MAPS_API_KEY", default="")
         
+        self.sri_lanka_bounds = {
+            "north": 9.8,
+            "south": 5.9,
+            "east": 81.9,
+            "west": 79.6
+        }
+        
+        # LRU caches for Nominatim results (addresses and ~11 m coordinate cells)
+        self.cache_size = config("GEOCODE_CACHE_SIZE", default=2048, cast=int)
+        self._geocode_cache: OrderedDict = OrderedDict()
+        self._reverse_cache: OrderedDict = OrderedDict()
+        
     async def geocode_address(self, address: str) -> Optional[Dict[str, Any]]:
         """
         Convert address to coordinates using OpenStreetMap Nominatim
         """
+        cache_key = address.strip().lower()
+        cached = self._cache_get(self._geocode_cache, cache_key)
+        metrics.record_cache("geocode", cached is not None)
+        if cached:
+            return cached
+        
         try:
             # Enhance address for Sri Lanka context
             enhanced_address = self._enhance_sri_lanka_address(address)
@@ -37,13 +97,14 @@ class LocationService:
             }
             
             async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params, headers=headers)
-                response.raise_for_status()
+                with tracer.upstream("nominatim", "nominatim", "search"):
+                    response = await client.get(url, params=params, headers=headers)
+                    response.raise_for_status()
                 
                 data = response.json()
                 if data and len(data) > 0:
                     result = data[0]
-                    return {
+                    location_data = {
                         "latitude": float(result["lat"]),
                         "longitude": float(result["lon"]),
                         "formatted_address": result.get("display_name", ""),
@@ -59,9 +120,20 @@ class LocationService:
                         "confidence": float(result.get("importance", 0.5)),
                         "type": result.get("type", "unknown")
                     }
+                    self._cache_put(self._geocode_cache, cache_key, location_data)
+                    self._cache_put(
+                        self._reverse_cache,
+                        self._coordinate_key(location_data["latitude"], location_data["longitude"]),
+                        {
+                            "formatted_address": location_data["formatted_address"],
+                            "address_components": location_data["address_components"],
+                            "type": location_data["type"]
+                        }
+                    )
+                    return location_data
                     
         except Exception as e:
-            print(f"Geocoding error: {e}")
+            logger.error("Geocoding error: %s", e)
             
         return None
     
@@ -69,6 +141,12 @@ class LocationService:
         """
         Convert coordinates to address
         """
+        cache_key = self._coordinate_key(latitude, longitude)
+        cached = self._cache_get(self._reverse_cache, cache_key)
+        metrics.record_cache("reverse_geocode", cached is not None)
+        if cached:
+            return cached
+        
         try:
             url = f"{self.nominatim_base}/reverse"
             params = {
@@ -84,12 +162,13 @@ class LocationService:
             }
             
             async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params, headers=headers)
-                response.raise_for_status()
+                with tracer.upstream("nominatim", "nominatim", "reverse"):
+                    response = await client.get(url, params=params, headers=headers)
+                    response.raise_for_status()
                 
                 data = response.json()
                 if data:
-                    return {
+                    address_data = {
                         "formatted_address": data.get("display_name", ""),
                         "address_components": {
                             "road": data.get("address", {}).get("road", ""),
@@ -102,9 +181,11 @@ class LocationService:
                         },
                         "type": data.get("type", "unknown")
                     }
+                    self._cache_put(self._reverse_cache, cache_key, address_data)
+                    return address_data
                     
         except Exception as e:
-            print(f"Reverse geocoding error: {e}")
+            logger.error("Reverse geocoding error: %s", e)
             
         return None
     
@@ -162,8 +243,9 @@ class LocationService:
             }
             
             async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params, headers=headers)
-                response.raise_for_status()
+                with tracer.upstream("nominatim", "nominatim", "suggest"):
+                    response = await client.get(url, params=params, headers=headers)
+                    response.raise_for_status()
                 
                 data = response.json()
                 suggestions = []
@@ -180,40 +262,91 @@ class LocationService:
                 return suggestions
                 
         except Exception as e:
-            print(f"Location suggestions error: {e}")
+            logger.error("Location suggestions error: %s", e)
             return []
     
     def get_sri_lankan_districts(self) -> list:
         """
         Get list of Sri Lankan districts for reference
         """
-        return [
-            {"name": "Colombo", "province": "Western"},
-            {"name": "Gampaha", "province": "Western"},
-            {"name": "Kalutara", "province": "Western"},
-            {"name": "Kandy", "province": "Central"},
-            {"name": "Matale", "province": "Central"},
-            {"name": "Nuwara Eliya", "province": "Central"},
-            {"name": "Galle", "province": "Southern"},
-            {"name": "Matara", "province": "Southern"},
-            {"name": "Hambantota", "province": "Southern"},
-            {"name": "Jaffna", "province": "Northern"},
-            {"name": "Kilinochchi", "province": "Northern"},
-            {"name": "Mannar", "province": "Northern"},
-            {"name": "Vavuniya", "province": "Northern"},
-            {"name": "Mullaitivu", "province": "Northern"},
-            {"name": "Batticaloa", "province": "Eastern"},
-            {"name": "Ampara", "province": "Eastern"},
-            {"name": "Trincomalee", "province": "Eastern"},
-            {"name": "Kurunegala", "province": "North Western"},
-            {"name": "Puttalam", "province": "North Western"},
-            {"name": "Anuradhapura", "province": "North Central"},
-            {"name": "Polonnaruwa", "province": "North Central"},
-            {"name": "Badulla", "province": "Uva"},
-            {"name": "Moneragala", "province": "Uva"},
-            {"name": "Ratnapura", "province": "Sabaragamuwa"},
-            {"name": "Kegalle", "province": "Sabaragamuwa"}
-        ]
+        return SRI_LANKAN_DISTRICTS
+    
+    def find_nearest_district(self, latitude: float, longitude: float) -> Optional[Dict[str, Any]]:
+        """
+        Find the district whose administrative centre is closest (local lookup, no network)
+        """
+        if not self._within_sri_lanka(latitude, longitude):
+            return None
+        
+        distances = geo.haversine_km(latitude, longitude, DISTRICT_LATITUDES, DISTRICT_LONGITUDES)
+        nearest = int(np.argmin(distances))
+        
+        return {**SRI_LANKAN_DISTRICTS[nearest], "distance_km": round(float(distances[nearest]), 2)}
+    
+    def nearest_district_indices(self, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+        """
+        Index into SRI_LANKAN_DISTRICTS of the nearest district for many points (-1 outside Sri Lanka)
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        if latitudes.size == 0:
+            return np.empty(0, dtype=np.int64)
+    
+        indices = np.argmin(geo.distance_matrix_km(latitudes, longitudes, DISTRICT_LATITUDES, DISTRICT_LONGITUDES), axis=1)
+        inside = (
+            (latitudes >= self.sri_lanka_bounds["south"]) & (latitudes <= self.sri_lanka_bounds["north"]) &
+            (longitudes >= self.sri_lanka_bounds["west"]) & (longitudes <= self.sri_lanka_bounds["east"])
+        )
+        return np.where(inside, indices, -1)
+    
+    def resolve_coordinates_locally(self, latitude: float, longitude: float) -> Optional[Dict[str, Any]]:
+        """
+        Describe coordinates from the geocode cache or the district lookup, never the network
+        """
+        cached = self._cache_get(self._reverse_cache, self._coordinate_key(latitude, longitude))
+        if cached:
+            return {**cached, "source": "geocode_cache"}
+        
+        district = self.find_nearest_district(latitude, longitude)
+        if not district:
+            return None
+        
+        return {
+            "formatted_address": f"Near {district['name']}, {district['province']} Province, Sri Lanka",
+            "address_components": {
+                "road": "",
+                "suburb": "",
+                "city": "",
+                "district": district["name"],
+                "province": f"{district['province']} Province",
+                "postcode": "",
+                "country": "Sri Lanka"
+            },
+            "type": "district",
+            "source": "district_lookup"
+        }
+    
+    def _within_sri_lanka(self, latitude: float, longitude: float) -> bool:
+        return (
+            self.sri_lanka_bounds["south"] <= latitude <= self.sri_lanka_bounds["north"] and
+            self.sri_lanka_bounds["west"] <= longitude <= self.sri_lanka_bounds["east"]
+        )
+    
+    def _coordinate_key(self, latitude: float, longitude: float) -> Tuple[float, float]:
+        # ~11 m grid, close enough to share a reverse geocode result
+        return (round(latitude, 4), round(longitude, 4))
+    
+    def _cache_get(self, cache: OrderedDict, key) -> Optional[Dict[str, Any]]:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+    
+    def _cache_put(self, cache: OrderedDict, key, value: Dict[str, Any]) -> None:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
     
     async def validate_sri_lankan_location(self, address: str) -> Dict[str, Any]:
         """
@@ -230,17 +363,7 @@ class LocationService:
         
         # Check if coordinates are within Sri Lanka bounds
         lat, lon = location_data["latitude"], location_data["longitude"]
-        sri_lanka_bounds = {
-            "north": 9.8,
-            "south": 5.9,
-            "east": 81.9,
-            "west": 79.6
-        }
-        
-        within_bounds = (
-            sri_lanka_bounds["south"] <= lat <= sri_lanka_bounds["north"] and
-            sri_lanka_bounds["west"] <= lon <= sri_lanka_bounds["east"]
-        )
+        within_bounds = self._within_sri_lanka(lat, lon)
         
         return {
             "valid": within_bounds,
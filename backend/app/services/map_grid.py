@@ -0,0 +1,142 @@
+"""
+Hierarchical grid of issue counts for map viewports
+
+Each issue is counted in one cell per zoom level of a Web Mercator pyramid
+(8 x 8 cells per map tile), and every cell keeps its count and coordinate and
+severity sums. A viewport query at zoom z only reads the level-z cells inside
+the bounding box, so its cost depends on the size of the viewport, never on
+how many issues fall inside it.
+"""
+
+from typing import Dict, Any, List, Tuple
+import numpy as np
+from decouple import config
+
+
+# 2^3 = 8 cells per tile edge, i.e. clusters roughly 32 px apart on screen
+CELL_BITS = 3
+MAX_MERCATOR_LATITUDE = 85.05112878
+
+
+def cell_coordinates(latitudes: np.ndarray, longitudes: np.ndarray, level: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Integer Web Mercator (x, y) arrays of the cells containing points at a pyramid level
+
+    Every cell lookup goes through this one function, so a point always lands in
+    the same cell whether it was added alone or in a bulk load.
+    """
+    latitudes = np.clip(np.asarray(latitudes, dtype=np.float64), -MAX_MERCATOR_LATITUDE, MAX_MERCATOR_LATITUDE)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    scale = 1 << level
+    xs = np.minimum(((longitudes + 180.0) / 360.0 * scale).astype(np.int64), scale - 1)
+    ys = np.minimum(
+        ((1.0 - np.arcsinh(np.tan(np.radians(latitudes))) / np.pi) / 2.0 * scale).astype(np.int64), scale - 1
+    )
+    return xs, ys
+
+
+def tile_coordinates(latitude: float, longitude: float, level: int) -> Tuple[int, int]:
+    """Integer Web Mercator (x, y) of the cell containing a point at a pyramid level"""
+    xs, ys = cell_coordinates(np.array([latitude]), np.array([longitude]), level)
+    return int(xs[0]), int(ys[0])
+
+
+class MapGrid:
+    def __init__(self):
+        # Highest zoom answered with clusters; above it the map shows individual issues
+        self.max_cluster_zoom = config("MAP_CLUSTER_MAX_ZOOM", default=14, cast=int)
+        self.finest_level = self.max_cluster_zoom + CELL_BITS
+
+        # Per zoom level: (x, y) -> [count, latitude_sum, longitude_sum, severity_sum]
+        self._levels: List[Dict[Tuple[int, int], List[float]]] = [
+            {} for _ in range(self.max_cluster_zoom + 1)
+        ]
+        # (cells, shift from the finest level) per zoom, precomputed for add()
+        self._level_shifts = [
+            (cells, self.finest_level - (zoom + CELL_BITS)) for zoom, cells in enumerate(self._levels)
+        ]
+
+    def add(self, latitude: float, longitude: float, severity: int, sign: int = 1) -> None:
+        x, y = tile_coordinates(latitude, longitude, self.finest_level)
+        if sign < 0 and (x, y) not in self._levels[-1]:
+            # Never counted (or already removed): nothing to take away
+            return
+        for cells, shift in self._level_shifts:
+            key = (x >> shift, y >> shift)
+            cell = cells.get(key)
+            if cell is None:
+                if sign > 0:
+                    cells[key] = [sign, sign * latitude, sign * longitude, sign * severity]
+                continue
+            cell[0] += sign
+            cell[1] += sign * latitude
+            cell[2] += sign * longitude
+            cell[3] += sign * severity
+            if cell[0] <= 0:
+                # Counts never go below zero; an emptied cell is dropped
+                del cells[key]
+
+    def add_many(self, latitudes: np.ndarray, longitudes: np.ndarray, severities: np.ndarray) -> None:
+        """Vectorized add for bulk loads: one np.unique per level instead of a dict update per point"""
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        severities = np.asarray(severities, dtype=np.float64)
+        xs, ys = cell_coordinates(latitudes, longitudes, self.finest_level)
+
+        for cells, shift in self._level_shifts:
+            keys, inverse = np.unique(((xs >> shift) << 32) | (ys >> shift), return_inverse=True)
+            counts = np.bincount(inverse)
+            latitude_sums = np.bincount(inverse, weights=latitudes)
+            longitude_sums = np.bincount(inverse, weights=longitudes)
+            severity_sums = np.bincount(inverse, weights=severities)
+            for i, key in enumerate(keys.tolist()):
+                cell_key = (key >> 32, key & 0xFFFFFFFF)
+                cell = cells.get(cell_key)
+                if cell is None:
+                    cell = cells[cell_key] = [0, 0.0, 0.0, 0.0]
+                cell[0] += int(counts[i])
+                cell[1] += float(latitude_sums[i])
+                cell[2] += float(longitude_sums[i])
+                cell[3] += float(severity_sums[i])
+
+    def remove(self, latitude: float, longitude: float, severity: int) -> None:
+        self.add(latitude, longitude, severity, sign=-1)
+
+    def level_counts(self) -> Dict[int, int]:
+        """Occupied cells per zoom level"""
+        return {zoom: len(cells) for zoom, cells in enumerate(self._levels)}
+
+    def clusters(self, box: Tuple[float, float, float, float], zoom: int) -> List[Dict[str, Any]]:
+        """Cluster markers for the cells of a (min_lat, min_lon, max_lat, max_lon) box"""
+        zoom = max(0, min(int(zoom), self.max_cluster_zoom))
+        level = zoom + CELL_BITS
+        cells = self._levels[zoom]
+        min_lat, min_lon, max_lat, max_lon = box
+
+        # Mercator y grows southwards
+        x_min, y_min = tile_coordinates(max_lat, min_lon, level)
+        x_max, y_max = tile_coordinates(min_lat, max_lon, level)
+
+        if (x_max - x_min + 1) * (y_max - y_min + 1) <= len(cells):
+            keys = (
+                (x, y) for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1)
+                if (x, y) in cells
+            )
+        else:
+            # Fewer occupied cells than viewport cells: walk the occupied ones
+            keys = (
+                key for key in cells
+                if x_min <= key[0] <= x_max and y_min <= key[1] <= y_max
+            )
+
+        clusters = []
+        for key in keys:
+            count, latitude_sum, longitude_sum, severity_sum = cells[key]
+            clusters.append({
+                "id": f"{zoom}/{key[0]}/{key[1]}",
+                "latitude": round(latitude_sum / count, 6),
+                "longitude": round(longitude_sum / count, 6),
+                "count": int(count),
+                "avg_severity": round(severity_sum / count, 2)
+            })
+        return clusters
@@ -0,0 +1,453 @@
+"""
+Incremental rollup cube for issue analytics
+
+Issues are rolled up into cells keyed by (hour bucket, category, status,
+severity, district). Each cell holds a count plus satisfaction and resolution
+sums, stored column-wise in NumPy arrays with the categorical dimensions
+dictionary-encoded. The CRUD layer moves an issue between cells when it is
+created or its status changes, and a periodic reconcile rebuilds the cube from
+Supabase to absorb writes made elsewhere. A `days` window is then a range sum
+over the bucket column instead of a table scan. Windows start at a UTC day
+boundary (the aggregate reports it as window_start), so the counts cover the
+same days as the per-day sketches merged alongside them.
+
+The reconcile only reads issues created in the last ROLLUP_RETENTION_DAYS days
+(the longest analytics window), so the per-issue entries (about 300 bytes each)
+and cells stay bounded by the issues of one retention window.
+
+Distinct reporters are tracked with one HyperLogLog per (day, category) and
+(day, district). Days older than ROLLUP_DAILY_REPORTER_DAYS share one sketch
+per 7-day block, and a window reaching back that far starts at a block
+boundary: with 2 KB sketches and a year of retention this keeps them to a few
+MB instead of about 25 MB of daily sketches.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from decouple import config
+
+from app.core.metrics import metrics
+from app.services.analytics_engine import (
+    analytics_engine, PENDING_STATUSES, IN_PROGRESS_STATUSES, RESOLUTION_SKETCH_ACCURACY, REPORTER_SKETCH_PRECISION
+)
+from app.services.location_service import location_service, SRI_LANKAN_DISTRICTS
+from app.services.sketches import DDSketch, HyperLogLog, hash64
+from app.services.supabase_client import supabase_client
+from app.services.timestamps import parse_timestamp
+
+logger = logging.getLogger(__name__)
+
+
+# Columns needed to place an issue in the cube
+ROLLUP_COLUMNS = (
+    "id,user_id,category,status,severity_level,latitude,longitude,assigned_authority_id,"
+    "created_at,actual_completion_date,citizen_satisfaction_rating"
+)
+
+# District dimension: the 25 districts plus a bucket for issues without usable coordinates
+DISTRICT_NAMES = [district["name"] for district in SRI_LANKAN_DISTRICTS] + ["Unknown"]
+UNKNOWN_DISTRICT = len(DISTRICT_NAMES) - 1
+
+# Cell columns and their dtypes
+CELL_COLUMNS = {
+    "bucket": np.int32,
+    "category": np.int16,
+    "status": np.int16,
+    "severity": np.int8,
+    "district": np.int8,
+    "count": np.int32,
+    "rating_sum": np.int32,
+    "rating_count": np.int32,
+    "resolution_hours_sum": np.float64,
+    "resolution_count": np.int32
+}
+
+# Per-issue contribution:
+# (created_epoch, bucket, category, status, severity, district, rating, resolution_hours, authority)
+IssueEntry = Tuple[float, int, int, int, int, int, int, Optional[float], str]
+
+
+class IssueRollupCube:
+    def __init__(self):
+        # Seconds between full rebuilds from Supabase
+        self.reconcile_interval = config("ROLLUP_RECONCILE_INTERVAL", default=900, cast=int)
+        self.page_size = config("ROLLUP_PAGE_SIZE", default=1000, cast=int)
+        # Days of issues kept in the cube (the longest analytics window)
+        self.retention_days = config("ROLLUP_RETENTION_DAYS", default=365, cast=int)
+        # Days of daily reporter sketches before they are kept per 7-day block
+        self.daily_reporter_days = config("ROLLUP_DAILY_REPORTER_DAYS", default=31, cast=int)
+
+        self.is_ready = False
+        self.reconciled_at: Optional[float] = None
+        self._reconciling = False
+        self._pending: List[Tuple[str, tuple]] = []
+        self._reset()
+
+    def _reset(self) -> None:
+        self._capacity = 1024
+        self._size = 0
+        self._columns = {name: np.zeros(self._capacity, dtype=dtype) for name, dtype in CELL_COLUMNS.items()}
+        self._rows: Dict[Tuple[int, int, int, int, int], int] = {}
+        self._issues: Dict[str, IssueEntry] = {}
+        self._categories: List[str] = []
+        self._category_codes: Dict[str, int] = {}
+        self._statuses: List[str] = []
+        self._status_codes: Dict[str, int] = {}
+        # Resolution-time sketches per (day bucket, dimension, value), mergeable over any window
+        self._sketches: Dict[Tuple[int, str, str], DDSketch] = {}
+        # Distinct-reporter sketches per (day bucket or 7-day block start, dimension, value);
+        # insert-only, so status changes never touch them
+        self._reporters: Dict[Tuple[int, str, str], HyperLogLog] = {}
+
+    def __len__(self) -> int:
+        return len(self._issues)
+
+    @property
+    def cell_count(self) -> int:
+        return self._size
+
+    def _encode(self, values: List[str], codes: Dict[str, int], value: str) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+    def _grow(self) -> None:
+        self._capacity *= 2
+        for name, old in self._columns.items():
+            new = np.zeros(self._capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            self._columns[name] = new
+
+    def _row(self, key: Tuple[int, int, int, int, int]) -> int:
+        row = self._rows.get(key)
+        if row is None:
+            if self._size == self._capacity:
+                self._grow()
+            row = self._rows[key] = self._size
+            self._size += 1
+            columns = self._columns
+            columns["bucket"][row], columns["category"][row], columns["status"][row], \
+                columns["severity"][row], columns["district"][row] = key
+        return row
+
+    def _apply(self, entry: IssueEntry, sign: int) -> None:
+        """Add (sign=1) or remove (sign=-1) an issue's contribution to its cell"""
+        _, bucket, category, status, severity, district, rating, resolution_hours, authority = entry
+        row = self._row((bucket, category, status, severity, district))
+        columns = self._columns
+        columns["count"][row] += sign
+        if rating:
+            columns["rating_sum"][row] += sign * rating
+            columns["rating_count"][row] += sign
+        if resolution_hours is not None:
+            columns["resolution_hours_sum"][row] += sign * resolution_hours
+            columns["resolution_count"][row] += sign
+
+            day = bucket // 24
+            for key in ((day, "all", ""), (day, "category", self._categories[category]), (day, "authority", authority)):
+                sketch = self._sketches.get(key)
+                if sketch is None:
+                    sketch = self._sketches[key] = DDSketch(RESOLUTION_SKETCH_ACCURACY)
+                sketch.add(resolution_hours, sign)
+                if sketch.count == 0:
+                    del self._sketches[key]
+
+    def _entry(self, issue: Dict[str, Any], district: Optional[int] = None) -> Optional[IssueEntry]:
+        created_at = parse_timestamp(issue.get("created_at"))
+        created_epoch = created_at.timestamp() if created_at else time.time()
+
+        resolution_hours = None
+        completed_at = parse_timestamp(issue.get("actual_completion_date"))
+        if created_at and completed_at and completed_at >= created_at:
+            resolution_hours = (completed_at - created_at).total_seconds() / 3600
+
+        if district is None:
+            district = UNKNOWN_DISTRICT
+            if issue.get("latitude") is not None and issue.get("longitude") is not None:
+                index = int(location_service.nearest_district_indices(
+                    [float(issue["latitude"])], [float(issue["longitude"])]
+                )[0])
+                if index >= 0:
+                    district = index
+
+        return (
+            created_epoch,
+            int(created_epoch // 3600),
+            self._encode(self._categories, self._category_codes, issue.get("category") or "unknown"),
+            self._encode(self._statuses, self._status_codes, issue.get("status") or "pending"),
+            int(issue.get("severity_level") or 1),
+            district,
+            int(issue.get("citizen_satisfaction_rating") or 0),
+            resolution_hours,
+            str(issue.get("assigned_authority_id") or "unassigned")
+        )
+
+    def add(self, issue: Dict[str, Any], district: Optional[int] = None) -> None:
+        """Roll a created (or re-read) issue into the cube"""
+        if not issue or issue.get("id") is None:
+            return
+        if self._reconciling:
+            self._pending.append(("add", (dict(issue),)))
+
+        issue_id = str(issue["id"])
+        previous = self._issues.get(issue_id)
+        if previous:
+            self._apply(previous, -1)
+
+        entry = self._entry(issue, district)
+        self._issues[issue_id] = entry
+        self._apply(entry, 1)
+        if issue.get("user_id"):
+            self._add_reporter(entry, hash64(str(issue["user_id"])))
+
+    def _reporter_cutoff(self) -> int:
+        """First day whose reporters are kept in a daily sketch rather than a 7-day block"""
+        return int(time.time() // 86400) - self.daily_reporter_days
+
+    def _add_reporter(self, entry: IssueEntry, reporter: int) -> None:
+        day, category, district = entry[1] // 24, entry[2], entry[5]
+        if day < self._reporter_cutoff():
+            day -= day % 7
+        for key in (
+            (day, "all", ""),
+            (day, "category", self._categories[category]),
+            (day, "district", DISTRICT_NAMES[district])
+        ):
+            sketch = self._reporters.get(key)
+            if sketch is None:
+                sketch = self._reporters[key] = HyperLogLog(REPORTER_SKETCH_PRECISION)
+            sketch.add_hash(reporter)
+
+    def update_status(self, issue_id: str, status: str, changed_at: Optional[float] = None) -> None:
+        """Move an issue to the cell of its new status"""
+        changed_at = changed_at or time.time()
+        if self._reconciling:
+            self._pending.append(("update_status", (issue_id, status, changed_at)))
+
+        entry = self._issues.get(str(issue_id))
+        if entry is None:
+            return
+
+        created_epoch, bucket, category, _, severity, district, rating, resolution_hours, authority = entry
+        if status == "resolved" and resolution_hours is None:
+            resolution_hours = max(changed_at - created_epoch, 0.0) / 3600
+
+        updated = (
+            created_epoch, bucket, category,
+            self._encode(self._statuses, self._status_codes, status),
+            severity, district, rating, resolution_hours, authority
+        )
+        self._apply(entry, -1)
+        self._issues[str(issue_id)] = updated
+        self._apply(updated, 1)
+
+    def set_resolved_at(self, issue_id: str, resolved_at: float) -> None:
+        """Record when an issue without actual_completion_date reached resolved"""
+        entry = self._issues.get(str(issue_id))
+        if entry is None or entry[7] is not None:
+            return
+
+        updated = entry[:7] + (max(resolved_at - entry[0], 0.0) / 3600, entry[8])
+        self._apply(entry, -1)
+        self._issues[str(issue_id)] = updated
+        self._apply(updated, 1)
+
+    def unresolved_without_completion(self) -> List[str]:
+        """Resolved issues whose resolution time is not known yet"""
+        resolved = self._status_codes.get("resolved")
+        return [issue_id for issue_id, entry in self._issues.items() if entry[3] == resolved and entry[7] is None]
+
+    def load(self, issues: List[Dict[str, Any]]) -> None:
+        """Roll up a page of issues, resolving their districts in one vectorized pass"""
+        if not issues:
+            return
+        latitudes = np.array([issue.get("latitude") if issue.get("latitude") is not None else np.nan for issue in issues], dtype=np.float64)
+        longitudes = np.array([issue.get("longitude") if issue.get("longitude") is not None else np.nan for issue in issues], dtype=np.float64)
+        districts = location_service.nearest_district_indices(latitudes, longitudes)
+        districts = np.where(districts >= 0, districts, UNKNOWN_DISTRICT)
+
+        for issue, district in zip(issues, districts):
+            self.add(issue, int(district))
+
+    def _adopt(self, other: "IssueRollupCube") -> None:
+        for name in ("_capacity", "_size", "_columns", "_rows", "_issues", "_sketches", "_reporters",
+                     "_categories", "_category_codes", "_statuses", "_status_codes"):
+            setattr(self, name, getattr(other, name))
+
+    def window_start_day(self, days: int) -> int:
+        """First day bucket of a `days` window: a UTC day boundary, or a 7-day block one in the reporter history"""
+        start_day = int(time.time() // 86400) - days
+        if start_day < self._reporter_cutoff():
+            start_day -= start_day % 7
+        return start_day
+
+    async def reconcile(self) -> int:
+        """Rebuild the cube from Supabase, replaying writes made while scanning
+        
+        A failed page raises (select_cursor) and aborts the rebuild, keeping the
+        current cube rather than adopting a truncated one.
+        """
+        self._reconciling = True
+        self._pending = []
+        try:
+            fresh = IssueRollupCube()
+            cutoff = (datetime.now(timezone.utc) - timedelta(days=self.retention_days)).isoformat()
+            async for page in supabase_client.select_cursor(
+                table="issues",
+                columns=ROLLUP_COLUMNS,
+                filters={"created_at.gte": cutoff},
+                key="id",
+                page_size=self.page_size
+            ):
+                fresh.load(page)
+
+            # Resolved issues without actual_completion_date: use the first transition to resolved
+            transitions = await analytics_engine.fetch_resolution_transitions(fresh.unresolved_without_completion())
+            for issue_id, resolved_at in transitions.items():
+                fresh.set_resolved_at(issue_id, resolved_at.timestamp())
+
+            for operation, args in self._pending:
+                getattr(fresh, operation)(*args)
+
+            self._adopt(fresh)
+            self.is_ready = True
+            self.reconciled_at = time.time()
+            return len(self._issues)
+        finally:
+            self._reconciling = False
+            self._pending = []
+
+    async def run_reconciler(self) -> None:
+        """Reconcile now and then every reconcile_interval seconds"""
+        while True:
+            try:
+                count = await self.reconcile()
+                logger.info("Rollup cube reconciled with %s issues in %s cells", count, self.cell_count)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Error reconciling rollup cube: %s", e)
+            await asyncio.sleep(self.reconcile_interval)
+
+    def aggregate(self, days: int) -> Dict[str, Any]:
+        """Dashboard aggregates for the days since window_start_day(days) as a range sum over hour buckets"""
+        size = self._size
+        columns = {name: values[:size] for name, values in self._columns.items()}
+        start_day = self.window_start_day(days)
+        start_bucket = start_day * 24
+        rows = np.flatnonzero((columns["bucket"] >= start_bucket) & (columns["count"] > 0))
+        cells = {name: values[rows] for name, values in columns.items()}
+
+        n_categories = max(len(self._categories), 1)
+        n_statuses = max(len(self._statuses), 1)
+        count = cells["count"]
+
+        def group(codes: np.ndarray, values: np.ndarray, length: int) -> np.ndarray:
+            return np.bincount(codes, weights=values, minlength=length)
+
+        status_counts = group(cells["status"], count, n_statuses)
+        severity_counts = group(cells["severity"], count, 6)
+        hour_counts = group(cells["bucket"] % 24, count, 24)
+        district_counts = group(cells["district"], count, len(DISTRICT_NAMES))
+        category_status = group(
+            cells["category"].astype(np.int64) * n_statuses + cells["status"], count, n_categories * n_statuses
+        ).reshape(n_categories, n_statuses)
+        category_sums = {
+            name: group(cells["category"], cells[name], n_categories)
+            for name in ("rating_sum", "rating_count", "resolution_hours_sum", "resolution_count")
+        }
+
+        status_groups = {
+            "resolved": [self._status_codes[s] for s in ("resolved",) if s in self._status_codes],
+            "pending": [self._status_codes[s] for s in PENDING_STATUSES if s in self._status_codes],
+            "in_progress": [self._status_codes[s] for s in IN_PROGRESS_STATUSES if s in self._status_codes]
+        }
+
+        by_category: Dict[str, Dict[str, Any]] = {}
+        for code, category in enumerate(self._categories):
+            total = int(category_status[code].sum())
+            if total == 0:
+                continue
+            by_category[category] = {
+                "total": total,
+                **{key: int(category_status[code, codes].sum()) for key, codes in status_groups.items()},
+                "satisfaction_sum": int(category_sums["rating_sum"][code]),
+                "satisfaction_count": int(category_sums["rating_count"][code]),
+                "resolution_hours_sum": float(category_sums["resolution_hours_sum"][code]),
+                "resolution_count": int(category_sums["resolution_count"][code])
+            }
+
+        return {
+            "days": days,
+            "window_start": datetime.fromtimestamp(start_day * 86400, timezone.utc).isoformat(),
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "source": "rollup",
+            "total_issues": int(count.sum()),
+            "by_status": {status: int(status_counts[code]) for code, status in enumerate(self._statuses) if status_counts[code]},
+            "by_severity": {str(severity): int(severity_counts[severity]) for severity in range(len(severity_counts)) if severity_counts[severity]},
+            "by_category": by_category,
+            "by_hour": [int(value) for value in hour_counts],
+            "by_district": {DISTRICT_NAMES[code]: int(district_counts[code]) for code in range(len(DISTRICT_NAMES)) if district_counts[code]},
+            "resolution": {
+                "resolved": sum(stats["resolved"] for stats in by_category.values()),
+                "pending": sum(stats["pending"] for stats in by_category.values()),
+                "in_progress": sum(stats["in_progress"] for stats in by_category.values()),
+                "resolution_hours_sum": float(cells["resolution_hours_sum"].sum()),
+                "resolution_count": int(cells["resolution_count"].sum())
+            },
+            "satisfaction": {
+                "sum": int(cells["rating_sum"].sum()),
+                "count": int(cells["rating_count"].sum())
+            },
+            "resolution_sketches": self._merge_sketches(start_day),
+            "unique_reporters": self._merge_reporters(start_day)
+        }
+
+    def _merge_sketches(self, start_day: int) -> Dict[str, Any]:
+        """Resolution-time sketches merged over the day buckets of a window"""
+        merged = {
+            "overall": DDSketch(RESOLUTION_SKETCH_ACCURACY),
+            "by_category": {},
+            "by_authority": {}
+        }
+        for (day, dimension, value), sketch in self._sketches.items():
+            if day < start_day:
+                continue
+            if dimension == "all":
+                merged["overall"].merge(sketch)
+                continue
+            group = merged["by_" + dimension]
+            if value not in group:
+                group[value] = DDSketch(RESOLUTION_SKETCH_ACCURACY)
+            group[value].merge(sketch)
+        return merged
+
+    def _merge_reporters(self, start_day: int) -> Dict[str, Any]:
+        """Distinct reporters over the day buckets of a window, overall and per category/district"""
+        overall = HyperLogLog(REPORTER_SKETCH_PRECISION)
+        groups: Dict[str, Dict[str, HyperLogLog]] = {"by_category": {}, "by_district": {}}
+        for (day, dimension, value), sketch in self._reporters.items():
+            if day < start_day:
+                continue
+            if dimension == "all":
+                overall.merge(sketch)
+                continue
+            group = groups["by_" + dimension]
+            if value not in group:
+                group[value] = HyperLogLog(REPORTER_SKETCH_PRECISION)
+            group[value].merge(sketch)
+        return {
+            "overall": overall.count(),
+            **{name: {value: sketch.count() for value, sketch in group.items()} for name, group in groups.items()}
+        }
+
+
+# Global instance
+issue_rollup_cube = IssueRollupCube()
+metrics.register_queue("rollup_cube_pending", lambda: len(issue_rollup_cube._pending))
@@ -0,0 +1,217 @@
+"""
+Mergeable streaming sketches for analytics
+
+DDSketch keeps quantiles of positive values (e.g. resolution hours) within a
+fixed relative error using logarithmically sized bins. Sketches built in
+different workers or time buckets merge by adding bin counts, and values can be
+removed again, which lets the rollup cube move an issue between buckets.
+
+HyperLogLog estimates distinct counts (e.g. unique reporters) in a fixed
+2^precision bytes of registers; sketches merge by taking register maxima.
+"""
+
+import base64
+import hashlib
+import math
+from typing import Dict, Any, Iterable, Optional, Sequence
+import numpy as np
+
+
+class DDSketch:
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        # Values at or below this are counted in the zero bin
+        self.min_value = 1e-9
+
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def _value(self, key: int) -> float:
+        # Midpoint (in relative terms) of the bin (gamma^(key-1), gamma^key]
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def add(self, value: float, weight: int = 1) -> None:
+        """Add a value; a negative weight removes previously added values"""
+        if value <= self.min_value:
+            self.zero_count += weight
+        else:
+            key = self._key(value)
+            count = self.bins.get(key, 0) + weight
+            if count:
+                self.bins[key] = count
+            else:
+                self.bins.pop(key, None)
+        self.count += weight
+        self.sum += weight * value
+
+    def remove(self, value: float) -> None:
+        self.add(value, -1)
+
+    def extend(self, values: Iterable[float]) -> None:
+        for value in values:
+            self.add(value)
+
+    def add_many(self, values: np.ndarray) -> None:
+        """Vectorized extend: bin keys for a whole array, then one counter update per bin"""
+        values = np.asarray(values, dtype=np.float64)
+        positive = values[values > self.min_value]
+        keys, counts = np.unique(np.ceil(np.log(positive) / self._log_gamma).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            self.bins[key] = self.bins.get(key, 0) + count
+        self.zero_count += int(values.size - positive.size)
+        self.count += int(values.size)
+        self.sum += float(values.sum())
+
+    def merge(self, other: "DDSketch") -> "DDSketch":
+        """Fold another sketch (same accuracy) into this one"""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        for key, count in other.bins.items():
+            merged = self.bins.get(key, 0) + count
+            if merged:
+                self.bins[key] = merged
+            else:
+                self.bins.pop(key, None)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        return self
+
+    def copy(self) -> "DDSketch":
+        return DDSketch(self.relative_accuracy).merge(self)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.bins)) if self.bins else 0.0
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count > 0 else None
+
+    def summary(self, digits: int = 1) -> Dict[str, Any]:
+        """Count, mean and p50/p90/p99 rounded for API responses"""
+        def rounded(value: Optional[float]) -> Optional[float]:
+            return round(value, digits) if value is not None else None
+
+        return {
+            "count": self.count,
+            "mean": rounded(self.mean),
+            "p50": rounded(self.quantile(0.5)),
+            "p90": rounded(self.quantile(0.9)),
+            "p99": rounded(self.quantile(0.99))
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "bins": {str(key): count for key, count in self.bins.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.sum
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DDSketch":
+        sketch = cls(data["relative_accuracy"])
+        sketch.bins = {int(key): count for key, count in data["bins"].items()}
+        sketch.zero_count = data["zero_count"]
+        sketch.count = data["count"]
+        sketch.sum = data["sum"]
+        return sketch
+
+
+def hash64(value: str) -> int:
+    """Stable 64-bit hash (identical across processes, unlike hash())"""
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def hash64_many(values: Sequence[str]) -> np.ndarray:
+    return np.fromiter((hash64(value) for value in values), dtype=np.uint64, count=len(values))
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Exact bit_length of uint64 values (float64 frexp is exact below 2^53)"""
+    high = values >= (1 << 11)
+    exponents = np.frexp(np.where(high, values >> np.uint64(11), values).astype(np.float64))[1]
+    return exponents + np.where(high, 11, 0)
+
+
+class HyperLogLog:
+    def __init__(self, precision: int = 12):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+        self._alpha = 0.7213 / (1 + 1.079 / self.m)
+
+    def add_hash(self, value: int) -> None:
+        index = value >> (64 - self.precision)
+        rest = value & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add(self, value: str) -> None:
+        self.add_hash(hash64(value))
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        """Vectorized add of precomputed hash64 values"""
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if hashes.size == 0:
+            return
+        shift = np.uint64(64 - self.precision)
+        indices = (hashes >> shift).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.precision)) - 1)
+        ranks = ((64 - self.precision) - _bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, indices, ranks)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def copy(self) -> "HyperLogLog":
+        return HyperLogLog(self.precision).merge(self)
+
+    def count(self) -> int:
+        """Estimated number of distinct values (about 1.04 / sqrt(2^precision) relative error)"""
+        estimate = self._alpha * self.m * self.m / float(np.sum(np.exp2(-self.registers.astype(np.float64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.m and zeros:
+            # Small-range correction: linear counting over empty registers
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "precision": self.precision,
+            "registers": base64.b64encode(self.registers.tobytes()).decode("ascii")
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HyperLogLog":
+        sketch = cls(data["precision"])
+        sketch.registers = np.frombuffer(base64.b64decode(data["registers"]), dtype=np.uint8).copy()
+        return sketch
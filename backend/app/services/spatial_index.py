@@ -0,0 +1,297 @@
+"""
+In-memory spatial index of issue coordinates
+
+Issues are bucketed into a fixed lat/lon grid (cell -> slot list) while their
+coordinates live in contiguous NumPy arrays, so a radius query only touches the
+cells overlapping the search circle and refines the candidates with a single
+vectorized haversine pass. Each slot also keeps the issue's response fields,
+so nearby and map queries are answered from memory without a row fetch. The
+index is warmed from Supabase at startup and kept current by the CRUD layer on
+create and status change.
+"""
+
+import math
+from typing import Dict, Any, List, Optional, Tuple
+import numpy as np
+from decouple import config
+
+from app.services import geo
+from app.services.sketches import hash64
+from app.services.timestamps import parse_timestamp
+from app.services.map_grid import MapGrid
+
+
+# Columns kept per issue: every field nearby and map responses return (the
+# frontend Issue type), so warm queries never fetch rows from Supabase
+INDEXED_COLUMNS = (
+    "id,user_id,category,title,description,location,latitude,longitude,image_url,"
+    "status,severity_level,assigned_authority_id,booking_reference,created_at,updated_at"
+)
+_RECORD_FIELDS = tuple(INDEXED_COLUMNS.split(","))
+
+
+class IssueSpatialIndex:
+    def __init__(self):
+        # Grid cell size in degrees (0.01 deg is ~1.1 km at Sri Lankan latitudes)
+        self.cell_deg = config("SPATIAL_INDEX_CELL_DEG", default=0.01, cast=float)
+        # Above this many cells a query scans every point instead of walking the grid
+        self.max_query_cells = config("SPATIAL_INDEX_MAX_QUERY_CELLS", default=4096, cast=int)
+
+        self.is_ready = False
+        self._capacity = 1024
+        self._size = 0
+        self._lat = np.empty(self._capacity, dtype=np.float64)
+        self._lon = np.empty(self._capacity, dtype=np.float64)
+        self._alive = np.zeros(self._capacity, dtype=bool)
+        # Per-slot attributes for clustering and tiles: category/status codes, severity, created_at epoch
+        self._category = np.zeros(self._capacity, dtype=np.int16)
+        self._status = np.zeros(self._capacity, dtype=np.int16)
+        self._severity = np.zeros(self._capacity, dtype=np.int8)
+        self._created = np.zeros(self._capacity, dtype=np.float64)
+        # hash64 of the reporting user_id (0 when unknown), for distinct-reporter counts
+        self._reporter = np.zeros(self._capacity, dtype=np.uint64)
+        self.category_names: List[str] = []
+        self._category_codes: Dict[str, int] = {}
+        self.status_names: List[str] = []
+        self._status_codes: Dict[str, int] = {}
+        self._records: List[Optional[Dict[str, Any]]] = []
+        self._slots: Dict[str, int] = {}
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+        # Per-zoom cluster counts for map viewports, kept in step with the slots
+        self.map_grid = MapGrid()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return (math.floor(latitude / self.cell_deg), math.floor(longitude / self.cell_deg))
+
+    def _grow(self) -> None:
+        self._capacity *= 2
+        for name in ("_lat", "_lon", "_alive", "_category", "_status", "_severity", "_created", "_reporter"):
+            old = getattr(self, name)
+            new = np.zeros(self._capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def _summary(self, issue: Dict[str, Any]) -> Dict[str, Any]:
+        # Only the fields present, so a partial row does not blank the others on update
+        record = {field: issue[field] for field in _RECORD_FIELDS if field in issue}
+        record["id"] = str(issue["id"])
+        record["latitude"] = float(issue["latitude"])
+        record["longitude"] = float(issue["longitude"])
+        return record
+
+    def upsert(self, issue: Dict[str, Any], update_grid: bool = True) -> None:
+        """Add an issue or move it to its new coordinates"""
+        if not issue or issue.get("id") is None:
+            return
+        if issue.get("latitude") is None or issue.get("longitude") is None:
+            self.remove(str(issue["id"]))
+            return
+
+        record = self._summary(issue)
+        issue_id = record["id"]
+
+        if issue_id in self._slots:
+            slot = self._slots[issue_id]
+            self.map_grid.remove(float(self._lat[slot]), float(self._lon[slot]), int(self._severity[slot]))
+            old_cell = self._cell(self._lat[slot], self._lon[slot])
+            new_cell = self._cell(record["latitude"], record["longitude"])
+            if old_cell != new_cell:
+                self._cells[old_cell].remove(slot)
+                self._cells.setdefault(new_cell, []).append(slot)
+            self._records[slot] = {**self._records[slot], **record}
+        else:
+            if self._size == self._capacity:
+                self._grow()
+            slot = self._size
+            self._size += 1
+            self._slots[issue_id] = slot
+            self._records.append(record)
+            self._alive[slot] = True
+            self._cells.setdefault(self._cell(record["latitude"], record["longitude"]), []).append(slot)
+
+        self._lat[slot] = record["latitude"]
+        self._lon[slot] = record["longitude"]
+        self._set_attributes(slot, self._records[slot])
+        if "user_id" in issue:
+            self._reporter[slot] = hash64(str(issue["user_id"])) if issue["user_id"] else 0
+        if update_grid:
+            self.map_grid.add(record["latitude"], record["longitude"], int(self._severity[slot]))
+
+    def _encode(self, names: List[str], codes: Dict[str, int], value: str) -> int:
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return code
+
+    def _set_attributes(self, slot: int, record: Dict[str, Any]) -> None:
+        created_at = parse_timestamp(record.get("created_at"))
+
+        self._category[slot] = self._encode(self.category_names, self._category_codes, record.get("category") or "unknown")
+        self._status[slot] = self._encode(self.status_names, self._status_codes, record.get("status") or "pending")
+        self._severity[slot] = record.get("severity_level") or 1
+        self._created[slot] = created_at.timestamp() if created_at else 0.0
+
+    def get(self, issue_id: str) -> Optional[Dict[str, Any]]:
+        slot = self._slots.get(str(issue_id))
+        return self._records[slot] if slot is not None else None
+
+    def update_fields(self, issue_id: str, **fields) -> None:
+        """Update indexed attributes (e.g. status) of an issue in place"""
+        slot = self._slots.get(str(issue_id))
+        if slot is not None:
+            self.map_grid.remove(float(self._lat[slot]), float(self._lon[slot]), int(self._severity[slot]))
+            self._records[slot].update(fields)
+            self._set_attributes(slot, self._records[slot])
+            self.map_grid.add(float(self._lat[slot]), float(self._lon[slot]), int(self._severity[slot]))
+
+    def remove(self, issue_id: str) -> None:
+        slot = self._slots.pop(str(issue_id), None)
+        if slot is None:
+            return
+        self._cells[self._cell(self._lat[slot], self._lon[slot])].remove(slot)
+        self.map_grid.remove(float(self._lat[slot]), float(self._lon[slot]), int(self._severity[slot]))
+        self._alive[slot] = False
+        self._records[slot] = None
+
+    def load(self, issues: List[Dict[str, Any]]) -> None:
+        """Bulk upsert; new issues are added to the map grid in one vectorized pass"""
+        # An id repeated within the batch would be added to the grid twice; the last copy wins
+        latest = {}
+        for issue in issues:
+            if issue and issue.get("id") is not None:
+                latest[str(issue["id"])] = issue
+
+        new_ids = []
+        for issue in latest.values():
+            if str(issue["id"]) not in self._slots:
+                self.upsert(issue, update_grid=False)
+                new_ids.append(str(issue["id"]))
+            else:
+                self.upsert(issue)
+
+        slots = np.array([self._slots[issue_id] for issue_id in new_ids if issue_id in self._slots], dtype=np.int64)
+        if slots.size:
+            self.map_grid.add_many(self._lat[slots], self._lon[slots], self._severity[slots])
+
+    def points(self, since: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """Coordinates, category codes, severities and reporter hashes of live issues (created since an epoch)"""
+        mask = self._alive[:self._size].copy()
+        if since is not None:
+            mask &= self._created[:self._size] >= since
+        return {
+            "latitude": self._lat[:self._size][mask],
+            "longitude": self._lon[:self._size][mask],
+            "category": self._category[:self._size][mask],
+            "severity": self._severity[:self._size][mask],
+            "reporter": self._reporter[:self._size][mask]
+        }
+
+    def box_points(
+        self,
+        box: Tuple[float, float, float, float],
+        category: Optional[str] = None,
+        status: Optional[str] = None,
+        since: Optional[float] = None
+    ) -> Dict[str, np.ndarray]:
+        """Coordinates and severities of issues inside a box, optionally filtered"""
+        slots = self._box_candidates(box)
+        mask = geo.within_box(self._lat[slots], self._lon[slots], box)
+        if category is not None:
+            mask &= self._category[slots] == self._category_codes.get(category, -1)
+        if status is not None:
+            mask &= self._status[slots] == self._status_codes.get(status, -1)
+        if since is not None:
+            mask &= self._created[slots] >= since
+        slots = slots[mask]
+        return {
+            "latitude": self._lat[slots],
+            "longitude": self._lon[slots],
+            "severity": self._severity[slots]
+        }
+
+    def _candidates(self, latitude: float, longitude: float, radius_km: float) -> np.ndarray:
+        """Slots in grid cells overlapping the search circle's bounding box"""
+        return self._box_candidates(geo.bounding_box(latitude, longitude, radius_km))
+
+    def _box_candidates(self, box: Tuple[float, float, float, float]) -> np.ndarray:
+        """Slots in grid cells overlapping a (min_lat, min_lon, max_lat, max_lon) box"""
+        min_lat, min_lon, max_lat, max_lon = box
+        row_min, col_min = self._cell(min_lat, min_lon)
+        row_max, col_max = self._cell(max_lat, max_lon)
+
+        if (row_max - row_min + 1) * (col_max - col_min + 1) > self.max_query_cells:
+            return np.flatnonzero(self._alive[:self._size])
+
+        slots: List[int] = []
+        for row in range(row_min, row_max + 1):
+            for col in range(col_min, col_max + 1):
+                cell = self._cells.get((row, col))
+                if cell:
+                    slots.extend(cell)
+        return np.fromiter(slots, dtype=np.int64, count=len(slots))
+
+    def within_box(
+        self,
+        box: Tuple[float, float, float, float],
+        limit: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Issues inside a box, most severe first, and the total count before the limit"""
+        slots = self._box_candidates(box)
+        if slots.size == 0:
+            return [], 0
+
+        slots = slots[geo.within_box(self._lat[slots], self._lon[slots], box)]
+        total = int(slots.size)
+        if limit is not None and total > limit:
+            slots = slots[np.argsort(-self._severity[slots], kind="stable")[:limit]]
+
+        return [self._records[slot] for slot in slots], total
+
+    def within_radius(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        limit: Optional[int] = None
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """Issues within radius_km, nearest first, as (record, distance_km) pairs"""
+        slots = self._candidates(latitude, longitude, radius_km)
+        if slots.size == 0:
+            return []
+
+        distances = geo.haversine_km(latitude, longitude, self._lat[slots], self._lon[slots])
+        mask = distances <= radius_km
+        slots, distances = slots[mask], distances[mask]
+
+        if limit is not None and slots.size > limit:
+            top = np.argpartition(distances, limit - 1)[:limit]
+            slots, distances = slots[top], distances[top]
+        order = np.argsort(distances, kind="stable")
+
+        return [(self._records[slot], float(distances[i])) for i, slot in zip(order, slots[order])]
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int,
+        max_radius_km: float = 1000.0
+    ) -> List[Tuple[Dict[str, Any], float]]:
+        """The k nearest issues, found by doubling the search radius"""
+        if k <= 0 or not self._slots:
+            return []
+
+        radius_km = self.cell_deg * geo.KM_PER_DEGREE_LAT
+        while True:
+            hits = self.within_radius(latitude, longitude, radius_km, limit=k)
+            if len(hits) >= k or radius_km >= max_radius_km:
+                return hits
+            radius_km = min(radius_km * 2, max_radius_km)
+
+
+# Global instance
+issue_spatial_index = IssueSpatialIndex()
@@ -1,12 +1,25 @@
 """
 Supabase REST API client for database operations
+
+Response bodies are decoded with orjson straight from bytes, about 1.5-2x faster
+than httpx's Response.json() for large PostgREST pages.
 """
 
 import httpx
-import json
-from typing import Dict, List, Optional, Any
+import logging
+import orjson
+from typing import Dict, List, Optional, Any, AsyncIterator
+from urllib.parse import quote
 from decouple import config
 
+from app.core.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+# PostgREST comparison operators accepted as "<column>.<op>" filter keys
+RANGE_OPERATORS = ("gt", "gte", "lt", "lte", "neq")
+
 
 class SupabaseClient:
     def __init__(self):
@@ -18,7 +31,7 @@ class SupabaseClient:
         self.is_available = bool(self.base_url and self.anon_key)
         
         if not self.is_available:
-            print("WARNING: Supabase REST API not configured. Using mock data.")
+            logger.warning("Supabase REST API not configured. Using mock data.")
             return
         
         # Use service role key for backend operations (more permissions)
@@ -31,7 +44,7 @@ class SupabaseClient:
             "Prefer": "return=minimal"
         }
         
-        print(f"Supabase REST API client initialized: {self.base_url}")
+        logger.info("Supabase REST API client initialized: %s", self.base_url)
     
     async def insert(self, table: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """Insert a record into a table"""
@@ -43,16 +56,74 @@ class SupabaseClient:
             headers = {**self.headers, "Prefer": "return=representation"}
             
             async with httpx.AsyncClient() as client:
-                response = await client.post(url, json=data, headers=headers)
-                response.raise_for_status()
+                with tracer.upstream("supabase", table, "insert"):
+                    response = await client.post(url, json=data, headers=headers)
+                    response.raise_for_status()
                 
-                result = response.json()
+                result = orjson.loads(response.content)
                 return result[0] if result else None
                 
         except Exception as e:
-            print(f"Supabase insert error: {e}")
+            logger.error("Supabase insert error: %s", e)
             return None
     
+    def _select_url(
+        self,
+        table: str,
+        columns: str = "*",
+        filters: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        order: Optional[str] = None
+    ) -> str:
+        """PostgREST URL for a select with filters, ordering and paging"""
+        url = f"{self.base_url}/rest/v1/{table}?select={columns}"
+        
+        # Add filters
+        if filters:
+            for key, value in filters.items():
+                # Handle special filter syntax for PostgREST
+                if key.endswith('.not.is'):
+                    # For "not is null" queries
+                    field_name = key.replace('.not.is', '')
+                    if value == "null":
+                        url += f"&{field_name}=not.is.null"
+                    else:
+                        url += f"&{field_name}=not.eq.{value}"
+                elif key.endswith('.is'):
+                    # For "is null" queries
+                    field_name = key.replace('.is', '')
+                    if value == "null":
+                        url += f"&{field_name}=is.null"
+                    else:
+                        url += f"&{field_name}=eq.{value}"
+                elif key.endswith('.in'):
+                    # For "in list" queries, e.g. {"id.in": [...]}
+                    field_name = key[:-len('.in')]
+                    values = ",".join(quote(str(v), safe="") for v in value)
+                    url += f"&{field_name}=in.({values})"
+                elif '.' in key and key.rsplit('.', 1)[1] in RANGE_OPERATORS:
+                    # For comparison queries, e.g. {"latitude.gte": 6.9}
+                    field_name, operator = key.rsplit('.', 1)
+                    url += f"&{field_name}={operator}.{quote(str(value), safe='')}"
+                else:
+                    # Standard equality filter
+                    url += f"&{key}=eq.{value}"
+        
+        # Add ordering
+        if order:
+            url += f"&order={order}"
+        
+        # Add limit
+        if limit:
+            url += f"&limit={limit}"
+        
+        # Add offset
+        if offset:
+            url += f"&offset={offset}"
+        
+        return url
+    
     async def select(
         self, 
         table: str, 
@@ -67,52 +138,86 @@ class SupabaseClient:
             return []
             
         try:
-            url = f"{self.base_url}/rest/v1/{table}?select={columns}"
-            
-            # Add filters
-            if filters:
-                for key, value in filters.items():
-                    # Handle special filter syntax for PostgREST
-                    if key.endswith('.not.is'):
-                        # For "not is null" queries
-                        field_name = key.replace('.not.is', '')
-                        if value == "null":
-                            url += f"&{field_name}=not.is.null"
-                        else:
-                            url += f"&{field_name}=not.eq.{value}"
-                    elif key.endswith('.is'):
-                        # For "is null" queries
-                        field_name = key.replace('.is', '')
-                        if value == "null":
-                            url += f"&{field_name}=is.null"
-                        else:
-                            url += f"&{field_name}=eq.{value}"
-                    else:
-                        # Standard equality filter
-                        url += f"&{key}=eq.{value}"
-            
-            # Add ordering
-            if order:
-                url += f"&order={order}"
-            
-            # Add limit
-            if limit:
-                url += f"&limit={limit}"
-            
-            # Add offset
-            if offset:
-                url += f"&offset={offset}"
+            url = self._select_url(table, columns, filters, limit, offset, order)
             
             async with httpx.AsyncClient() as client:
-                response = await client.get(url, headers=self.headers)
-                response.raise_for_status()
+                with tracer.upstream("supabase", table, "select"):
+                    response = await client.get(url, headers=self.headers)
+                    response.raise_for_status()
                 
-                return response.json()
+                with tracer.span("supabase.decode", table=table) as span:
+                    rows = orjson.loads(response.content)
+                    span.set(rows=len(rows), bytes=len(response.content))
+                return rows
                 
         except Exception as e:
-            print(f"Supabase select error: {e}")
+            logger.error("Supabase select error: %s", e)
             return []
     
+    async def select_pages(
+        self,
+        table: str,
+        columns: str = "*",
+        filters: Optional[Dict[str, Any]] = None,
+        order: Optional[str] = None,
+        page_size: int = 1000
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield successive pages of a select until the table is exhausted"""
+        offset = 0
+        while True:
+            page = await self.select(
+                table=table,
+                columns=columns,
+                filters=filters,
+                limit=page_size,
+                offset=offset,
+                order=order
+            )
+            if not page:
+                break
+            
+            yield page
+            
+            if len(page) < page_size:
+                break
+            offset += page_size
+    
+    async def select_cursor(
+        self,
+        table: str,
+        columns: str = "*",
+        filters: Optional[Dict[str, Any]] = None,
+        key: str = "id",
+        page_size: int = 1000
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield pages ordered by a unique key, each page starting after the last key seen
+        
+        Unlike select_pages (offset paging), every page is an index range scan, rows
+        written during the scan cannot shift later pages, and errors are raised
+        instead of ending the iteration early. `columns` must include `key`.
+        """
+        if not self.is_available:
+            return
+        
+        filters = dict(filters or {})
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            while True:
+                url = self._select_url(table, columns, filters, limit=page_size, order=f"{key}.asc")
+                with tracer.upstream("supabase", table, "select"):
+                    response = await client.get(url, headers=self.headers)
+                    response.raise_for_status()
+                with tracer.span("supabase.decode", table=table) as span:
+                    page = orjson.loads(response.content)
+                    span.set(rows=len(page), bytes=len(response.content))
+                if not page:
+                    break
+                
+                yield page
+                
+                if len(page) < page_size:
+                    break
+                filters[f"{key}.gt"] = page[-1][key]
+    
     async def update(
         self, 
         table: str, 
@@ -135,14 +240,15 @@ class SupabaseClient:
             headers = {**self.headers, "Prefer": "return=representation"}
             
             async with httpx.AsyncClient() as client:
-                response = await client.patch(url, json=data, headers=headers)
-                response.raise_for_status()
+                with tracer.upstream("supabase", table, "update"):
+                    response = await client.patch(url, json=data, headers=headers)
+                    response.raise_for_status()
                 
-                result = response.json()
+                result = orjson.loads(response.content)
                 return result[0] if result else None
                 
         except Exception as e:
-            print(f"Supabase update error: {e}")
+            logger.error("Supabase update error: %s", e)
             return None
     
     async def delete(self, table: str, filters: Dict[str, Any]) -> bool:
@@ -160,13 +266,14 @@ class SupabaseClient:
             url += "&".join(filter_params)
             
             async with httpx.AsyncClient() as client:
-                response = await client.delete(url, headers=self.headers)
-                response.raise_for_status()
+                with tracer.upstream("supabase", table, "delete"):
+                    response = await client.delete(url, headers=self.headers)
+                    response.raise_for_status()
                 
                 return True
                 
         except Exception as e:
-            print(f"Supabase delete error: {e}")
+            logger.error("Supabase delete error: %s", e)
             return False
     
     async def rpc(self, function_name: str, params: Dict[str, Any] = None) -> Any:
@@ -178,13 +285,14 @@ class SupabaseClient:
             url = f"{self.base_url}/rest/v1/rpc/{function_name}"
             
             async with httpx.AsyncClient() as client:
-                response = await client.post(url, json=params or {}, headers=self.headers)
-                response.raise_for_status()
+                with tracer.upstream("supabase", function_name, "rpc"):
+                    response = await client.post(url, json=params or {}, headers=self.headers)
+                    response.raise_for_status()
                 
-                return response.json()
+                return orjson.loads(response.content)
                 
         except Exception as e:
-            print(f"Supabase RPC error: {e}")
+            logger.error("Supabase RPC error: %s", e)
             return None
 
 
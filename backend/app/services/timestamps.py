@@ -0,0 +1,62 @@
+"""
+Timestamp parsing for PostgREST values
+
+Supabase returns timestamptz columns as ISO 8601 strings with a variable number
+of fraction digits and a UTC offset. parse_timestamp handles one value;
+epoch_seconds converts a whole column at once through NumPy's datetime64
+parser, falling back to per-value parsing only for non-UTC offsets.
+"""
+
+import re
+from datetime import datetime, timezone
+from typing import Optional, Sequence
+import numpy as np
+
+
+# Marker for a missing timestamp in epoch columns
+MISSING_EPOCH = -1
+
+_FRACTION = re.compile(r"\.(\d+)")
+_UTC_SUFFIXES = ("Z", "+00:00", "+00", "+0000")
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse a PostgREST timestamp (variable fraction digits, 'Z' suffix) as aware UTC"""
+    if not value:
+        return None
+    try:
+        text = value.replace("Z", "+00:00").replace(" ", "T", 1)
+        # fromisoformat before Python 3.11 only accepts 3 or 6 fraction digits
+        text = _FRACTION.sub(lambda m: "." + m.group(1)[:6].ljust(6, "0"), text, count=1)
+        parsed = datetime.fromisoformat(text)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.astimezone(timezone.utc)
+    except ValueError:
+        return None
+
+
+def _epoch_or_missing(value: Optional[str]) -> int:
+    parsed = parse_timestamp(value)
+    return int(parsed.timestamp()) if parsed else MISSING_EPOCH
+
+
+def epoch_seconds(values: Sequence[Optional[str]]) -> np.ndarray:
+    """Whole-second epochs (int64) for a column of timestamps; MISSING_EPOCH where absent"""
+    epochs = np.full(len(values), MISSING_EPOCH, dtype=np.int64)
+    positions, heads = [], []
+    for i, value in enumerate(values):
+        if not value:
+            continue
+        if len(value) >= 19 and (len(value) == 19 or value.endswith(_UTC_SUFFIXES)):
+            positions.append(i)
+            heads.append(value[:19])
+        else:
+            epochs[i] = _epoch_or_missing(value)
+
+    if heads:
+        try:
+            epochs[positions] = np.array(heads, dtype="datetime64[s]").astype(np.int64)
+        except ValueError:
+            epochs[positions] = [_epoch_or_missing(values[i]) for i in positions]
+    return epochs
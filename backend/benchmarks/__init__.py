@@ -0,0 +1,5 @@
+"""
+Micro-benchmarks for backend hot paths
+
+Run from the backend directory, e.g. ``python -m benchmarks.bench_geo``.
+"""
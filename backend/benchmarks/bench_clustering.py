@@ -0,0 +1,76 @@
+"""
+Hotspot clustering (app.services.clustering) over synthetic city-skewed points
+
+    python -m benchmarks.bench_clustering [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import numpy as np
+
+from app.services.clustering import cluster_points
+from benchmarks.common import best_of, format_seconds, print_table
+
+
+# Colombo, Kandy, Galle, Jaffna with decreasing share of reports
+CITIES = np.array([[6.9271, 79.8612], [7.2906, 80.6337], [6.0535, 80.221], [9.6615, 80.0255]])
+CITY_WEIGHTS = np.array([0.55, 0.2, 0.15, 0.1])
+CATEGORIES = ["roads", "electricity", "water", "waste", "safety", "health", "environment", "infrastructure"]
+
+
+def synthetic_points(rng, n):
+    city = rng.choice(len(CITIES), size=n, p=CITY_WEIGHTS)
+    lats = CITIES[city, 0] + rng.normal(0, 0.04, n)
+    lons = CITIES[city, 1] + rng.normal(0, 0.04, n)
+    return lats, lons, rng.integers(0, len(CATEGORIES), n), rng.integers(1, 6, n)
+
+
+def legacy_location_grouping(issues):
+    """The former per-location-string grouping in get_location_hotspots"""
+    location_stats = {}
+    for issue in issues:
+        location = issue.get('location', 'Unknown Location')
+        if location not in location_stats:
+            location_stats[location] = {'count': 0, 'categories': {}, 'severities': {}}
+        location_stats[location]['count'] += 1
+        category = issue.get('category', 'unknown')
+        location_stats[location]['categories'][category] = location_stats[location]['categories'].get(category, 0) + 1
+        severity = issue.get('severity_level', 1)
+        location_stats[location]['severities'][severity] = location_stats[location]['severities'].get(severity, 0) + 1
+    return location_stats
+
+
+def run(sizes):
+    rng = np.random.default_rng(42)
+    rows = []
+    for n in sizes:
+        lats, lons, categories, severities = synthetic_points(rng, n)
+        repeat = 5 if n <= 100_000 else 2
+
+        grid = best_of(lambda: cluster_points(lats, lons, categories, severities, CATEGORIES, refine=False, limit=20), repeat)
+        density = best_of(lambda: cluster_points(lats, lons, categories, severities, CATEGORIES, refine=True, limit=20), repeat)
+        result = cluster_points(lats, lons, categories, severities, CATEGORIES, refine=True, limit=20)
+
+        row = {
+            "points": f"{n:,}",
+            "grid": format_seconds(grid),
+            "grid + density": format_seconds(density),
+            "clusters": result["total_clusters"],
+            "noise": result["noise_points"]
+        }
+        if n <= 100_000:
+            issues = [
+                {"location": f"{a:.3f},{b:.3f}", "category": CATEGORIES[c], "severity_level": int(s)}
+                for a, b, c, s in zip(lats, lons, categories, severities)
+            ]
+            row["legacy string grouping"] = format_seconds(best_of(lambda: legacy_location_grouping(issues), repeat))
+        else:
+            row["legacy string grouping"] = "-"
+        rows.append(row)
+
+    print_table("Hotspot clustering over N points", rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    run(parser.parse_args().sizes)
@@ -0,0 +1,109 @@
+"""
+Vectorized geo math (app.services.geo) versus the per-row loops it replaced
+
+    python -m benchmarks.bench_geo [--sizes 1000 100000 1000000]
+"""
+
+import argparse
+import math
+import numpy as np
+
+from app.services import geo
+from benchmarks.common import best_of, format_seconds, print_table
+
+
+CENTER = (6.9271, 79.8612)
+
+
+def legacy_crud_loop(latitude, longitude, issues, radius_km):
+    """The former SupabaseIssueCRUD.get_nearby_issues per-row loop"""
+    nearby_issues = []
+    for issue in issues:
+        lat1, lon1 = latitude, longitude
+        lat2, lon2 = float(issue["latitude"]), float(issue["longitude"])
+
+        import math
+
+        lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+        dlat = lat2 - lat1
+        dlon = lon2 - lon1
+        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
+        c = 2 * math.asin(math.sqrt(a))
+        distance_km = 6371 * c
+
+        if distance_km <= radius_km:
+            nearby_issues.append((issue, distance_km))
+    return nearby_issues
+
+
+def legacy_endpoint_loop(latitude, longitude, issues, radius_km):
+    """The former nested calculate_distance in the /issues/nearby endpoint"""
+    def calculate_distance(lat1, lon1, lat2, lon2):
+        R = 6371
+        lat1_rad, lon1_rad = math.radians(lat1), math.radians(lon1)
+        lat2_rad, lon2_rad = math.radians(lat2), math.radians(lon2)
+        dlat = lat2_rad - lat1_rad
+        dlon = lon2_rad - lon1_rad
+        a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
+        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+        return R * c
+
+    nearby_issues = []
+    for issue in issues:
+        distance = calculate_distance(latitude, longitude, issue["latitude"], issue["longitude"])
+        if distance <= radius_km:
+            nearby_issues.append((issue, distance))
+    return nearby_issues
+
+
+def vectorized(latitude, longitude, lats, lons, radius_km):
+    distances = geo.haversine_km(latitude, longitude, lats, lons)
+    return np.flatnonzero(distances <= radius_km)
+
+
+def run(sizes):
+    rng = np.random.default_rng(42)
+    rows = []
+    for n in sizes:
+        lats = rng.uniform(5.9, 9.8, n)
+        lons = rng.uniform(79.6, 81.9, n)
+        issues = [{"latitude": float(a), "longitude": float(b)} for a, b in zip(lats, lons)]
+        repeat = 5 if n <= 100_000 else 1
+
+        crud = best_of(lambda: legacy_crud_loop(*CENTER, issues, 10), repeat)
+        endpoint = best_of(lambda: legacy_endpoint_loop(*CENTER, issues, 10), repeat)
+        vec = best_of(lambda: vectorized(*CENTER, lats, lons, 10), repeat)
+        box = best_of(lambda: geo.within_box(lats, lons, geo.bounding_box(*CENTER, 10)), repeat)
+
+        assert len(legacy_crud_loop(*CENTER, issues, 10)) == len(vectorized(*CENTER, lats, lons, 10))
+
+        rows.append({
+            "points": f"{n:,}",
+            "crud loop": format_seconds(crud),
+            "endpoint loop": format_seconds(endpoint),
+            "haversine_km": format_seconds(vec),
+            "bbox mask": format_seconds(box),
+            "speedup": f"{crud / vec:.0f}x"
+        })
+
+    print_table("Radius filter (10 km) over N points", rows)
+
+    matrix_rows = []
+    for n in (100, 500, 2000):
+        lats = rng.uniform(5.9, 9.8, n)
+        lons = rng.uniform(79.6, 81.9, n)
+        issues = [{"latitude": float(a), "longitude": float(b)} for a, b in zip(lats, lons)]
+        # Building the matrix row by row with the old loop; skipped when too slow
+        loop = best_of(lambda: [legacy_endpoint_loop(a["latitude"], a["longitude"], issues, 1e9) for a in issues], 1) if n <= 500 else None
+        vec = best_of(lambda: geo.distance_matrix_km(lats, lons), 3)
+        matrix_rows.append({
+            "points": f"{n:,}",
+            "row loop": format_seconds(loop) if loop is not None else "-",
+            "distance_matrix_km": format_seconds(vec)
+        })
+    print_table("Pairwise distance matrix (N x N)", matrix_rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    run(parser.parse_args().sizes)
@@ -0,0 +1,113 @@
+"""
+Columnar issue store (app.services.issue_store) versus lists of issue dicts
+
+Reports memory per 100k issues and the latency of building the analytics
+snapshot from each representation.
+
+    python -m benchmarks.bench_issue_store [--sizes 100000 1000000]
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+from datetime import datetime, timezone
+import numpy as np
+
+from app.services.analytics_engine import analytics_engine
+from app.services.issue_store import ColumnarIssueStore
+from benchmarks.common import best_of, format_seconds, print_table
+
+
+CATEGORIES = ["roads", "electricity", "water", "waste", "safety", "health", "environment", "infrastructure"]
+STATUSES = ["pending", "under_review", "assigned", "in_progress", "resolved", "closed"]
+LOCATIONS = [f"Ward {i}, Colombo" for i in range(500)]
+
+
+def synthetic_issues(rng, n):
+    """Issue dicts shaped like the ANALYTICS_COLUMNS rows PostgREST returns"""
+    now = time.time()
+    created = now - rng.integers(0, 30 * 86400, n)
+    resolved = rng.random(n) < 0.3
+    completed = created + rng.integers(3600, 20 * 86400, n)
+    categories = rng.integers(0, len(CATEGORIES), n)
+    statuses = np.where(resolved, 4, rng.integers(0, 4, n))
+    locations = rng.integers(0, len(LOCATIONS), n)
+    severities = rng.integers(1, 6, n)
+    ratings = rng.integers(0, 6, n)
+    lats = 6.9 + rng.normal(0, 0.3, n)
+    lons = 79.9 + rng.normal(0, 0.3, n)
+
+    def iso(epoch):
+        return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
+    return [
+        {
+            "id": f"00000000-0000-0000-0000-{i:012d}",
+            "user_id": f"00000000-0000-0000-0001-{i % 5000:012d}",
+            "category": CATEGORIES[categories[i]],
+            "status": STATUSES[statuses[i]],
+            "severity_level": int(severities[i]),
+            "location": LOCATIONS[locations[i]],
+            "latitude": float(lats[i]),
+            "longitude": float(lons[i]),
+            "created_at": iso(created[i]),
+            "actual_completion_date": iso(completed[i]) if resolved[i] else None,
+            "citizen_satisfaction_rating": int(ratings[i]) or None,
+            "assigned_authority_id": f"authority-{categories[i]}"
+        }
+        for i in range(n)
+    ]
+
+
+def traced_bytes(build):
+    """Bytes still allocated after build() returns (the object is kept alive)"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def run(sizes, page_size=1000):
+    rng = np.random.default_rng(7)
+    rows = []
+    for n in sizes:
+        # Build the dicts under tracemalloc, as the scan path holds them
+        issues, dict_bytes = traced_bytes(lambda: synthetic_issues(rng, n))
+
+        def load_store():
+            store = ColumnarIssueStore()
+            for start in range(0, n, page_size):
+                store.load(issues[start:start + page_size])
+            return store
+
+        started = time.perf_counter()
+        store, store_bytes = traced_bytes(load_store)
+        load_seconds = time.perf_counter() - started
+
+        repeat = 3 if n <= 100_000 else 1
+        dict_latency = best_of(lambda: analytics_engine.compute(issues, 30), repeat)
+        columnar_latency = best_of(lambda: analytics_engine.compute_columnar(30, store), repeat)
+
+        used, _ = store.memory_bytes()
+        rows.append({
+            "issues": f"{n:,}",
+            "dicts MB/100k": f"{dict_bytes / n * 1e5 / 1e6:.1f}",
+            "store MB/100k": f"{store_bytes / n * 1e5 / 1e6:.1f}",
+            "columns MB/100k": f"{used / n * 1e5 / 1e6:.1f}",
+            "store load": format_seconds(load_seconds),
+            "snapshot (dicts)": format_seconds(dict_latency),
+            "snapshot (columnar)": format_seconds(columnar_latency),
+            "speedup": f"{dict_latency / columnar_latency:.0f}x"
+        })
+        del issues, store
+
+    print_table("Analytics snapshot: issue dicts vs columnar store", rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    run(parser.parse_args().sizes)
@@ -0,0 +1,121 @@
+"""
+Cost of logging an error on the calling thread (the event loop)
+
+Compares print() (what the services used to do), a synchronous JSON
+StreamHandler and the app.core.log queue handler, with and without rate
+limiting, for a plain error and one with a traceback. Output goes to a
+temporary file so the numbers include real writes. The storm case logs
+bursts of errors from a coroutine while a heartbeat measures event loop lag.
+
+    python -m benchmarks.bench_logging [--records 20000]
+"""
+
+import argparse
+import asyncio
+import logging
+import queue
+import tempfile
+import time
+
+from app.core.log import JsonFormatter, NonBlockingQueueHandler, RateLimitFilter, _Listener
+from benchmarks.common import best_of, format_seconds, print_table
+
+
+def _error() -> Exception:
+    try:
+        raise ConnectionError("Server disconnected without sending a response.")
+    except ConnectionError as e:
+        return e
+
+
+def _logger(name: str, handler: logging.Handler) -> logging.Logger:
+    logger = logging.getLogger(f"bench.{name}")
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def _queued(output: logging.Handler, rate_limited: bool):
+    handler = NonBlockingQueueHandler(queue.Queue(10000))
+    if rate_limited:
+        handler.addFilter(RateLimitFilter(burst=5, window=60))
+    listener = _Listener(handler.queue, output)
+    listener.start()
+    return handler, listener
+
+
+async def _storm(logger: logging.Logger, error: Exception, records: int, burst: int = 200) -> float:
+    """Worst heartbeat lag (seconds) while logging `records` errors in bursts"""
+    worst = 0.0
+    stopped = False
+
+    async def heartbeat():
+        nonlocal worst
+        while not stopped:
+            due = time.perf_counter() + 0.001
+            await asyncio.sleep(0.001)
+            worst = max(worst, time.perf_counter() - due)
+
+    beat = asyncio.create_task(heartbeat())
+    for start in range(0, records, burst):
+        for _ in range(burst):
+            logger.error("Supabase select error: %s", error, exc_info=error)
+        await asyncio.sleep(0)
+    stopped = True
+    await beat
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000)
+    args = parser.parse_args()
+
+    error = _error()
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        sink = open(f"{directory}/print.log", "w")
+
+        def output(name: str) -> logging.Handler:
+            handler = logging.FileHandler(f"{directory}/{name}.log")
+            handler.setFormatter(JsonFormatter())
+            return handler
+
+        rows.append({
+            "handler": "print()",
+            "error": format_seconds(best_of(lambda: print(f"Supabase select error: {error}", file=sink, flush=True), number=args.records)),
+            "error + traceback": "-"
+        })
+
+        sync = _logger("sync", output("sync"))
+        queued_handler, queued_listener = _queued(output("queued"), rate_limited=False)
+        queued = _logger("queued", queued_handler)
+        limited_handler, limited_listener = _queued(output("limited"), rate_limited=True)
+        limited = _logger("limited", limited_handler)
+
+        for name, logger in [("sync JSON StreamHandler", sync), ("queue handler", queued), ("queue handler, rate limited", limited)]:
+            plain = best_of(lambda: logger.error("Supabase select error: %s", error), number=args.records)
+            traced = best_of(lambda: logger.error("Supabase select error: %s", error, exc_info=error), number=args.records)
+            if logger is queued:
+                # Let the listener catch up so the queue is not simply full
+                while not queued_handler.queue.empty():
+                    time.sleep(0.01)
+            rows.append({"handler": name, "error": format_seconds(plain), "error + traceback": format_seconds(traced)})
+        print_table(f"Per call on the logging thread ({args.records} records)", rows)
+
+        storm = []
+        for name, logger in [("sync JSON StreamHandler", sync), ("queue handler", queued), ("queue handler, rate limited", limited)]:
+            loop = asyncio.new_event_loop()
+            worst = loop.run_until_complete(_storm(logger, error, args.records))
+            loop.close()
+            storm.append({"handler": name, "worst loop lag": format_seconds(worst)})
+        print_table(f"Error storm: {args.records} errors with tracebacks in bursts of 200", storm)
+
+        queued_listener.stop()
+        limited_listener.stop()
+        sink.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Collection overhead of app.core.metrics and app.core.tracing
+
+Drives a no-op ASGI app with and without MetricsMiddleware and reports the
+added cost per request, plus the cost of one upstream timing, one cache lookup
+record and one tracing span. The budget is a few microseconds per request.
+
+    python -m benchmarks.bench_metrics [--requests 200000]
+"""
+
+import argparse
+import asyncio
+import time
+
+from app.core.metrics import MetricsRegistry, MetricsMiddleware
+from app.core.tracing import Tracer
+from benchmarks.common import best_of, format_seconds, print_table
+
+
+async def noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+async def drive(app, requests: int) -> float:
+    """Seconds per request through `app`"""
+    scope = {"type": "http", "method": "GET", "path": "/health", "endpoint": noop_app, "app": None}
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(scope, receive, send)
+    return (time.perf_counter() - started) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200000)
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    middleware = MetricsMiddleware(noop_app, registry)
+    loop = asyncio.new_event_loop()
+    bare = min(loop.run_until_complete(drive(noop_app, args.requests)) for _ in range(3))
+    instrumented = min(loop.run_until_complete(drive(middleware, args.requests)) for _ in range(3))
+    loop.close()
+
+    def upstream():
+        with registry.track_upstream("supabase", "issues", "select"):
+            pass
+
+    tracer = Tracer()
+
+    def span():
+        with tracer.span("supabase.decode", table="issues"):
+            pass
+
+    def traced_span():
+        with tracer.start_trace("GET /health"):
+            span()
+
+    rows = [
+        {"operation": "request (no middleware)", "per call": format_seconds(bare)},
+        {"operation": "request (MetricsMiddleware)", "per call": format_seconds(instrumented)},
+        {"operation": "middleware overhead", "per call": format_seconds(instrumented - bare)},
+        {"operation": "track_upstream", "per call": format_seconds(best_of(upstream, number=args.requests))},
+        {
+            "operation": "record_cache",
+            "per call": format_seconds(best_of(lambda: registry.record_cache("geocode", True), number=args.requests))
+        },
+        {"operation": "span (outside a trace)", "per call": format_seconds(best_of(span, number=args.requests))},
+        {
+            "operation": "trace with one child span",
+            "per call": format_seconds(best_of(traced_span, number=args.requests // 10))
+        },
+        {"operation": "render /metrics", "per call": format_seconds(best_of(registry.render, number=100))}
+    ]
+    print_table(f"Metrics collection overhead ({args.requests} requests)", rows)
+
+
+if __name__ == "__main__":
+    main()
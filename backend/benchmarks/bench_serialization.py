@@ -0,0 +1,117 @@
+"""
+Serialize and deserialize time for 1k-issue responses
+
+Deserialize: a PostgREST page of issues decoded with json.loads, httpx's
+Response.json() (what SupabaseClient used) and orjson.loads (what it uses now).
+
+Serialize: the /issues/all response body rendered as FastAPI used to
+(response_model=dict, JSONResponse), with a typed response_model validated by
+FastAPI, and with typed_response() (orjson, validation off as in production).
+Each variant is also timed end to end through a FastAPI route over ASGI.
+
+    python -m benchmarks.bench_serialization [--issues 1000]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+import orjson
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from app.core.responses import FastJSONResponse, typed_response
+from app.schemas.responses import IssueListResponse
+from benchmarks.common import best_of, format_seconds, print_table
+from loadtest.datagen import DatasetGenerator, parse_rows
+
+
+def _app(body) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/dict", response_model=dict, response_class=JSONResponse)
+    async def untyped():
+        return body
+
+    @app.get("/typed", response_model=IssueListResponse, response_class=FastJSONResponse)
+    async def typed():
+        return body
+
+    @app.get("/typed-response", response_model=IssueListResponse)
+    async def direct():
+        return typed_response(IssueListResponse, body)
+
+    return app
+
+
+async def _route_times(app: FastAPI, paths, requests: int):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        times = {}
+        for path in paths:
+            await client.get(path)
+            best = float("inf")
+            for _ in range(requests):
+                started = time.perf_counter()
+                response = await client.get(path)
+                best = min(best, time.perf_counter() - started)
+            times[path] = (best, len(response.content))
+        return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--issues", type=parse_rows, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = DatasetGenerator(days=90).issues(args.issues)
+    payload = json.dumps(rows).encode()
+    body = {
+        "success": True,
+        "message": f"Fetched {len(rows)} issues from database",
+        "issues": rows,
+        "filters": {"category": None, "status": None, "department_id": None, "authority_id": None}
+    }
+
+    deserialize = [
+        {"decoder": "json.loads", "per page": format_seconds(best_of(lambda: json.loads(payload), args.repeat))},
+        {
+            "decoder": "httpx Response.json()",
+            "per page": format_seconds(best_of(lambda: httpx.Response(200, content=payload).json(), args.repeat))
+        },
+        {"decoder": "orjson.loads", "per page": format_seconds(best_of(lambda: orjson.loads(payload), args.repeat))}
+    ]
+    print_table(f"Deserialize a PostgREST page of {len(rows)} issues ({len(payload) / 1e6:.2f} MB)", deserialize)
+
+    untyped = JSONResponse(body)
+    serialize = [
+        {"renderer": "JSONResponse (json.dumps)", "per response": format_seconds(best_of(lambda: untyped.render(body), args.repeat))},
+        {
+            "renderer": "pydantic validate + dump (typed response_model)",
+            "per response": format_seconds(best_of(
+                lambda: IssueListResponse.model_validate(body).model_dump(mode="json"), args.repeat
+            ))
+        },
+        {
+            "renderer": "typed_response (orjson)",
+            "per response": format_seconds(best_of(lambda: typed_response(IssueListResponse, body).body, args.repeat))
+        }
+    ]
+    print_table(f"Serialize the /issues/all body with {len(rows)} issues", serialize)
+
+    paths = {
+        "/dict": "response_model=dict, JSONResponse (before)",
+        "/typed": "typed response_model, FastJSONResponse",
+        "/typed-response": "typed_response() (hot list endpoints)"
+    }
+    times = asyncio.run(_route_times(_app(body), list(paths), args.repeat))
+    print_table("End to end through a FastAPI route (ASGI, no network)", [
+        {"route": label, "per request": format_seconds(times[path][0]), "bytes": times[path][1]}
+        for path, label in paths.items()
+    ])
+
+
+if __name__ == "__main__":
+    main()
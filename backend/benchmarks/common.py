@@ -0,0 +1,50 @@
+"""
+Timing helpers shared by the benchmark scripts
+"""
+
+import statistics
+import time
+from typing import Callable, Dict, List
+
+
+def best_of(fn: Callable[[], object], repeat: int = 5, number: int = 1) -> float:
+    """Best wall time in seconds for one call of fn over `repeat` rounds"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+
+def measure(fn: Callable[[], object], repeat: int = 5, number: int = 1) -> Dict[str, float]:
+    """Min, median and mean wall time in seconds for one call of fn over `repeat` rounds"""
+    rounds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - started) / number)
+    return {"min_s": min(rounds), "median_s": statistics.median(rounds), "mean_s": statistics.fmean(rounds)}
+
+
+def format_seconds(seconds: float) -> str:
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f} us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f} ms"
+    return f"{seconds:.2f} s"
+
+
+def print_table(title: str, rows: List[Dict[str, object]]) -> None:
+    """Print rows of equal keys as an aligned text table"""
+    if not rows:
+        return
+    columns = list(rows[0].keys())
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in columns}
+    print(f"\n{title}")
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    print("  ".join("-" * widths[c] for c in columns))
+    for row in rows:
+        print("  ".join(str(row[c]).ljust(widths[c]) for c in columns))
@@ -0,0 +1,224 @@
+"""
+Micro-benchmark suite for backend hot functions with a run history
+
+Times the current implementations of:
+    prepare_image       decode, resize and re-encode uploads of several sizes
+    nearby              spatial index radius search and the bounding-box haversine refinement
+    analytics           the single-pass snapshot aggregation and each endpoint's view over it
+    enhance_address     LocationService._enhance_sri_lanka_address
+    postgrest_json      decoding 1k and 10k-row PostgREST issue responses
+    fallback_response   GeminiAnalysisService._create_fallback_response keyword scanning
+
+Each run appends one JSON line (git commit, machine, min/median/mean per case) to
+benchmarks/results/history.jsonl and prints the change in median against the
+latest run from a different commit (the previous run if there is none), or
+against --compare <commit>:
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --only analytics nearby --compare 618f44f
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+import httpx
+import orjson
+from PIL import Image
+
+from app.api.v1.endpoints import analytics
+from app.crud.supabase_issues import refine_nearby
+from app.services import geo
+from app.services.analytics_engine import analytics_engine
+from app.services.gemini_analysis import gemini_service
+from app.services.location_service import location_service
+from app.services.spatial_index import IssueSpatialIndex
+from benchmarks.common import measure, format_seconds, print_table
+from loadtest.datagen import DatasetGenerator, parse_rows
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_FILE = os.path.join(BACKEND_DIR, "benchmarks", "results", "history.jsonl")
+
+CENTER = (6.9271, 79.8612)
+
+Cases = List[Tuple[str, Callable[[], object]]]
+
+
+def _photo(width: int, height: int) -> bytes:
+    """JPEG with noise over a gradient, so it compresses like a camera photo"""
+    rng = random.Random(width * height)
+    noise = Image.frombytes("L", (width // 4, height // 4), rng.randbytes((width // 4) * (height // 4)))
+    image = Image.merge("RGB", (
+        Image.linear_gradient("L").resize((width, height)),
+        noise.resize((width, height)),
+        Image.linear_gradient("L").rotate(90).resize((width, height))
+    ))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=90)
+    return buffer.getvalue()
+
+
+def prepare_image_cases(rows: List[Dict[str, Any]]) -> Cases:
+    cases = []
+    for width, height in [(640, 480), (1920, 1080), (4032, 3024)]:
+        content = _photo(width, height)
+        cases.append((f"prepare_image[{width}x{height}]", lambda content=content: gemini_service.prepare_image(content)))
+    return cases
+
+
+def nearby_cases(rows: List[Dict[str, Any]]) -> Cases:
+    index = IssueSpatialIndex()
+    index.load(rows)
+    latitude, longitude = CENTER
+    # Rows a 5 km bounding box around Colombo returns (the PostgREST fallback path)
+    min_lat, min_lon, max_lat, max_lon = geo.bounding_box(latitude, longitude, 5)
+    boxed = [row for row in rows if min_lat <= row["latitude"] <= max_lat and min_lon <= row["longitude"] <= max_lon]
+    return [
+        (f"nearby.index_within_radius[{len(rows)} issues, 5 km]", lambda: index.within_radius(latitude, longitude, 5, 100)),
+        (f"nearby.index_nearest[{len(rows)} issues, k=20]", lambda: index.nearest(latitude, longitude, 20)),
+        (f"nearby.refine[{len(boxed)} box rows]", lambda: refine_nearby(boxed, latitude, longitude, 5, 100))
+    ]
+
+
+def analytics_cases(rows: List[Dict[str, Any]]) -> Cases:
+    snapshot = analytics_engine.compute(rows, 90)
+    cases = [(f"analytics.compute[{len(rows)} issues]", lambda: analytics_engine.compute(rows, 90))]
+    for name in ("department_performance", "peak_hours", "location_hotspots",
+                 "category_distribution", "resolution_trends", "dashboard_summary"):
+        view = getattr(analytics, f"_{name}_view")
+        cases.append((f"analytics.{name}_view", lambda view=view: view(snapshot, 90)))
+    return cases
+
+
+def enhance_address_cases(rows: List[Dict[str, Any]]) -> Cases:
+    addresses = [
+        "colombo main street", "Galle Road near Bambalapitiya junction", "kandy road, kadawatha",
+        "No. 12, Temple Lane, Nugegoda", "negombo beach road", "Jaffna town", "  matara  ", "Ward Place"
+    ]
+    return [(f"enhance_address[{len(addresses)} addresses]",
+             lambda: [location_service._enhance_sri_lanka_address(address) for address in addresses])]
+
+
+def postgrest_json_cases(rows: List[Dict[str, Any]]) -> Cases:
+    cases = []
+    for size in (1000, 10000):
+        body = json.dumps(rows[:size]).encode()
+        cases.append((f"postgrest_json.loads[{size} rows]", lambda body=body: json.loads(body)))
+        cases.append((f"postgrest_json.httpx[{size} rows]", lambda body=body: httpx.Response(200, content=body).json()))
+        cases.append((f"postgrest_json.orjson[{size} rows]", lambda body=body: orjson.loads(body)))
+    return cases
+
+
+def fallback_response_cases(rows: List[Dict[str, Any]]) -> Cases:
+    # A chatty non-JSON answer whose only category keyword comes late
+    text = (
+        "I can see a photograph taken outdoors during the day. The scene shows a residential area with houses, "
+        "trees and a footpath. There is a lot of visible detail including parked vehicles and pedestrians. " * 6
+        + "Near the kerb there is an overflowing pile of garbage that looks urgent and is a hazard to residents."
+    )
+    return [(f"fallback_response[{len(text)} chars]", lambda: gemini_service._create_fallback_response(text, "Colombo"))]
+
+
+GROUPS = {
+    "prepare_image": prepare_image_cases,
+    "nearby": nearby_cases,
+    "analytics": analytics_cases,
+    "enhance_address": enhance_address_cases,
+    "postgrest_json": postgrest_json_cases,
+    "fallback_response": fallback_response_cases
+}
+
+
+def _calibrate(fn: Callable[[], object], target: float = 0.05) -> int:
+    """Calls per round so a round takes about `target` seconds"""
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    return max(1, int(target / elapsed)) if elapsed > 0 else 1000
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _baseline(history: List[Dict[str, Any]], commit: Optional[str], compare: Optional[str]) -> Optional[Dict[str, Any]]:
+    for run in reversed(history):
+        if compare is not None:
+            if run["commit"] and run["commit"].startswith(compare):
+                return run
+        elif run["commit"] != commit:
+            return run
+    # Nothing from another commit yet: the previous run of this one
+    return history[-1] if history and compare is None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=sorted(GROUPS), help="groups to run (default: all)")
+    parser.add_argument("--issues", type=parse_rows, default=10000, help="generated issues for nearby/analytics (10k, 1M, 10M)")
+    parser.add_argument("--repeat", type=int, default=7, help="timed rounds per case")
+    parser.add_argument("--history", default=HISTORY_FILE, help="JSON lines file runs are appended to")
+    parser.add_argument("--compare", metavar="COMMIT", help="compare against the latest run of this commit")
+    parser.add_argument("--no-save", action="store_true", help="do not append this run to the history")
+    args = parser.parse_args()
+
+    rows = DatasetGenerator(days=90).issues(max(args.issues, 10000))
+    results: Dict[str, Dict[str, Any]] = {}
+    for group in args.only or GROUPS:
+        for name, fn in GROUPS[group](rows[:args.issues] if group in ("nearby", "analytics") else rows):
+            number = _calibrate(fn)
+            results[name] = {**measure(fn, repeat=args.repeat, number=number), "number": number, "repeat": args.repeat}
+
+    commit = _git("rev-parse", "--short", "HEAD")
+    run = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no", "--", "app")),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} ({os.cpu_count()} CPUs)",
+        "issues": args.issues,
+        "results": results
+    }
+
+    history = load_history(args.history)
+    baseline = _baseline(history, commit, args.compare)
+    previous = baseline["results"] if baseline else {}
+
+    table = []
+    for name, timing in results.items():
+        row = {"case": name, "min": format_seconds(timing["min_s"]), "median": format_seconds(timing["median_s"])}
+        if baseline:
+            before = previous.get(name)
+            row[f"vs {baseline['commit']}"] = (
+                f"{(timing['median_s'] - before['median_s']) / before['median_s'] * 100:+.1f}%" if before else "new"
+            )
+        table.append(row)
+    print_table(f"Commit {commit}{' (modified)' if run['dirty'] else ''}, {run['machine']}", table)
+
+    if not args.no_save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+        with open(args.history, "a") as f:
+            f.write(json.dumps(run) + "\n")
+        print(f"\nAppended to {args.history}")
+
+
+if __name__ == "__main__":
+    main()
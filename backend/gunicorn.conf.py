@@ -0,0 +1,51 @@
+"""
+Gunicorn settings for the production server (read from the environment / .env)
+
+    gunicorn app.main:app
+
+Gunicorn loads this file from the working directory. Each worker is a uvicorn
+event loop (see app/server.py) and runs its own lifespan, so every worker warms
+its own spatial index, map grid, issue store, rollup cube and analytics
+snapshots. A create or status change updates the worker that handled it at once;
+the other workers pick it up from their change sync, which polls issues by
+updated_at every INDEX_SYNC_INTERVAL seconds. How stale another worker can be:
+
+    /nearby, /map, heatmap tile invalidation   INDEX_SYNC_INTERVAL (5 s)
+    analytics from the rollup cube             INDEX_SYNC_INTERVAL (5 s)
+    analytics snapshots and refreshed answers  as with one worker: ANALYTICS_SNAPSHOT_TTL
+                                               and ANALYTICS_REFRESH_INTERVALS
+"""
+
+import multiprocessing
+# Imported as a module: a top-level name "config" would be read as a gunicorn setting
+import decouple
+
+
+bind = f"{decouple.config('HOST', default='0.0.0.0')}:{decouple.config('PORT', default=8000, cast=int)}"
+
+# One event loop per core: requests are async, so extra workers past the core count only add contention
+workers = decouple.config("WEB_CONCURRENCY", default=multiprocessing.cpu_count(), cast=int)
+worker_class = "app.server.ProductionUvicornWorker"
+
+# Pending connections the kernel queues while every worker is busy
+backlog = decouple.config("SERVER_BACKLOG", default=2048, cast=int)
+# Longer than a load balancer's usual 60 s idle timeout, so the balancer closes idle connections first
+keepalive = decouple.config("SERVER_KEEPALIVE", default=75, cast=int)
+timeout = decouple.config("SERVER_TIMEOUT", default=60, cast=int)
+graceful_timeout = decouple.config("SERVER_GRACEFUL_TIMEOUT", default=30, cast=int)
+
+# Recycle each worker after this many requests (jittered so they do not restart together).
+# A new worker re-warms its in-memory indexes, so keep this high; 0 disables recycling.
+max_requests = decouple.config("SERVER_MAX_REQUESTS", default=20000, cast=int)
+max_requests_jitter = decouple.config("SERVER_MAX_REQUESTS_JITTER", default=2000, cast=int)
+
+# Import the app once in the master so workers fork with the code already loaded (copy-on-write)
+preload_app = decouple.config("SERVER_PRELOAD", default=True, cast=bool)
+
+# Trusted proxy addresses for X-Forwarded-For / X-Forwarded-Proto
+forwarded_allow_ips = decouple.config("FORWARDED_ALLOW_IPS", default="127.0.0.1")
+
+loglevel = decouple.config("LOG_LEVEL", default="info")
+errorlog = "-"
+# Per-request access lines are off unless a target is set ("-" for stdout)
+accesslog = decouple.config("SERVER_ACCESS_LOG", default="") or None
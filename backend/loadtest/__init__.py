@@ -0,0 +1,5 @@
+"""
+Load-test harness: the API against local stand-ins for Supabase, Gemini and Nominatim
+
+Run from the backend directory, e.g. ``python -m loadtest.run --scenario mixed``.
+"""
@@ -0,0 +1,513 @@
+"""
+Seeded large-scale dataset generator
+
+Generates issues and their issue_updates history at any scale (10k, 1M, 10M
+rows) with numpy, one chunk at a time so memory stays flat:
+
+- locations around the district centres, weighted by population with extra
+  weight for the urban Western province, plus tight per-district hotspots;
+  clipped to the island's bounding box
+- category mix, and severity skewed by category (safety and health run higher)
+- creation times over `days` days, growing towards the present, peaking in the
+  morning and early evening
+- a status lifecycle per issue: each issue is headed for a final stage and moves
+  there through lognormal transition delays (faster for severe issues), so old
+  issues are mostly resolved or closed and recent ones mostly pending; every
+  transition is an issue_updates row
+- completion dates and satisfaction ratings on resolved issues, lower when
+  resolution took longer
+
+The same seed, row count, chunk size and --end time always give identical data.
+
+    python -m loadtest.datagen --rows 1M --format parquet --output loadtest/data/1m
+    python -m loadtest.datagen --rows 10M --format sql --output loadtest/data/10m.sql
+    python -m loadtest.datagen --rows 100k --format postgrest --url http://127.0.0.1:8900
+
+Parquet output (issues, issue_updates, authorities, profiles) can be loaded into
+the load-test stand-in with ``python -m loadtest.run --data loadtest/data/1m``. SQL output
+is a psql script of COPY blocks for database/schema.sql, including the profiles
+and departments rows the foreign keys need.
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Iterator, Optional, Tuple
+
+import httpx
+import numpy as np
+
+from app.services.location_service import SRI_LANKAN_DISTRICTS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+CATEGORIES = ["roads", "electricity", "water", "waste", "safety", "health", "environment", "infrastructure"]
+CATEGORY_SHARES = np.array([0.28, 0.12, 0.14, 0.18, 0.08, 0.05, 0.06, 0.09])
+# Severity 1-4 shares per category
+SEVERITY_SHARES = {
+    "roads": [0.35, 0.35, 0.20, 0.10],
+    "electricity": [0.30, 0.35, 0.25, 0.10],
+    "water": [0.30, 0.35, 0.25, 0.10],
+    "waste": [0.45, 0.35, 0.15, 0.05],
+    "safety": [0.15, 0.30, 0.30, 0.25],
+    "health": [0.15, 0.30, 0.35, 0.20],
+    "environment": [0.40, 0.35, 0.18, 0.07],
+    "infrastructure": [0.40, 0.35, 0.18, 0.07]
+}
+# Median hours per transition for each category (slow departments stay slow)
+CATEGORY_PACE = np.array([1.4, 0.8, 1.0, 0.7, 0.6, 0.7, 1.3, 1.6])
+
+# 2012 census population in thousands, by district
+DISTRICT_POPULATION = {
+    "Colombo": 2324, "Gampaha": 2304, "Kalutara": 1222, "Kandy": 1375, "Matale": 485, "Nuwara Eliya": 712,
+    "Galle": 1063, "Matara": 815, "Hambantota": 600, "Jaffna": 584, "Kilinochchi": 113, "Mannar": 100,
+    "Vavuniya": 172, "Mullaitivu": 92, "Batticaloa": 526, "Ampara": 649, "Trincomalee": 380,
+    "Kurunegala": 1618, "Puttalam": 762, "Anuradhapura": 861, "Polonnaruwa": 406, "Badulla": 815,
+    "Moneragala": 451, "Ratnapura": 1088, "Kegalle": 837
+}
+# Urban districts report more per resident
+URBAN_FACTOR = {"Colombo": 2.5, "Gampaha": 1.5, "Kalutara": 1.2, "Kandy": 1.3, "Galle": 1.2, "Jaffna": 1.1}
+
+LIFECYCLE = ["pending", "under_review", "assigned", "in_progress", "resolved", "closed"]
+# Share of issues whose lifecycle ends at each stage (most reach resolved or closed)
+FINAL_STAGE_SHARES = np.array([0.06, 0.04, 0.05, 0.05, 0.35, 0.45])
+# Median hours for each transition out of pending, under_review, assigned, in_progress, resolved
+TRANSITION_HOURS = np.array([6.0, 18.0, 24.0, 72.0, 96.0])
+UPDATE_TYPES = {"assigned": "assignment", "resolved": "completion"}
+UPDATE_COMMENTS = {
+    "under_review": "Report received and under review",
+    "assigned": "Assigned to the responsible authority",
+    "in_progress": "Field team dispatched",
+    "resolved": "Issue fixed on site",
+    "closed": "Closed after citizen confirmation"
+}
+
+TITLES = {
+    "roads": ["Pothole on {road}", "Damaged road surface on {road}", "Broken pavement near {road}"],
+    "electricity": ["Street light not working on {road}", "Fallen power cable near {road}", "Frequent power cuts in {area}"],
+    "water": ["Water leak on {road}", "No water supply in {area}", "Blocked drainage near {road}"],
+    "waste": ["Garbage not collected in {area}", "Illegal dumping near {road}", "Overflowing bins on {road}"],
+    "safety": ["Missing road barrier on {road}", "Unsafe building near {road}", "Dangerous junction at {road}"],
+    "health": ["Mosquito breeding site in {area}", "Unsanitary market near {road}", "Stagnant water in {area}"],
+    "environment": ["Tree fallen across {road}", "Air pollution from burning in {area}", "Canal pollution near {road}"],
+    "infrastructure": ["Damaged bus shelter on {road}", "Broken bridge railing near {road}", "Collapsed wall on {road}"]
+}
+ROADS = ["Main Street", "Galle Road", "Kandy Road", "Temple Road", "Station Road", "Hospital Road", "Lake Road",
+         "School Lane", "Market Street", "Church Road", "Old Road", "New Road", "Beach Road", "Park Avenue"]
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+BOUNDS = {"south": 5.9, "north": 9.8, "west": 79.6, "east": 81.9}
+
+ISSUE_COLUMNS = [
+    "id", "user_id", "category", "title", "description", "location", "image_url", "status", "severity_level",
+    "assigned_authority_id", "created_at", "updated_at", "latitude", "longitude", "booking_reference",
+    "estimated_completion_date", "actual_completion_date", "priority_level", "officer_assigned_id",
+    "resolution_notes", "citizen_satisfaction_rating"
+]
+UPDATE_COLUMNS = [
+    "id", "issue_id", "updated_by_user_id", "previous_status", "new_status", "update_type", "comment",
+    "is_public", "created_at"
+]
+TIMESTAMP_COLUMNS = {"created_at", "updated_at", "estimated_completion_date", "actual_completion_date"}
+INTEGER_COLUMNS = {"severity_level", "priority_level", "citizen_satisfaction_rating"}
+UUID_DIGIT_POSITIONS = [i for i in range(36) if i not in (8, 13, 18, 23)]
+
+
+def parse_rows(value: str) -> int:
+    """'10k', '1M', '2.5m' or '10000' -> row count"""
+    match = re.fullmatch(r"\s*([\d.]+)\s*([kKmM]?)\s*", value)
+    if not match:
+        raise argparse.ArgumentTypeError(f"invalid row count: {value}")
+    return int(float(match.group(1)) * {"": 1, "k": 1_000, "m": 1_000_000}[match.group(2).lower()])
+
+
+def _uuids(rng: np.random.Generator, count: int) -> List[str]:
+    """Random version 4 UUID strings"""
+    raw = rng.integers(0, 256, size=(count, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    hex_digits = np.frombuffer(raw.tobytes().hex().encode("ascii"), dtype=np.uint8).reshape(count, 32)
+    # 8-4-4-4-12 layout: hex digits around dashes at 8, 13, 18 and 23
+    text = np.full((count, 36), ord("-"), dtype=np.uint8)
+    text[:, UUID_DIGIT_POSITIONS] = hex_digits
+    return text.view("S36").ravel().astype("U36").tolist()
+
+
+def _nullable(mask: np.ndarray, values) -> list:
+    """values where mask is set, None elsewhere, as Python objects"""
+    values = values.tolist() if isinstance(values, np.ndarray) else values
+    return [value if keep else None for value, keep in zip(values, mask.tolist())]
+
+
+def _timestamps(microseconds: np.ndarray) -> List[str]:
+    """Epoch microseconds -> ISO 8601 strings in the PostgREST format"""
+    return [text + "+00:00" for text in np.datetime_as_string(microseconds.astype("datetime64[us]"), unit="us").tolist()]
+
+
+class DatasetGenerator:
+    def __init__(self, seed: int = 42, days: int = 365, end: Optional[datetime] = None, chunk_size: int = 250_000):
+        self.seed = seed
+        self.days = days
+        # Data ends at the start of the current hour unless pinned, so "last 30 days" windows stay populated
+        self.end = end or datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+        self.chunk_size = chunk_size
+
+        rng = np.random.default_rng([seed, 0])
+        population = np.array([
+            DISTRICT_POPULATION.get(d["name"], 500) * URBAN_FACTOR.get(d["name"], 1.0) for d in SRI_LANKAN_DISTRICTS
+        ])
+        self.district_shares = population / population.sum()
+        self.district_lat = np.array([d["latitude"] for d in SRI_LANKAN_DISTRICTS])
+        self.district_lon = np.array([d["longitude"] for d in SRI_LANKAN_DISTRICTS])
+        # Three hotspots per district (markets, junctions, bus stands)
+        self.hotspot_lat = self.district_lat[:, None] + rng.normal(0, 0.03, (len(SRI_LANKAN_DISTRICTS), 3))
+        self.hotspot_lon = self.district_lon[:, None] + rng.normal(0, 0.03, (len(SRI_LANKAN_DISTRICTS), 3))
+
+        self.authority_ids = _uuids(rng, len(CATEGORIES))
+        self.officer_ids = _uuids(rng, 40 * len(CATEGORIES))
+        self.citizen_seed = [seed, 1]
+        self.severity_cdf = np.cumsum([SEVERITY_SHARES[c] for c in CATEGORIES], axis=1)
+
+    def authorities(self) -> List[Dict[str, Any]]:
+        """One authority per category (the app's authorities table)"""
+        return [
+            {"id": authority_id, "name": f"{category.title()} Authority", "category": category,
+             "contact_email": f"{category}@gov.lk", "contact_phone": "+94-11-0000000"}
+            for authority_id, category in zip(self.authority_ids, CATEGORIES)
+        ]
+
+    def citizens(self, total: int) -> List[str]:
+        """Reporter pool, about one citizen per eight issues"""
+        return _uuids(np.random.default_rng(self.citizen_seed), max(100, total // 8))
+
+    def profiles(self, total: int) -> List[Dict[str, Any]]:
+        """profiles rows for every reporter and officer id (the issues foreign keys)"""
+        rows = []
+        for number, profile_id in enumerate(self.citizens(total)):
+            rows.append({"id": profile_id, "full_name": f"Citizen {number}", "nic": f"{200000000000 + number}",
+                         "role": "citizen"})
+        for number, profile_id in enumerate(self.officer_ids):
+            rows.append({"id": profile_id, "full_name": f"Officer {number}", "nic": f"{100000000000 + number}",
+                         "role": "officer"})
+        return rows
+
+    def chunks(self, total: int) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """(issues, issue_updates) column dicts, chunk_size issues at a time"""
+        citizens = np.array(self.citizens(total))
+        officers = np.array(self.officer_ids).reshape(len(CATEGORIES), -1)
+        for number, start in enumerate(range(0, total, self.chunk_size)):
+            count = min(self.chunk_size, total - start)
+            yield self._chunk(np.random.default_rng([self.seed, 2, number]), start, count, citizens, officers)
+
+    def _chunk(self, rng, start: int, count: int, citizens: np.ndarray, officers: np.ndarray):
+        end_us = int(self.end.timestamp() * 1_000_000)
+        span_us = self.days * 86_400 * 1_000_000
+
+        # Where
+        district = rng.choice(len(self.district_shares), size=count, p=self.district_shares)
+        in_hotspot = rng.random(count) < 0.3
+        hotspot = rng.integers(0, 3, count)
+        latitude = np.where(in_hotspot, self.hotspot_lat[district, hotspot], self.district_lat[district])
+        longitude = np.where(in_hotspot, self.hotspot_lon[district, hotspot], self.district_lon[district])
+        spread = np.where(in_hotspot, 0.005, 0.06)
+        latitude = np.clip(latitude + rng.normal(0, 1, count) * spread, BOUNDS["south"], BOUNDS["north"]).round(6)
+        longitude = np.clip(longitude + rng.normal(0, 1, count) * spread, BOUNDS["west"], BOUNDS["east"]).round(6)
+
+        # What
+        category = rng.choice(len(CATEGORIES), size=count, p=CATEGORY_SHARES)
+        severity = (rng.random(count)[:, None] > self.severity_cdf[category]).sum(axis=1) + 1
+
+        # When: volume grows towards the present (triangular), with a daily rhythm
+        day = np.floor(rng.triangular(0, self.days, self.days, count)).astype(np.int64)
+        hour = np.clip(np.where(
+            rng.random(count) < 0.55, rng.normal(9, 2, count), rng.normal(18, 2.5, count)
+        ), 0, 23.99)
+        created = end_us - span_us + day * 86_400_000_000 + (hour * 3_600_000_000).astype(np.int64)
+        created = np.minimum(created, end_us - 60_000_000)
+
+        # Lifecycle: transition delays until the final stage, cut off at the end of the data
+        final_stage = rng.choice(len(LIFECYCLE), size=count, p=FINAL_STAGE_SHARES)
+        pace = CATEGORY_PACE[category] * np.array([1.5, 1.0, 0.7, 0.4])[severity - 1]
+        delays_h = TRANSITION_HOURS * pace[:, None] * rng.lognormal(0, 0.8, (count, len(TRANSITION_HOURS)))
+        reached = created[:, None] + np.cumsum(delays_h * 3_600_000_000, axis=1).astype(np.int64)
+        stage = np.minimum(final_stage, (reached <= end_us).sum(axis=1))
+        status = np.array(LIFECYCLE)[stage]
+
+        last_change = np.where(stage > 0, reached[np.arange(count), np.maximum(stage - 1, 0)], created)
+        resolved = stage >= 4
+        resolved_at = reached[:, 3]
+        resolution_days = (resolved_at - created) / 86_400_000_000
+        rated = resolved & (rng.random(count) < 0.55)
+        rating = np.clip(np.rint(rng.normal(4.4 - 0.45 * np.log1p(resolution_days), 0.8)), 1, 5).astype(np.int64)
+        assigned = stage >= 2
+        sla_days = np.array([30, 14, 7, 3])[severity - 1]
+
+        ids = _uuids(rng, count)
+        categories = np.array(CATEGORIES)[category]
+        districts = [SRI_LANKAN_DISTRICTS[d]["name"] for d in district]
+        roads = np.array(ROADS)[rng.integers(0, len(ROADS), count)]
+        template = rng.integers(0, 3, count)
+        ward = rng.integers(1, 40, count)
+        officer = officers[category, rng.integers(0, officers.shape[1], count)]
+        authority = np.array(self.authority_ids)[category]
+
+        issues = {
+            "id": ids,
+            "user_id": citizens[np.floor(len(citizens) * rng.power(0.35, count)).astype(np.int64)].tolist(),
+            "category": categories.tolist(),
+            "title": [
+                TITLES[c][t].format(road=r, area=d) for c, t, r, d in zip(categories.tolist(), template.tolist(), roads.tolist(), districts)
+            ],
+            "description": [f"Reported near {r}, {d}" for r, d in zip(roads.tolist(), districts)],
+            "location": [f"{r}, Ward {w}, {d}" for r, w, d in zip(roads.tolist(), ward.tolist(), districts)],
+            "image_url": [None] * count,
+            "status": status.tolist(),
+            "severity_level": severity.tolist(),
+            "assigned_authority_id": _nullable(assigned, authority),
+            "created_at": _timestamps(created),
+            "updated_at": _timestamps(last_change),
+            "latitude": latitude.tolist(),
+            "longitude": longitude.tolist(),
+            "booking_reference": [f"ISS-{start + i:08d}" for i in range(count)],
+            "estimated_completion_date": _nullable(assigned, _timestamps(created + sla_days * 86_400_000_000)),
+            "actual_completion_date": _nullable(resolved, _timestamps(resolved_at)),
+            "priority_level": np.minimum(severity + 1, 5).tolist(),
+            "officer_assigned_id": _nullable(assigned, officer),
+            "resolution_notes": _nullable(resolved, np.full(count, "Fixed on site")),
+            "citizen_satisfaction_rating": _nullable(rated, rating)
+        }
+
+        # One issue_updates row per transition reached
+        issue_index = np.repeat(np.arange(count), stage)
+        transition = np.arange(len(issue_index)) - np.repeat(np.cumsum(stage) - stage, stage)
+        new_status = np.array(LIFECYCLE)[transition + 1]
+        updates = {
+            "id": _uuids(rng, len(issue_index)),
+            "issue_id": np.array(ids)[issue_index].tolist(),
+            "updated_by_user_id": officer[issue_index].tolist(),
+            "previous_status": np.array(LIFECYCLE)[transition].tolist(),
+            "new_status": new_status.tolist(),
+            "update_type": [UPDATE_TYPES.get(s, "status_change") for s in new_status.tolist()],
+            "comment": [UPDATE_COMMENTS[s] for s in new_status.tolist()],
+            "is_public": [True] * len(issue_index),
+            "created_at": _timestamps(reached[issue_index, transition])
+        }
+        return issues, updates
+
+    def issues(self, total: int) -> List[Dict[str, Any]]:
+        """Issue rows only, as dicts"""
+        rows = []
+        for issues, _ in self.chunks(total):
+            rows.extend(_records(issues, ISSUE_COLUMNS))
+        return rows
+
+    def rows(self, total: int) -> Dict[str, List[Dict[str, Any]]]:
+        """All rows as dicts per table, for in-memory use at small scale"""
+        tables = {"authorities": self.authorities(), "issues": [], "issue_updates": []}
+        for issues, updates in self.chunks(total):
+            tables["issues"].extend(_records(issues, ISSUE_COLUMNS))
+            tables["issue_updates"].extend(_records(updates, UPDATE_COLUMNS))
+        return tables
+
+
+def _records(columns: Dict[str, list], names: List[str]) -> List[Dict[str, Any]]:
+    return [dict(zip(names, values)) for values in zip(*(columns[name] for name in names))]
+
+
+# Writers
+
+def _arrow_type(name: str):
+    if name in TIMESTAMP_COLUMNS:
+        return pa.timestamp("us", tz="UTC")
+    if name in INTEGER_COLUMNS:
+        return pa.int16()
+    if name in ("latitude", "longitude"):
+        return pa.float64()
+    if name == "is_public":
+        return pa.bool_()
+    return pa.string()
+
+
+def _arrow_table(columns: Dict[str, list], names: List[str]):
+    arrays = []
+    for name in names:
+        values = columns[name]
+        if name in TIMESTAMP_COLUMNS:
+            # ISO strings -> timestamps; None stays null
+            values = pa.array(values, pa.string()).cast(pa.timestamp("us", tz="UTC"))
+        arrays.append(pa.array(values, _arrow_type(name)) if not isinstance(values, pa.Array) else values)
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+def write_parquet(generator: DatasetGenerator, total: int, output: str) -> Dict[str, int]:
+    if pq is None:
+        raise RuntimeError("Parquet output requires pyarrow to be installed")
+    os.makedirs(output, exist_ok=True)
+    counts = {"issues": 0, "issue_updates": 0}
+    writers = {
+        "issues": pq.ParquetWriter(
+            os.path.join(output, "issues.parquet"),
+            pa.schema([(name, _arrow_type(name)) for name in ISSUE_COLUMNS]), compression="zstd"
+        ),
+        "issue_updates": pq.ParquetWriter(
+            os.path.join(output, "issue_updates.parquet"),
+            pa.schema([(name, _arrow_type(name)) for name in UPDATE_COLUMNS]), compression="zstd"
+        )
+    }
+    try:
+        for issues, updates in generator.chunks(total):
+            writers["issues"].write_table(_arrow_table(issues, ISSUE_COLUMNS))
+            writers["issue_updates"].write_table(_arrow_table(updates, UPDATE_COLUMNS))
+            counts["issues"] += len(issues["id"])
+            counts["issue_updates"] += len(updates["id"])
+    finally:
+        for writer in writers.values():
+            writer.close()
+    pq.write_table(pa.Table.from_pylist(generator.authorities()), os.path.join(output, "authorities.parquet"))
+    pq.write_table(pa.Table.from_pylist(generator.profiles(total)), os.path.join(output, "profiles.parquet"))
+    return counts
+
+
+def read_parquet_tables(directory: str) -> Dict[str, List[Dict[str, Any]]]:
+    """issues, issue_updates and authorities from write_parquet output, as PostgREST-style rows"""
+    if pq is None:
+        raise RuntimeError("Parquet input requires pyarrow to be installed")
+    tables = {}
+    for name in ("authorities", "issues", "issue_updates"):
+        table = pq.read_table(os.path.join(directory, f"{name}.parquet"))
+        columns = {}
+        for column in table.column_names:
+            values = table.column(column)
+            if pa.types.is_timestamp(values.type):
+                valid = values.is_valid().to_numpy(zero_copy_only=False)
+                microseconds = values.cast(pa.int64()).fill_null(0).to_numpy(zero_copy_only=False)
+                columns[column] = _nullable(valid, _timestamps(microseconds))
+            elif pa.types.is_string(values.type):
+                columns[column] = values.to_numpy(zero_copy_only=False).tolist()
+            else:
+                columns[column] = values.to_pylist()
+        tables[name] = _records(columns, table.column_names)
+    return tables
+
+
+def _copy_value(value: Any) -> str:
+    if value is None:
+        return "\\N"
+    if value is True:
+        return "t"
+    if value is False:
+        return "f"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def _copy_block(f, table: str, names: List[str], columns: Dict[str, list]) -> None:
+    f.write(f"COPY {table} ({', '.join(names)}) FROM stdin;\n")
+    for values in zip(*(columns[name] for name in names)):
+        f.write("\t".join(map(_copy_value, values)) + "\n")
+    f.write("\\.\n")
+
+
+def write_sql(generator: DatasetGenerator, total: int, output: str) -> Dict[str, int]:
+    """psql script for database/schema.sql: departments, profiles, issues and issue_updates"""
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    counts = {"issues": 0, "issue_updates": 0}
+    with open(output, "w", encoding="utf-8") as f:
+        f.write(f"-- Generated by loadtest.datagen: {total} issues, seed {generator.seed}, ending {generator.end.isoformat()}\n")
+        f.write("BEGIN;\n")
+        # Skips the issue triggers (booking references and timestamps are supplied); needs a superuser
+        f.write("SET session_replication_role = replica;\n")
+        departments = {
+            "id": generator.authority_ids,
+            "name": [a["name"] for a in generator.authorities()],
+            "contact_email": [a["contact_email"] for a in generator.authorities()]
+        }
+        _copy_block(f, "departments", list(departments), departments)
+        profiles = generator.profiles(total)
+        _copy_block(f, "profiles", ["id", "full_name", "nic", "role"], {
+            name: [p[name] for p in profiles] for name in ("id", "full_name", "nic", "role")
+        })
+        for issues, updates in generator.chunks(total):
+            _copy_block(f, "issues", ISSUE_COLUMNS, issues)
+            _copy_block(f, "issue_updates", UPDATE_COLUMNS, updates)
+            counts["issues"] += len(issues["id"])
+            counts["issue_updates"] += len(updates["id"])
+        f.write("SET session_replication_role = DEFAULT;\nCOMMIT;\nANALYZE issues;\nANALYZE issue_updates;\n")
+    return counts
+
+
+async def load_postgrest(
+    generator: DatasetGenerator, total: int, url: str, api_key: str, batch_size: int = 5000, concurrency: int = 4
+) -> Dict[str, int]:
+    """Bulk insert through the PostgREST API (the load-test stand-in or a local Supabase)"""
+    headers = {
+        "apikey": api_key,
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "Prefer": "return=minimal"
+    }
+    counts = {"authorities": 0, "issues": 0, "issue_updates": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def post(client, table: str, rows: List[Dict[str, Any]]) -> None:
+        async with semaphore:
+            response = await client.post(f"{url.rstrip('/')}/rest/v1/{table}", json=rows, headers=headers)
+            response.raise_for_status()
+        counts[table] += len(rows)
+
+    async with httpx.AsyncClient(timeout=120) as client:
+        await post(client, "authorities", generator.authorities())
+        for issues, updates in generator.chunks(total):
+            issue_rows = _records(issues, ISSUE_COLUMNS)
+            update_rows = _records(updates, UPDATE_COLUMNS)
+            # Issues first: updates reference them
+            await asyncio.gather(*(
+                post(client, "issues", issue_rows[i:i + batch_size]) for i in range(0, len(issue_rows), batch_size)
+            ))
+            await asyncio.gather(*(
+                post(client, "issue_updates", update_rows[i:i + batch_size]) for i in range(0, len(update_rows), batch_size)
+            ))
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=parse_rows, default=parse_rows("10k"), help="issues to generate (10k, 1M, 10M)")
+    parser.add_argument("--format", choices=["parquet", "sql", "postgrest"], default="parquet")
+    parser.add_argument("--output", help="directory (parquet) or file (sql); default under loadtest/data/")
+    parser.add_argument("--url", default="http://127.0.0.1:8900", help="PostgREST base URL for --format postgrest")
+    parser.add_argument("--api-key", default="loadtest-service-key")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=365, help="days of history")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="end of the data (default: the current hour, UTC)")
+    parser.add_argument("--chunk-size", type=int, default=250_000)
+    args = parser.parse_args()
+
+    end = args.end.replace(tzinfo=args.end.tzinfo or timezone.utc) if args.end else None
+    generator = DatasetGenerator(args.seed, args.days, end, args.chunk_size)
+    started = time.perf_counter()
+    if args.format == "parquet":
+        output = args.output or os.path.join(DATA_DIR, f"issues-{args.rows}")
+        counts = write_parquet(generator, args.rows, output)
+    elif args.format == "sql":
+        output = args.output or os.path.join(DATA_DIR, f"issues-{args.rows}.sql")
+        counts = write_sql(generator, args.rows, output)
+    else:
+        output = args.url
+        counts = asyncio.run(load_postgrest(generator, args.rows, args.url, args.api_key))
+
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {', '.join(f'{count} {table}' for table, count in counts.items())} to {output} in {elapsed:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+"""
+Local stand-ins for Supabase (PostgREST), Gemini and Nominatim
+
+One Starlette app serves all three so the load-test runner only has to manage a
+single extra process:
+
+    /rest/v1/{table}                         PostgREST subset used by SupabaseClient
+    /v1beta/models/{model}:generateContent   Gemini REST API (fixed analysis JSON)
+    /nominatim/search, /nominatim/reverse    Nominatim
+
+Tables are generated in memory by loadtest.datagen, or loaded from its Parquet
+output with --data. Each backend adds its own
+latency (a fixed delay plus uniform jitter) so the API sees realistic upstream
+waits without any network access.
+
+Run standalone with ``python -m loadtest.fakes --port 8900 --issues 10000`` or
+``--data loadtest/data/1m``.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import uuid
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from app.services.location_service import SRI_LANKAN_DISTRICTS
+from loadtest.datagen import DatasetGenerator, parse_rows, read_parquet_tables
+
+
+RESERVED_PARAMS = ("select", "order", "limit", "offset")
+
+ANALYSIS_TEXT = json.dumps({
+    "detected_issue": "Pothole on the road surface",
+    "category": "roads",
+    "description": "A large pothole is visible in the carriageway and is a hazard to vehicles.",
+    "severity_level": 3,
+    "confidence_score": 0.87,
+    "analysis_details": {
+        "visible_damage": "Broken asphalt, exposed base layer",
+        "safety_concerns": "Risk to motorcycles at night",
+        "urgency_reason": "Busy road"
+    }
+})
+
+
+@lru_cache(maxsize=65536)
+def _parse_timestamp(value: str) -> Optional[datetime]:
+    try:
+        moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def _comparable(row_value: Any, raw: str) -> Tuple[Any, Any]:
+    """Row value and filter value in a form that compares like Postgres would"""
+    if isinstance(row_value, bool):
+        return row_value, raw.lower() == "true"
+    if isinstance(row_value, (int, float)):
+        try:
+            return row_value, float(raw)
+        except ValueError:
+            return str(row_value), raw
+    if isinstance(row_value, str):
+        moment = _parse_timestamp(row_value) if len(row_value) >= 19 and row_value[4:5] == "-" else None
+        if moment is not None:
+            other = _parse_timestamp(raw)
+            if other is not None:
+                return moment, other
+    return row_value, raw
+
+
+def _predicate(column: str, expression: str):
+    negate = expression.startswith("not.")
+    if negate:
+        expression = expression[len("not."):]
+    operator, _, raw = expression.partition(".")
+
+    if operator == "is":
+        expected = None if raw == "null" else raw.lower() == "true"
+        test = lambda row: row.get(column) is expected
+    elif operator == "in":
+        values = {value.strip('"') for value in raw.strip("()").split(",")} if raw.strip("()") else set()
+        test = lambda row: row.get(column) is not None and str(row.get(column)) in values
+    elif operator in ("eq", "neq", "gt", "gte", "lt", "lte"):
+        def test(row):
+            value = row.get(column)
+            if value is None:
+                return False
+            left, right = _comparable(value, raw)
+            if isinstance(left, str) and not isinstance(right, str):
+                right = str(right)
+            try:
+                return {
+                    "eq": left == right,
+                    "neq": left != right,
+                    "gt": left > right,
+                    "gte": left >= right,
+                    "lt": left < right,
+                    "lte": left <= right
+                }[operator]
+            except TypeError:
+                return False
+    else:
+        raise ValueError(f"Unsupported filter operator: {operator}")
+
+    return (lambda row: not test(row)) if negate else test
+
+
+def _sort(rows: List[Dict[str, Any]], order: str) -> List[Dict[str, Any]]:
+    # Apply the last key first so earlier keys take precedence (stable sort)
+    for term in reversed(order.split(",")):
+        column, _, direction = term.partition(".")
+        descending = direction.startswith("desc")
+        present = [row for row in rows if row.get(column) is not None]
+        missing = [row for row in rows if row.get(column) is None]
+        present.sort(key=lambda row: row[column], reverse=descending)
+        # Postgres puts nulls last ascending and first descending
+        rows = missing + present if descending else present + missing
+    return rows
+
+
+class FakeBackends:
+    def __init__(
+        self,
+        issues: int = 10000,
+        seed: int = 42,
+        postgrest_latency_ms: float = 5,
+        gemini_latency_ms: float = 800,
+        nominatim_latency_ms: float = 150,
+        jitter: float = 0.5,
+        days: int = 365,
+        data: Optional[str] = None
+    ):
+        self.tables = read_parquet_tables(data) if data else DatasetGenerator(seed, days).rows(issues)
+        self.tables.setdefault("users", [])
+        # (table, column) -> rows by value
+        self.indexes: Dict[Tuple[str, str], Optional[Dict[str, List[Dict[str, Any]]]]] = {}
+        self.latency = {
+            "postgrest": postgrest_latency_ms / 1000,
+            "gemini": gemini_latency_ms / 1000,
+            "nominatim": nominatim_latency_ms / 1000
+        }
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+
+    async def _delay(self, backend: str) -> None:
+        base = self.latency[backend]
+        if base > 0:
+            await asyncio.sleep(base * (1 + self.jitter * (2 * self.rng.random() - 1)))
+
+    def _index(self, table: str, column: str) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+        """Rows by value of a text column, rebuilt lazily after writes; None for non-text columns"""
+        key = (table, column)
+        if key not in self.indexes:
+            index = {}
+            for row in self.tables[table]:
+                value = row.get(column)
+                if value is None:
+                    continue
+                if not isinstance(value, str):
+                    index = None
+                    break
+                index.setdefault(value, []).append(row)
+            self.indexes[key] = index
+        return self.indexes[key]
+
+    def _invalidate(self, table: str) -> None:
+        self.indexes = {key: index for key, index in self.indexes.items() if key[0] != table}
+
+    def _matching(self, table: str, params) -> List[Dict[str, Any]]:
+        filters = [(key, value) for key, value in params if key not in RESERVED_PARAMS]
+        rows = self.tables.get(table, [])
+        # Equality and id lists (status lookups, my-reports, updates history) use an index instead of a scan
+        for key, value in filters:
+            if value.startswith("eq.") or (value.startswith("in.(") and key == "id"):
+                index = self._index(table, key)
+                if index is None:
+                    continue
+                if value.startswith("eq."):
+                    rows = index.get(value[3:], [])
+                else:
+                    rows = [row for v in value[4:-1].split(",") for row in index.get(v.strip('"'), [])]
+                break
+        for key, value in filters:
+            rows = list(filter(_predicate(key, value), rows))
+        return rows
+
+    async def postgrest(self, request: Request) -> Response:
+        table = request.path_params["table"]
+        params = list(request.query_params.multi_items())
+        await self._delay("postgrest")
+        if table not in self.tables:
+            return JSONResponse({"message": f"relation \"{table}\" does not exist"}, status_code=404)
+
+        if request.method == "GET":
+            options = dict(params)
+            rows = self._matching(table, params)
+            if "order" in options:
+                rows = _sort(rows, options["order"])
+            offset = int(options.get("offset", 0))
+            limit = int(options["limit"]) if "limit" in options else None
+            rows = rows[offset:offset + limit] if limit is not None else rows[offset:]
+            columns = options.get("select", "*")
+            if columns != "*":
+                names = [name.strip() for name in columns.split(",")]
+                rows = [{name: row.get(name) for name in names} for row in rows]
+            return JSONResponse(rows)
+
+        if request.method == "POST":
+            body = await request.json()
+            now = datetime.now(timezone.utc).isoformat()
+            created = []
+            for data in body if isinstance(body, list) else [body]:
+                row = {"id": str(uuid.uuid4()), "created_at": now, "updated_at": now, **data}
+                self.tables[table].append(row)
+                created.append(row)
+            self._invalidate(table)
+            if "return=minimal" in request.headers.get("prefer", ""):
+                return Response(status_code=201)
+            return JSONResponse(created, status_code=201)
+
+        if request.method == "PATCH":
+            changes = await request.json()
+            rows = self._matching(table, params)
+            for row in rows:
+                row.update(changes)
+            self._invalidate(table)
+            return JSONResponse(rows)
+
+        if request.method == "DELETE":
+            doomed = {id(row) for row in self._matching(table, params)}
+            self.tables[table] = [row for row in self.tables[table] if id(row) not in doomed]
+            self._invalidate(table)
+            return Response(status_code=204)
+
+        return Response(status_code=405)
+
+    async def gemini(self, request: Request) -> Response:
+        await self._delay("gemini")
+        return JSONResponse({
+            "candidates": [{
+                "content": {"parts": [{"text": ANALYSIS_TEXT}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0
+            }]
+        })
+
+    def _place(self, latitude: float, longitude: float) -> Dict[str, Any]:
+        district = min(
+            SRI_LANKAN_DISTRICTS,
+            key=lambda d: (d["latitude"] - latitude) ** 2 + (d["longitude"] - longitude) ** 2
+        )
+        return {
+            "lat": str(latitude),
+            "lon": str(longitude),
+            "display_name": f"Main Street, {district['name']}, {district['province']} Province, Sri Lanka",
+            "importance": 0.6,
+            "type": "road",
+            "address": {
+                "road": "Main Street",
+                "city": district["name"],
+                "state_district": f"{district['name']} District",
+                "state": f"{district['province']} Province",
+                "country": "Sri Lanka"
+            }
+        }
+
+    async def nominatim_search(self, request: Request) -> Response:
+        await self._delay("nominatim")
+        query = request.query_params.get("q", "").lower()
+        limit = int(request.query_params.get("limit", 1))
+        matches = [d for d in SRI_LANKAN_DISTRICTS if d["name"].lower() in query or query[:4] in d["name"].lower()]
+        return JSONResponse([self._place(d["latitude"], d["longitude"]) for d in matches[:limit]])
+
+    async def nominatim_reverse(self, request: Request) -> Response:
+        await self._delay("nominatim")
+        latitude = float(request.query_params.get("lat", 6.9271))
+        longitude = float(request.query_params.get("lon", 79.8612))
+        return JSONResponse(self._place(latitude, longitude))
+
+    async def health(self, request: Request) -> Response:
+        return JSONResponse({"status": "healthy", "rows": {table: len(rows) for table, rows in self.tables.items()}})
+
+    def app(self) -> Starlette:
+        return Starlette(routes=[
+            Route("/health", self.health),
+            Route("/rest/v1/{table}", self.postgrest, methods=["GET", "POST", "PATCH", "DELETE"]),
+            Route("/v1beta/{model:path}", self.gemini, methods=["POST"]),
+            Route("/nominatim/search", self.nominatim_search),
+            Route("/nominatim/reverse", self.nominatim_reverse)
+        ])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--issues", type=parse_rows, default=10000, help="generated issues (10k, 1M)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--days", type=int, default=365, help="days of generated history")
+    parser.add_argument("--data", help="loadtest.datagen Parquet directory to serve instead")
+    parser.add_argument("--postgrest-latency-ms", type=float, default=5)
+    parser.add_argument("--gemini-latency-ms", type=float, default=800)
+    parser.add_argument("--nominatim-latency-ms", type=float, default=150)
+    parser.add_argument("--jitter", type=float, default=0.5, help="latency varies by +/- this fraction")
+    args = parser.parse_args()
+
+    backends = FakeBackends(
+        args.issues, args.seed, args.postgrest_latency_ms, args.gemini_latency_ms, args.nominatim_latency_ms,
+        args.jitter, args.days, args.data
+    )
+    uvicorn.run(backends.app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+Reproducible load test of the API
+
+Starts the fake backends (loadtest.fakes) and the API pointed at them, drives a
+scenario from loadtest.scenarios with a fixed number of concurrent virtual
+users (closed loop: each user sends its next request as soon as the previous
+one completes), and writes throughput and latency percentiles per endpoint to a
+JSON report:
+
+    python -m loadtest.run --scenario mixed --users 32 --duration 60
+    python -m loadtest.run --scenario dashboard --baseline loadtest/results/before.json
+
+Seeds are fixed, so two runs of the same command against different code differ
+only in the code. With --baseline the table shows p95 and throughput changes
+against an earlier report.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks.common import print_table
+from loadtest.datagen import parse_rows
+from loadtest.scenarios import SCENARIOS, ScenarioContext, describe, pick
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "loadtest", "results")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def _wait_healthy(url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{' '.join(process.args)} exited with code {process.returncode}")
+            try:
+                if (await client.get(f"{url}/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not become healthy within {timeout} s")
+
+
+def _start_backends(args, port: int, log) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "loadtest.fakes", "--port", str(port),
+        "--issues", str(args.issues), "--seed", str(args.seed), "--days", str(args.days),
+        "--postgrest-latency-ms", str(args.postgrest_latency_ms),
+        "--gemini-latency-ms", str(args.gemini_latency_ms),
+        "--nominatim-latency-ms", str(args.nominatim_latency_ms),
+        "--jitter", str(args.jitter)
+    ]
+    if args.data:
+        command += ["--data", args.data]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, stdout=log, stderr=subprocess.STDOUT)
+
+
+def _start_api(args, port: int, backend_url: str, tile_dir: str, log) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "PYTHONPATH": BACKEND_DIR,
+        "SUPABASE_URL": backend_url,
+        "SUPABASE_ANON_KEY": "loadtest-anon-key",
+        "SUPABASE_SERVICE_ROLE_KEY": "loadtest-service-key",
+        "GOOGLE_API_KEY": "loadtest-key",
+        "GEMINI_API_ENDPOINT": backend_url,
+        "NOMINATIM_BASE_URL": f"{backend_url}/nominatim",
+        "HEATMAP_TILE_DIR": tile_dir
+    }
+    for assignment in args.env:
+        key, _, value = assignment.partition("=")
+        env[key] = value
+
+    if args.server == "gunicorn":
+        env.update({"HOST": "127.0.0.1", "PORT": str(port), "WEB_CONCURRENCY": str(args.workers)})
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"]
+    else:
+        command = [
+            sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"
+        ]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+async def _virtual_user(number: int, client, ctx, scenario, seed: int, stop_at: float, record) -> None:
+    rng = random.Random(seed * 1000 + number)
+    while time.perf_counter() < stop_at:
+        label, operation = pick(scenario, rng)
+        started = time.perf_counter()
+        try:
+            response = await operation(client, ctx, rng)
+            status = response.status_code
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        record(label, time.perf_counter() - started, status)
+
+
+async def drive(api_url: str, ctx: ScenarioContext, scenario, users: int, duration: float, seed: int, timeout: float):
+    """Run `users` virtual users for `duration` seconds; returns samples per label and elapsed time"""
+    samples: Dict[str, Dict[str, Any]] = {}
+
+    def record(label: str, latency: float, status) -> None:
+        entry = samples.setdefault(label, {"latencies": [], "statuses": {}})
+        entry["latencies"].append(latency)
+        entry["statuses"][str(status)] = entry["statuses"].get(str(status), 0) + 1
+
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=api_url, timeout=timeout, limits=limits) as client:
+        started = time.perf_counter()
+        stop_at = started + duration
+        await asyncio.gather(*(
+            _virtual_user(number, client, ctx, scenario, seed, stop_at, record) for number in range(users)
+        ))
+        elapsed = time.perf_counter() - started
+    return samples, elapsed
+
+
+def summarize(samples: Dict[str, Dict[str, Any]], elapsed: float) -> Dict[str, Dict[str, Any]]:
+    """Throughput and latency percentiles (ms) per endpoint label"""
+    endpoints = {}
+    for label, entry in sorted(samples.items()):
+        latencies = np.array(entry["latencies"]) * 1000
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        errors = sum(count for status, count in entry["statuses"].items() if not status.isdigit() or int(status) >= 500)
+        endpoints[label] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(float(p50), 2),
+            "p95_ms": round(float(p95), 2),
+            "p99_ms": round(float(p99), 2),
+            "mean_ms": round(float(latencies.mean()), 2),
+            "max_ms": round(float(latencies.max()), 2),
+            "statuses": entry["statuses"]
+        }
+    return endpoints
+
+
+def _total(samples: Dict[str, Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    merged = {"latencies": [], "statuses": {}}
+    for entry in samples.values():
+        merged["latencies"].extend(entry["latencies"])
+        for status, count in entry["statuses"].items():
+            merged["statuses"][status] = merged["statuses"].get(status, 0) + count
+    return summarize({"total": merged}, elapsed)["total"] if merged["latencies"] else {}
+
+
+def _change(current: float, previous: Optional[float]) -> str:
+    if not previous:
+        return "-"
+    return f"{(current - previous) / previous * 100:+.1f}%"
+
+
+def print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    rows = []
+    previous = (baseline or {}).get("endpoints", {})
+    for label, stats in {**report["endpoints"], "total": report["total"]}.items():
+        row = {
+            "endpoint": label,
+            "requests": stats["requests"],
+            "errors": stats["errors"],
+            "rps": stats["rps"],
+            "p50 ms": stats["p50_ms"],
+            "p95 ms": stats["p95_ms"],
+            "p99 ms": stats["p99_ms"]
+        }
+        if baseline:
+            before = baseline["total"] if label == "total" else previous.get(label, {})
+            row["rps vs base"] = _change(stats["rps"], before.get("rps"))
+            row["p95 vs base"] = _change(stats["p95_ms"], before.get("p95_ms"))
+        rows.append(row)
+    print_table(f"Scenario '{report['config']['scenario']}', {report['config']['users']} users, "
+                f"{report['elapsed_s']} s", rows)
+
+
+async def run(args) -> Dict[str, Any]:
+    backend_port = args.backend_port or _free_port()
+    api_port = args.port or _free_port()
+    backend_url = f"http://127.0.0.1:{backend_port}"
+    api_url = f"http://127.0.0.1:{api_port}"
+
+    log_path = args.log or os.path.join(tempfile.gettempdir(), "sevanet-loadtest.log")
+    processes: List[subprocess.Popen] = []
+    with open(log_path, "w") as log, tempfile.TemporaryDirectory(prefix="loadtest-tiles-") as tile_dir:
+        try:
+            processes.append(_start_backends(args, backend_port, log))
+            # Generating or loading a large dataset takes a while
+            await _wait_healthy(backend_url, processes[-1], timeout=900)
+            processes.append(_start_api(args, api_port, backend_url, tile_dir, log))
+            await _wait_healthy(api_url, processes[-1])
+
+            ctx = await ScenarioContext.load(backend_url)
+            scenario = SCENARIOS[args.scenario]
+            if args.warmup > 0:
+                print(f"Warming up for {args.warmup} s...")
+                await drive(api_url, ctx, scenario, args.users, args.warmup, args.seed + 1, args.timeout)
+
+            print(f"Running '{args.scenario}' with {args.users} users for {args.duration} s...")
+            samples, elapsed = await drive(api_url, ctx, scenario, args.users, args.duration, args.seed, args.timeout)
+        finally:
+            for process in reversed(processes):
+                process.terminate()
+            for process in reversed(processes):
+                try:
+                    process.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "config": {
+            "scenario": args.scenario,
+            "users": args.users,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "seed": args.seed,
+            "issues": args.issues,
+            "days": args.days,
+            "data": args.data,
+            "server": args.server,
+            "workers": args.workers,
+            "postgrest_latency_ms": args.postgrest_latency_ms,
+            "gemini_latency_ms": args.gemini_latency_ms,
+            "nominatim_latency_ms": args.nominatim_latency_ms,
+            "jitter": args.jitter,
+            "env": args.env,
+            "mix": describe(args.scenario)
+        },
+        "elapsed_s": round(elapsed, 3),
+        "total": _total(samples, elapsed),
+        "endpoints": summarize(samples, elapsed)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the API against local fake backends")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="mixed")
+    parser.add_argument("--users", type=int, default=32, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before the run")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--issues", type=parse_rows, default=10000, help="generated issues (10k, 1M)")
+    parser.add_argument("--days", type=int, default=365, help="days of generated history")
+    parser.add_argument("--data", help="serve a loadtest.datagen Parquet directory instead of generating")
+    parser.add_argument("--postgrest-latency-ms", type=float, default=5)
+    parser.add_argument("--gemini-latency-ms", type=float, default=800)
+    parser.add_argument("--nominatim-latency-ms", type=float, default=150)
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--server", choices=["uvicorn", "gunicorn"], default="uvicorn")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=30, help="per-request timeout in seconds")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra API environment")
+    parser.add_argument("--port", type=int, default=0, help="API port (default: a free port)")
+    parser.add_argument("--backend-port", type=int, default=0, help="fake backend port (default: a free port)")
+    parser.add_argument("--output", help="report path (default: loadtest/results/<scenario>-<time>.json)")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--log", help="server output (default: a temp file)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{args.scenario}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"\nReport written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Weighted request mixes for the load-test runner
+
+Each scenario is a list of (weight, label, operation). A virtual user repeatedly
+picks an operation by weight and awaits it; the label groups results per
+endpoint in the report.
+"""
+
+import io
+import random
+import uuid
+from typing import Dict, Any, List, Tuple, Callable, Awaitable
+
+import httpx
+from PIL import Image
+
+from loadtest.datagen import CATEGORIES, LIFECYCLE
+from app.services.location_service import SRI_LANKAN_DISTRICTS
+
+
+API = "/api/v1"
+
+Operation = Callable[[httpx.AsyncClient, "ScenarioContext", random.Random], Awaitable[httpx.Response]]
+
+
+class ScenarioContext:
+    """Ids and payloads shared by all virtual users"""
+
+    def __init__(self, issue_ids: List[str], user_ids: List[str], officer_id: str, image_sizes=((1280, 960),)):
+        self.issue_ids = issue_ids
+        self.user_ids = user_ids
+        self.officer_id = officer_id
+        self.images = [_jpeg(width, height) for width, height in image_sizes]
+
+    @classmethod
+    async def load(cls, backend_url: str, sample: int = 2000) -> "ScenarioContext":
+        """Pick issue and reporter ids from the PostgREST stand-in"""
+        async with httpx.AsyncClient(base_url=backend_url) as client:
+            response = await client.get("/rest/v1/issues", params={"select": "id,user_id", "limit": sample})
+            response.raise_for_status()
+            rows = response.json()
+        return cls(
+            issue_ids=[row["id"] for row in rows],
+            user_ids=sorted({row["user_id"] for row in rows}),
+            officer_id=str(uuid.uuid4())
+        )
+
+
+def _jpeg(width: int, height: int) -> bytes:
+    # A gradient compresses like a photo rather than a flat colour
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def _point(rng: random.Random) -> Tuple[float, float]:
+    district = rng.choice(SRI_LANKAN_DISTRICTS)
+    return district["latitude"] + rng.gauss(0, 0.03), district["longitude"] + rng.gauss(0, 0.03)
+
+
+# Citizen operations
+
+async def report_issue(client, ctx, rng):
+    latitude, longitude = _point(rng)
+    data = {
+        "category": rng.choice(CATEGORIES),
+        "title": "Load test report",
+        "description": "Reported by the load-test harness",
+        "location": "Main Street, Colombo",
+        "user_id": rng.choice(ctx.user_ids),
+        "severity_level": str(rng.randint(1, 4)),
+        "latitude": str(latitude),
+        "longitude": str(longitude)
+    }
+    return await client.post(f"{API}/issues/report", data=data)
+
+
+async def analyze_image(client, ctx, rng):
+    latitude, longitude = _point(rng)
+    files = {"image": ("photo.jpg", rng.choice(ctx.images), "image/jpeg")}
+    data = {"location_address": "Galle Road, Colombo", "latitude": str(latitude), "longitude": str(longitude)}
+    return await client.post(f"{API}/issues/analyze-image-with-location", data=data, files=files)
+
+
+async def my_reports(client, ctx, rng):
+    return await client.get(f"{API}/issues/my-reports/{rng.choice(ctx.user_ids)}")
+
+
+async def issue_status(client, ctx, rng):
+    return await client.get(f"{API}/issues/{rng.choice(ctx.issue_ids)}/status")
+
+
+async def nearby(client, ctx, rng):
+    latitude, longitude = _point(rng)
+    return await client.post(f"{API}/issues/nearby", json={"latitude": latitude, "longitude": longitude, "radius_km": 5})
+
+
+async def location_suggestions(client, ctx, rng):
+    return await client.get(f"{API}/issues/location/suggestions", params={"q": rng.choice(SRI_LANKAN_DISTRICTS)["name"][:5]})
+
+
+# Officer operations
+
+async def list_issues(client, ctx, rng):
+    params = {"limit": 50, "skip": rng.choice([0, 0, 50, 100])}
+    if rng.random() < 0.5:
+        params["category"] = rng.choice(CATEGORIES)
+    if rng.random() < 0.5:
+        params["status"] = rng.choice(LIFECYCLE[:4])
+    return await client.get(f"{API}/issues/all", params=params)
+
+
+async def update_issue(client, ctx, rng):
+    data = {"status": rng.choice(LIFECYCLE[1:5]), "note": "Updated by load test", "updated_by_user_id": ctx.officer_id}
+    return await client.put(f"{API}/issues/{rng.choice(ctx.issue_ids)}/update", data=data)
+
+
+async def issue_map(client, ctx, rng):
+    latitude, longitude = _point(rng)
+    params = {"min_lat": latitude - 0.1, "min_lon": longitude - 0.1, "max_lat": latitude + 0.1, "max_lon": longitude + 0.1, "zoom": 12}
+    return await client.get(f"{API}/issues/map", params=params)
+
+
+# Dashboard operations
+
+def _analytics(path: str, **params) -> Operation:
+    async def operation(client, ctx, rng):
+        return await client.get(f"{API}/analytics/{path}", params=params)
+    return operation
+
+
+async def heatmap_tile(client, ctx, rng):
+    # Zoom 8 tiles covering Sri Lanka
+    return await client.get(f"{API}/analytics/heatmap/8/{rng.randint(184, 186)}/{rng.randint(121, 123)}.png")
+
+
+CITIZEN = [
+    (10, "POST /issues/report", report_issue),
+    (3, "POST /issues/analyze-image-with-location", analyze_image),
+    (20, "GET /issues/my-reports/{user_id}", my_reports),
+    (20, "GET /issues/{issue_id}/status", issue_status),
+    (25, "POST /issues/nearby", nearby),
+    (10, "GET /issues/location/suggestions", location_suggestions)
+]
+
+OFFICER = [
+    (50, "GET /issues/all", list_issues),
+    (20, "PUT /issues/{issue_id}/update", update_issue),
+    (15, "GET /issues/{issue_id}/status", issue_status),
+    (15, "GET /issues/map", issue_map)
+]
+
+DASHBOARD = [
+    (30, "GET /analytics/dashboard", _analytics("dashboard")),
+    (10, "GET /analytics/department-performance", _analytics("department-performance")),
+    (10, "GET /analytics/peak-hours", _analytics("peak-hours")),
+    (10, "GET /analytics/location-hotspots", _analytics("location-hotspots")),
+    (10, "GET /analytics/category-distribution", _analytics("category-distribution")),
+    (10, "GET /analytics/resolution-trends", _analytics("resolution-trends", days=30)),
+    (20, "GET /analytics/heatmap/{z}/{x}/{y}.png", heatmap_tile)
+]
+
+
+def _mix(*parts: Tuple[float, List[Tuple[int, str, Operation]]]) -> List[Tuple[float, str, Operation]]:
+    """Combine scenarios, scaling each one's weights to its share"""
+    mixed = []
+    for share, scenario in parts:
+        total = sum(weight for weight, _, _ in scenario)
+        mixed.extend((share * weight / total, label, operation) for weight, label, operation in scenario)
+    return mixed
+
+
+SCENARIOS: Dict[str, List[Tuple[float, str, Operation]]] = {
+    "citizen": _mix((1, CITIZEN)),
+    "officer": _mix((1, OFFICER)),
+    "dashboard": _mix((1, DASHBOARD)),
+    # Citizens dominate traffic; officers and dashboards are a steady minority
+    "mixed": _mix((0.6, CITIZEN), (0.3, OFFICER), (0.1, DASHBOARD))
+}
+
+
+def pick(scenario: List[Tuple[float, str, Operation]], rng: random.Random) -> Tuple[str, Operation]:
+    _, label, operation = rng.choices(scenario, [weight for weight, _, _ in scenario])[0]
+    return label, operation
+
+
+def describe(name: str) -> Dict[str, Any]:
+    """Operation shares of a scenario, for the report"""
+    scenario = SCENARIOS[name]
+    total = sum(weight for weight, _, _ in scenario)
+    shares: Dict[str, float] = {}
+    for weight, label, _ in scenario:
+        shares[label] = round(shares.get(label, 0) + weight / total, 4)
+    return shares
@@ -396,6 +396,11 @@ CREATE INDEX idx_issues_coordinates ON issues(latitude, longitude) WHERE latitud
 CREATE INDEX idx_issues_priority ON issues(priority_level);
 CREATE INDEX idx_issues_officer_assigned ON issues(officer_assigned_id);
 CREATE INDEX idx_issues_completion_date ON issues(actual_completion_date);
+-- Change sync: every worker polls issues by updated_at to apply writes made by the others
+CREATE INDEX idx_issues_updated_at ON issues(updated_at);
+
+CREATE TRIGGER update_issues_updated_at BEFORE UPDATE ON issues
+    FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 
 -- Analytics indexes
 CREATE INDEX idx_issues_analytics_date ON issues(created_at, category, status);
@@ -410,6 +415,56 @@ CREATE INDEX idx_issue_updates_created_at ON issue_updates(created_at);
 -- Issue attachments indexes
 CREATE INDEX idx_issue_attachments_issue_id ON issue_attachments(issue_id);
 
+-- Radius search for nearby issues: bounding box on idx_issues_coordinates, then exact haversine
+CREATE OR REPLACE FUNCTION nearby_issues(
+    center_lat DOUBLE PRECISION,
+    center_lon DOUBLE PRECISION,
+    radius_km DOUBLE PRECISION,
+    max_results INTEGER DEFAULT 100
+)
+RETURNS TABLE (
+    id UUID,
+    user_id UUID,
+    category VARCHAR,
+    title VARCHAR,
+    description TEXT,
+    location VARCHAR,
+    latitude NUMERIC,
+    longitude NUMERIC,
+    image_url VARCHAR,
+    status VARCHAR,
+    severity_level INTEGER,
+    assigned_authority_id UUID,
+    booking_reference VARCHAR,
+    created_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE,
+    distance_km DOUBLE PRECISION
+) AS $$
+    SELECT * FROM (
+        SELECT
+            i.id, i.user_id, i.category, i.title, i.description, i.location,
+            i.latitude, i.longitude, i.image_url, i.status, i.severity_level,
+            i.assigned_authority_id, i.booking_reference, i.created_at, i.updated_at,
+            2 * 6371 * ASIN(SQRT(
+                POWER(SIN(RADIANS(i.latitude::double precision - center_lat) / 2), 2) +
+                COS(RADIANS(center_lat)) * COS(RADIANS(i.latitude::double precision)) *
+                POWER(SIN(RADIANS(i.longitude::double precision - center_lon) / 2), 2)
+            )) AS distance_km
+        FROM issues i
+        WHERE i.latitude IS NOT NULL
+            AND i.longitude IS NOT NULL
+            -- Bounds cast to the column type: numeric compared with double precision
+            -- is evaluated as double precision and cannot use the index
+            AND i.latitude BETWEEN (center_lat - radius_km / 111.32)::numeric
+                               AND (center_lat + radius_km / 111.32)::numeric
+            AND i.longitude BETWEEN (center_lon - radius_km / (111.32 * GREATEST(COS(RADIANS(center_lat)), 0.000001)))::numeric
+                                AND (center_lon + radius_km / (111.32 * GREATEST(COS(RADIANS(center_lat)), 0.000001)))::numeric
+    ) candidates
+    WHERE candidates.distance_km <= radius_km
+    ORDER BY candidates.distance_km
+    LIMIT max_results;
+$$ LANGUAGE sql STABLE;
+
 -- Materialized view for heatmap data
 CREATE MATERIALIZED VIEW issue_heatmap_data AS
 SELECT 
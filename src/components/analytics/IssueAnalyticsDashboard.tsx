@@ -53,22 +53,16 @@ export function IssueAnalyticsDashboard({ timeRange = 30, onRefresh }: IssueAnal
 
       const BACKEND_URL = process.env.NEXT_PUBLIC_BACKEND_URL || 'http://localhost:8000'
 
-      // Fetch analytics data from backend
-      const [deptResponse, peakResponse, hotspotsResponse, categoryResponse, resolutionResponse] = await Promise.all([
-        fetch(`${BACKEND_URL}/api/v1/analytics/department-performance?days=${timeRange}`),
-        fetch(`${BACKEND_URL}/api/v1/analytics/peak-hours?days=${timeRange}`),
-        fetch(`${BACKEND_URL}/api/v1/analytics/location-hotspots?days=${timeRange}`),
-        fetch(`${BACKEND_URL}/api/v1/analytics/category-distribution?days=${timeRange}`),
-        fetch(`${BACKEND_URL}/api/v1/analytics/resolution-trends?days=${timeRange}`)
-      ])
+      // Fetch every dashboard section in one request (served from a single analytics snapshot)
+      const response = await fetch(`${BACKEND_URL}/api/v1/analytics/dashboard?days=${timeRange}`)
+      const dashboard = await response.json()
+      const sections = dashboard.success ? dashboard.data : {}
 
-      const [deptData, peakData, hotspotsData, categoryData, resolutionData] = await Promise.all([
-        deptResponse.json(),
-        peakResponse.json(),
-        hotspotsResponse.json(),
-        categoryResponse.json(),
-        resolutionResponse.json()
-      ])
+      const deptData = sections.department_performance || {}
+      const peakData = sections.peak_hours || {}
+      const hotspotsData = sections.location_hotspots || {}
+      const categoryData = sections.category_distribution || {}
+      const resolutionData = sections.resolution_trends || {}
 
       setAnalytics({
         departmentPerformance: deptData.success ? deptData.data : [],